@@ -1 +1,57 @@
- 
\ No newline at end of file
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'core'))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+from data_storage import DataStorage
+from format_parser import FormatParser
+from type_detector import DataTypeDetector
+from run_benchmarks import generate_amounts, generate_ledger
+
+ROWS = 200000
+
+
+def timed(label, fn):
+    start = time.perf_counter()
+    result = fn()
+    print(f"{label:45s} {(time.perf_counter() - start) * 1000:9.1f} ms")
+    return result
+
+
+print(f"--- Generating a synthetic ledger of {ROWS} rows ---")
+ledger = generate_ledger(ROWS, seed=0)
+print(ledger.head())
+
+print("\n--- Type Detection (bounded sample) ---")
+detector = DataTypeDetector()
+for column in ['Date Text', 'Amount Text', 'Description']:
+    result = timed(f"detect_column_type({column!r})", lambda: detector.detect_column_type(ledger[column]))
+    print(f"  -> {result['type']} ({result['confidence']:.2f}, {result['format']})")
+
+print("\n--- Amount Parsing: one value at a time vs whole column ---")
+parser = FormatParser()
+amounts = generate_amounts(ROWS, seed=0)
+timed("parse_amount, first 20,000 values", lambda: [parser.parse_amount(value) for value in amounts.iloc[:20000]])
+timed(f"parse_amount_series, all {ROWS} values", lambda: parser.parse_amount_series(amounts))
+
+print("\n--- Date Parsing ---")
+timed(f"parse_date_series, all {ROWS} values", lambda: parser.parse_date_series(ledger['Date Text']))
+
+print("\n--- Storage: indexed queries vs scans ---")
+storage = DataStorage()
+storage.store_data('ledger', ledger.drop(columns=['Amount Text', 'Date Text']), amounts=['Amount'])
+reference = ledger['Reference'].iloc[ROWS // 2]
+timed("query by Reference (scan)", lambda: storage.query_by_criteria('ledger', {'Reference': reference}))
+storage.create_indexes('ledger', ['Reference', 'Date'])
+timed("query by Reference (hash index)", lambda: storage.query_by_criteria('ledger', {'Reference': reference}))
+timed("query by Date range (sorted index)", lambda: storage.query_by_criteria(
+    'ledger', {'Date': ('between', ('2021-01-01', '2021-01-31'))}))
+
+print("\n--- Aggregation: scan vs declared aggregate ---")
+timed("aggregate by Account (scan)", lambda: storage.aggregate_data('ledger', ['Account'], ['Amount']))
+storage.declare_aggregate('ledger', ['Account', ('Date', 'month')], ['Amount'])
+totals = timed("aggregate by Account (cube)", lambda: storage.aggregate_data('ledger', ['Account'], ['Amount']))
+print(totals)
+
+print("\nRun scripts/run_benchmarks.py for the full suite with JSON output and baseline comparison.")
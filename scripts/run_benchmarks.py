@@ -1 +1,309 @@
- 
\ No newline at end of file
+"""Benchmark the parser's hot paths on seeded synthetic ledgers.
+
+Times ExcelProcessor.load_files, DataTypeDetector.detect_column_type,
+FormatParser.parse_amount/parse_date (scalar and column-at-a-time) and DataStorage
+queries and aggregations at each requested size, records peak traced memory, and
+writes the results as JSON. Given a baseline results file, the run fails when a
+benchmark got slower (or used more memory) than the baseline by more than the
+threshold.
+
+    python scripts/run_benchmarks.py --sizes 10000 100000 --output results.json
+    python scripts/run_benchmarks.py --baseline baseline.json --threshold 0.25
+"""
+import argparse
+import contextlib
+import json
+import logging
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'core'))
+
+from data_storage import DataStorage  # noqa: E402
+from excel_processor import ExcelProcessor  # noqa: E402
+from format_parser import FormatParser  # noqa: E402
+from type_detector import DataTypeDetector  # noqa: E402
+
+AMOUNT_STYLES = ('us', 'european', 'indian', 'parentheses', 'trailing', 'abbreviated', 'plain')
+DATE_STYLES = ('us', 'iso', 'day_mon_year', 'quarter', 'month_year', 'excel_serial')
+DATE_FORMATS = {'us': '%m/%d/%Y', 'iso': '%Y-%m-%d', 'day_mon_year': '%d-%b-%Y', 'month_year': '%b %Y'}
+ACCOUNTS = ['Cash', 'Bank', 'Accounts Receivable', 'Accounts Payable', 'Revenue', 'Cost of Sales',
+            'Payroll', 'Rent', 'Utilities', 'Travel', 'Interest', 'Tax Payable']
+DESCRIPTIONS = ['Invoice payment received', 'Supplier invoice', 'Bank transfer', 'Card transaction',
+                'Payroll run', 'Monthly rent', 'Interest charge', 'Refund issued']
+# An .xlsx sheet holds at most 1,048,576 rows; larger workbooks are split across sheets
+MAX_SHEET_ROWS = 1000000
+
+
+# --- Synthetic data -----------------------------------------------------------------
+
+def generate_amounts(rows, seed=0, styles=AMOUNT_STYLES):
+    """Amount strings with currency symbols, locale separators and negative styles mixed."""
+    rng = np.random.default_rng(seed)
+    values = np.round(rng.lognormal(6, 2, rows), 2)
+    negative = rng.random(rows) < 0.2
+    chosen = rng.integers(len(styles), size=rows)
+    out = np.empty(rows, dtype=object)
+    for i, style in enumerate(styles):
+        positions = np.flatnonzero(chosen == i)
+        out[positions] = [
+            _format_amount(value, neg, style) for value, neg in zip(values[positions], negative[positions])
+        ]
+    return pd.Series(out, name='Amount')
+
+
+def _format_amount(value, negative, style):
+    sign = '-' if negative else ''
+    if style == 'us':
+        return f"{sign}${value:,.2f}"
+    if style == 'european':
+        return f"{sign}€{value:,.2f}".replace(',', ' ').replace('.', ',').replace(' ', '.')
+    if style == 'indian':
+        return f"{sign}₹{_indian_grouping(value)}"
+    if style == 'parentheses':
+        return f"({value:,.2f})"
+    if style == 'trailing':
+        return f"{value:.2f}-"
+    if style == 'abbreviated':
+        return f"{value / 1000000:.2f}M" if value >= 1000000 else f"{value / 1000:.2f}K"
+    return f"{sign}{value:.2f}"
+
+
+def _indian_grouping(value):
+    whole, fraction = f"{value:.2f}".split('.')
+    head, tail = whole[:-3], whole[-3:]
+    groups = []
+    while len(head) > 2:
+        groups.insert(0, head[-2:])
+        head = head[:-2]
+    if head:
+        groups.insert(0, head)
+    return ','.join(groups + [tail]) + '.' + fraction
+
+
+def generate_dates(rows, seed=0, styles=DATE_STYLES):
+    """Date strings in the given styles (one style gives a single-format column)."""
+    rng = np.random.default_rng(seed)
+    dates = pd.DatetimeIndex(np.datetime64('2019-01-01') + rng.integers(0, 5 * 365, size=rows).astype('timedelta64[D]'))
+    chosen = rng.integers(len(styles), size=rows)
+    out = np.empty(rows, dtype=object)
+    for i, style in enumerate(styles):
+        positions = np.flatnonzero(chosen == i)
+        subset = dates[positions]
+        if style == 'quarter':
+            out[positions] = [f"Q{quarter} {year}" for quarter, year in zip(subset.quarter, subset.year)]
+        elif style == 'excel_serial':
+            out[positions] = (subset - pd.Timestamp('1899-12-30')).days.astype(str)
+        else:
+            out[positions] = subset.strftime(DATE_FORMATS[style])
+    return pd.Series(out, name='Date')
+
+
+def generate_ledger(rows, seed=0):
+    """A ledger frame: parsed Date and Amount columns plus their raw text forms."""
+    rng = np.random.default_rng(seed)
+    amounts = np.round(rng.normal(0, 5000, rows), 2)
+    dates = np.datetime64('2019-01-01') + rng.integers(0, 5 * 365, size=rows).astype('timedelta64[D]')
+    return pd.DataFrame({
+        'Date': dates.astype('datetime64[ns]'),
+        'Account': np.asarray(ACCOUNTS, dtype=object)[rng.integers(len(ACCOUNTS), size=rows)],
+        'Description': np.asarray(DESCRIPTIONS, dtype=object)[rng.integers(len(DESCRIPTIONS), size=rows)],
+        'Reference': [f"INV-{n:08d}" for n in rng.permutation(rows)],
+        'Amount': amounts,
+        'Amount Text': generate_amounts(rows, seed).to_numpy(),
+        'Date Text': generate_dates(rows, seed).to_numpy(),
+    })
+
+
+def write_workbook(df, path, sheet_rows=MAX_SHEET_ROWS):
+    """Write a frame to an .xlsx file with openpyxl's streaming writer, split across sheets."""
+    import openpyxl
+
+    workbook = openpyxl.Workbook(write_only=True)
+    for number, start in enumerate(range(0, max(len(df), 1), sheet_rows), start=1):
+        sheet = workbook.create_sheet(f"Sheet{number}")
+        sheet.append(list(df.columns))
+        chunk = df.iloc[start:start + sheet_rows].astype(object)
+        for row in chunk.itertuples(index=False):
+            sheet.append([value.to_pydatetime() if isinstance(value, pd.Timestamp) else value for value in row])
+    workbook.save(path)
+    return path
+
+
+# --- Harness --------------------------------------------------------------------------
+
+def measure(fn, repeat=3):
+    """Median and best wall time over repeat runs, then peak traced memory of one more run."""
+    times = []
+    with _quiet():
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn()
+            times.append(time.perf_counter() - start)
+        tracemalloc.start()
+        try:
+            fn()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return {'seconds': statistics.median(times), 'min_seconds': min(times), 'peak_bytes': peak}
+
+
+@contextlib.contextmanager
+def _quiet():
+    # The library logs progress and warnings per file and sheet; keep them out of the timings and the output
+    previous = logging.root.manager.disable
+    logging.disable(logging.CRITICAL)
+    try:
+        yield
+    finally:
+        logging.disable(previous)
+
+
+def benchmark_cases(rows, seed, scalar_rows):
+    """(name, rows timed, callable) for every in-memory benchmark at one size."""
+    ledger = generate_ledger(rows, seed)
+    amounts = pd.Series(ledger['Amount Text'])
+    dates = pd.Series(ledger['Date Text'])
+    iso_dates = generate_dates(rows, seed, styles=('iso',))
+    detector = DataTypeDetector()
+    with _quiet():
+        parser = FormatParser()
+        storage = DataStorage(background_compaction=False)
+        storage.store_data('ledger', ledger.drop(columns=['Amount Text', 'Date Text']), amounts=['Amount'])
+        storage.create_indexes('ledger', ['Account', 'Date', 'Reference'])
+        cubes = DataStorage(background_compaction=False)
+        cubes.store_data('ledger', ledger.drop(columns=['Amount Text', 'Date Text']), amounts=['Amount'])
+        cubes.declare_aggregate('ledger', ['Account', ('Date', 'month')], ['Amount'])
+    scalar = min(rows, scalar_rows)
+    reference = ledger['Reference'].iloc[rows // 2]
+
+    return [
+        ('detect_column_type/amounts', rows, lambda: detector.detect_column_type(amounts)),
+        ('detect_column_type/dates', rows, lambda: detector.detect_column_type(dates)),
+        ('detect_column_type/strings', rows, lambda: detector.detect_column_type(ledger['Description'])),
+        ('parse_amount/scalar', scalar, lambda: [parser.parse_amount(value) for value in amounts.iloc[:scalar]]),
+        ('parse_amount/series', rows, lambda: parser.parse_amount_series(amounts)),
+        ('parse_date/scalar', scalar, lambda: [parser.parse_date(value) for value in dates.iloc[:scalar]]),
+        ('parse_date/series_mixed', rows, lambda: parser.parse_date_series(dates)),
+        ('parse_date/series_iso', rows, lambda: parser.parse_date_series(iso_dates)),
+        ('storage/query_point', rows, lambda: storage.query_by_criteria('ledger', {'Reference': reference})),
+        ('storage/query_range', rows, lambda: storage.query_by_criteria('ledger', [
+            ('Date', 'between', ('2021-01-01', '2021-03-31')), ('Account', '==', 'Cash')])),
+        ('storage/query_scan', rows, lambda: storage.query_by_criteria('ledger', {'Amount': ('>', 10000)})),
+        ('storage/aggregate', rows, lambda: storage.aggregate_data(
+            'ledger', ['Account', ('Date', 'month')], ['Amount'])),
+        ('storage/aggregate_cube', rows, lambda: cubes.aggregate_data('ledger', ['Account'], ['Amount'])),
+    ]
+
+
+def excel_cases(rows, seed, directory):
+    """Benchmarks that read a generated workbook of the given size."""
+    path = write_workbook(generate_ledger(rows, seed), os.path.join(directory, f"ledger_{rows}.xlsx"))
+
+    def load(workers=None):
+        processor = ExcelProcessor()
+        processor.load_files([path], workers=workers)
+        for sheet_name in processor.files[path]['sheets']:
+            processor.extract_data(path, sheet_name)
+
+    return [
+        ('excel/load_files', rows, load),
+        ('excel/load_files_parallel', rows, lambda: load(workers=2)),
+    ]
+
+
+def run(sizes, workbook_sizes, seed=0, repeat=3, scalar_rows=10000, only=None):
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        groups = [(size, lambda size=size: benchmark_cases(size, seed, scalar_rows)) for size in sizes]
+        groups += [(size, lambda size=size: excel_cases(size, seed, directory)) for size in workbook_sizes]
+        for size, make_cases in groups:
+            for name, rows, fn in make_cases():
+                if only and not any(name.startswith(prefix) for prefix in only):
+                    continue
+                key = f"{name}[{size}]"
+                results[key] = dict(measure(fn, repeat), rows=rows)
+                print(f"{key:45s} {results[key]['seconds'] * 1000:10.2f} ms "
+                      f"{results[key]['peak_bytes'] / 2 ** 20:9.1f} MiB")
+    return {
+        'meta': {
+            'created': datetime.now(timezone.utc).isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'pandas': pd.__version__,
+            'numpy': np.__version__,
+            'seed': seed,
+            'repeat': repeat,
+        },
+        'results': results,
+    }
+
+
+def compare(results, baseline, threshold=0.25, min_seconds=0.001):
+    """Benchmarks more than threshold (a fraction) slower or larger than the baseline.
+
+    Times are compared on the best run; benchmarks faster than min_seconds in both
+    runs are too noisy to judge and only their memory is checked.
+    """
+    regressions = []
+    for key, result in results['results'].items():
+        base = baseline['results'].get(key)
+        if base is None:
+            continue
+        checks = [('peak_bytes', result['peak_bytes'], base['peak_bytes'])]
+        if max(result['min_seconds'], base['min_seconds']) >= min_seconds:
+            checks.append(('min_seconds', result['min_seconds'], base['min_seconds']))
+        for metric, current, previous in checks:
+            if previous and current > previous * (1 + threshold):
+                regressions.append({'benchmark': key, 'metric': metric, 'baseline': previous,
+                                    'current': current, 'ratio': current / previous})
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000],
+                        help='rows for the in-memory benchmarks (e.g. 10000 1000000 10000000)')
+    parser.add_argument('--workbook-sizes', type=int, nargs='*', default=[10000],
+                        help='rows of the generated workbooks for the load_files benchmarks')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--scalar-rows', type=int, default=10000,
+                        help='values timed for the scalar parse_amount/parse_date loops')
+    parser.add_argument('--only', nargs='*', help='run only benchmarks whose name starts with one of these')
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--baseline', help='results file to compare against')
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='allowed slowdown or memory growth over the baseline, as a fraction')
+    args = parser.parse_args(argv)
+
+    results = run(args.sizes, args.workbook_sizes, args.seed, args.repeat, args.scalar_rows, args.only)
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression['benchmark']} {regression['metric']}: "
+                  f"{regression['baseline']:.6g} -> {regression['current']:.6g} ({regression['ratio']:.2f}x)")
+        if regressions:
+            return 1
+        print(f"No regressions beyond {args.threshold:.0%} of {args.baseline}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
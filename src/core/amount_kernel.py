@@ -0,0 +1,219 @@
+
+# The column-at-a-time amount parser behind FormatParser.parse_amount_series. Its
+# lookup tables are built with NumPy at import, so format_parser loads it on first use.
+import re
+
+import numpy as np
+
+try:
+    from .format_parser import ABBREVIATED_RE
+except ImportError:
+    from format_parser import ABBREVIATED_RE
+
+# Character classes used by the column-at-a-time amount kernel
+_OTHER, _DIGIT, _DOT, _COMMA, _MINUS, _SPACE, _OPEN, _CLOSE, _K, _M, _B, _UNSUPPORTED = range(12)
+
+_ASCII_CLASSES = np.full(128, _OTHER, dtype=np.int8)
+_ASCII_CLASSES[ord('0'):ord('9') + 1] = _DIGIT
+for _char, _cls in {'.': _DOT, ',': _COMMA, '-': _MINUS, '(': _OPEN, ')': _CLOSE,
+                    'K': _K, 'k': _K, 'M': _M, 'm': _M, 'B': _B, 'b': _B}.items():
+    _ASCII_CLASSES[ord(_char)] = _cls
+for _code in range(128):
+    if chr(_code).isspace():
+        _ASCII_CLASSES[_code] = _SPACE
+
+_ABBREVIATION_EXPONENT = np.zeros(12, dtype=np.int64)
+_ABBREVIATION_EXPONENT[[_K, _M, _B]] = [3, 6, 9]
+
+BATCH_ROWS = 1 << 16
+MAX_WIDTH = 48
+MAX_DIGITS = 18
+MAX_UNITS = 10 ** MAX_DIGITS
+_INT_POW10 = 10 ** np.arange(MAX_DIGITS + 1, dtype=np.int64)
+_FLOAT_POW10 = 10.0 ** np.arange(23)
+
+
+def _classify(codes):
+    """Map a matrix of code points to character classes.
+
+    Non-ASCII characters are classified once per distinct code point. Unicode digits
+    and case-folded K/M/B letters match the scalar regexes in ways the kernel does not
+    model, so rows containing them are flagged _UNSUPPORTED and use the scalar path.
+    """
+    classes = _ASCII_CLASSES[np.minimum(codes, 127)]
+    wide = codes > 127
+    if wide.any():
+        for code in np.unique(codes[wide]):
+            char = chr(code)
+            if char.isspace():
+                cls = _SPACE
+            elif re.match(r'\d', char) or ABBREVIATED_RE.match('0' + char):
+                cls = _UNSUPPORTED
+            else:
+                cls = _OTHER
+            classes[codes == code] = cls
+    return classes
+
+
+def _count(mask):
+    """Number of True values per string."""
+    return np.add.reduce(mask, axis=0, dtype=np.int16)
+
+
+def _first(mask):
+    """Position of the first True per string, or the width when there is none."""
+    width = mask.shape[0]
+    return width - (np.arange(width, 0, -1, dtype=np.int16)[:, None] * mask).max(axis=0)
+
+
+def _last(mask):
+    """Position of the last True per string, or -1 when there is none."""
+    return (np.arange(1, mask.shape[0] + 1, dtype=np.int16)[:, None] * mask).max(axis=0) - 1
+
+
+def _running_count(mask):
+    """Cumulative number of True values up to and including each position."""
+    out = np.empty(mask.shape, dtype=np.int16)
+    total = np.zeros(mask.shape[1], dtype=np.int16)
+    for position in range(mask.shape[0]):
+        total = total + mask[position]
+        out[position] = total
+    return out
+
+
+def parse_amount_batch(strings, fixed_point, scale):
+    """Vectorized parse_amount over an object array of strings.
+
+    The batch becomes a matrix of code points with one row per character position and
+    one column per string, and every rule of parse_amount is applied as an operation
+    across all strings at once. Returns (values, valid, fallback); rows flagged in
+    fallback could not be handled exactly here and must be parsed by the scalar path.
+    """
+    n = len(strings)
+    values = np.zeros(n, dtype=np.int64) if fixed_point else np.full(n, np.nan)
+    valid = np.zeros(n, dtype=bool)
+    lengths = np.fromiter(map(len, strings), dtype=np.int64, count=n)
+    too_long = lengths > MAX_WIDTH
+    lengths[too_long] = 0
+    width = int(lengths.max(initial=0))
+    if width == 0:
+        return values, valid, too_long
+
+    # Longer strings are truncated here, but they are already flagged for the scalar path
+    text = np.array(strings, dtype=f'U{width}')
+    codes = np.ascontiguousarray(text.view(np.uint32).reshape(n, width).T)
+    columns = np.arange(n)
+    pos = np.arange(width, dtype=np.int16)[:, None]
+
+    def at(matrix, index):
+        return matrix[np.clip(index, 0, width - 1), columns]
+
+    classes = _classify(codes)
+    classes[pos >= lengths.astype(np.int16)] = _SPACE
+    fallback = too_long | (classes == _UNSUPPORTED).any(axis=0)
+    is_digit = classes == _DIGIT
+    is_dot = classes == _DOT
+    is_comma = classes == _COMMA
+    is_minus = classes == _MINUS
+
+    # str.strip()
+    solid = classes != _SPACE
+    non_empty = solid.any(axis=0)
+    start = _first(solid)
+    end = _last(solid) + 1
+    first_class = at(classes, start)
+    last_class = at(classes, end - 1)
+    stripped = (pos >= start) & (pos < end)
+
+    # Abbreviated amounts (K, M, B) with a number Decimal() accepts before the suffix
+    body = stripped & (pos < end - 1)
+    abbreviated = (
+        non_empty & ((last_class == _K) | (last_class == _M) | (last_class == _B)) & (end - start >= 2)
+        & ~(body & ~is_digit & ~is_dot).any(axis=0)
+        & (_count(body & is_digit) >= 1) & (_count(body & is_dot) <= 1)
+    )
+    exponent = _ABBREVIATION_EXPONENT[last_class] * abbreviated
+
+    # Negative in parentheses, then trailing negative
+    interior = stripped & (pos > start) & (pos < end - 1)
+    parentheses = (
+        ~abbreviated & non_empty & (first_class == _OPEN) & (last_class == _CLOSE) & (end - start >= 3)
+        & ~(interior & ~is_digit & ~is_dot & ~is_comma).any(axis=0)
+    )
+    start = start + parentheses
+    end = end - parentheses - abbreviated
+    trailing = ~abbreviated & (end > start) & (at(classes, end - 1) == _MINUS)
+    end = end - trailing
+    negative = parentheses | trailing
+
+    # Keep digits, separators and '-' (the re.sub in parse_amount)
+    kept = (pos >= start) & (pos < end) & (is_digit | is_dot | is_comma | is_minus)
+    rank = _running_count(kept) - 1
+    kept_len = _count(kept)
+    commas, dots, digits = kept & is_comma, kept & is_dot, kept & is_digit
+    n_comma, n_dot, n_minus, n_digit = _count(commas), _count(dots), _count(kept & is_minus), _count(digits)
+    first_comma_rank = at(rank, _first(commas))
+    last_comma_rank = at(rank, _last(commas))
+    last_comma, last_dot = _last(commas), _last(dots)
+
+    # INDIAN_RE: 1-3 leading digits, then commas every three characters, the last
+    # group holding two or three digits, then an optional '.' followed by digits
+    integer_len = np.where(n_dot > 0, at(rank, last_dot), kept_len)
+    last_group = integer_len - last_comma_rank - 1
+    indian = (n_minus == 0) & (n_dot <= 1) & ((n_dot == 0) | (at(rank, last_dot) < kept_len - 1)) & np.where(
+        n_comma > 0,
+        (first_comma_rank >= 1) & (first_comma_rank <= 3) & ((last_group == 2) | (last_group == 3))
+        & (last_comma_rank - first_comma_rank == 3 * (n_comma - 1))
+        & ~(commas & ((last_comma_rank - rank) % 3 != 0)).any(axis=0),
+        (integer_len >= 1) & (integer_len <= 3)
+    )
+
+    both = ~indian & (n_comma > 0) & (n_dot > 0)
+    european = both & (last_comma > last_dot)
+    us_thousands = ~indian & ~both & (n_comma == 1) & (last_comma_rank == kept_len - 3)
+    comma_decimal = ~indian & ~both & (n_comma > 0) & ~us_thousands
+    comma_is_point = european | comma_decimal
+    points = (commas & comma_is_point) | (dots & ~comma_is_point)
+    final = kept & ~((dots & comma_is_point) | (commas & ~comma_is_point))
+
+    # Decimal() then accepts an optional leading '-', at most one point and at least one digit
+    leading_minus = (n_minus == 1) & at(is_minus, _first(final))
+    parsed = non_empty & (_count(points) <= 1) & ((n_minus == 0) | leading_minus) & (n_digit >= 1)
+
+    # Integer mantissa from the digits, and the power of ten it is scaled by
+    fallback |= parsed & (n_digit > MAX_DIGITS)
+    exact = parsed & ~fallback
+    digit_rank = _running_count(digits)
+    weights = np.clip(n_digit - digit_rank, 0, MAX_DIGITS)
+    digit_values = (codes.astype(np.int64) - ord('0')) * (digits & exact)
+    mantissa = (digit_values * _INT_POW10[weights]).sum(axis=0)
+    point = _first(points)
+    fraction_digits = np.where(point < width, n_digit - at(digit_rank, point), 0)
+    power = exponent - fraction_digits
+    flip = leading_minus ^ negative
+
+    if fixed_point:
+        shift = power + scale
+        grow = exact & (shift >= 0)
+        fallback |= grow & ((shift > MAX_DIGITS) | (mantissa >= _INT_POW10[MAX_DIGITS - np.clip(shift, 0, MAX_DIGITS)]))
+        fallback |= exact & (-shift > MAX_DIGITS)
+        exact = parsed & ~fallback
+        divisor = _INT_POW10[np.clip(-shift, 0, MAX_DIGITS)]
+        quotient, remainder = np.divmod(mantissa, divisor)
+        round_up = (2 * remainder > divisor) | ((2 * remainder == divisor) & (quotient % 2 == 1))
+        units = np.where(shift >= 0, mantissa * _INT_POW10[np.clip(shift, 0, MAX_DIGITS)], quotient + round_up)
+        values[exact] = np.where(flip, -units, units)[exact]
+    else:
+        # A mantissa below 2**53 scaled by an exact power of ten rounds once, like float(Decimal)
+        fallback |= exact & ((mantissa > 2 ** 53) | (np.abs(power) > 22))
+        exact = parsed & ~fallback
+        scaled = np.where(
+            power >= 0,
+            mantissa * _FLOAT_POW10[np.clip(power, 0, 22)],
+            mantissa / _FLOAT_POW10[np.clip(-power, 0, 22)]
+        )
+        # -Decimal(x) is never negative zero, but Decimal('-0') is
+        signed = np.where(leading_minus, -scaled, scaled)
+        values[exact] = np.where(negative, 0.0 - signed, signed)[exact]
+    valid[exact] = True
+    return values, valid, fallback
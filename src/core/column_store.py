@@ -0,0 +1,374 @@
+
+import io
+import json
+import logging
+import os
+import pickle
+import shutil
+from urllib.parse import quote
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STORE_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), '..', '..', 'data', 'processed', 'store'
+)
+
+# Nullable extension arrays, stored as their values plus a missing-value mask
+MASKED_ARRAYS = (pd.arrays.IntegerArray, pd.arrays.FloatingArray, pd.arrays.BooleanArray)
+
+# Bump whenever the on-disk layout changes, so older datasets are rejected instead of misread
+STORE_VERSION = 2
+
+
+class ColumnStore:
+    """Datasets on disk as one NPY file per column, reopened as memory maps.
+
+    Numeric, boolean and datetime columns are written as their raw arrays, nullable
+    (masked) columns as values plus a missing-value mask, and text or mixed columns
+    as integer codes into a pickled list of distinct values. read() maps the files
+    read-only and builds the DataFrame on top of them without copying, so opening a
+    dataset costs the same whatever its size, and processes reading the same dataset
+    share one copy in the OS page cache. Coded columns come back with the dtype they
+    were written with (only Categoricals come back as Categoricals), which decodes
+    their values into memory.
+
+    Each dataset is a directory with a manifest.json that records the row count,
+    column encodings, metadata and amount specs. Rows beyond the manifest's count
+    are ignored, so an append that fails halfway leaves the dataset as it was.
+    Partitioned datasets (write_partitions) keep each partition's columns in a
+    directory of its own, so changing one partition rewrites only that one.
+    """
+
+    def __init__(self, root=None):
+        self.root = os.path.abspath(root or DEFAULT_STORE_DIR)
+        os.makedirs(self.root, exist_ok=True)
+
+    def names(self):
+        names = []
+        for entry in sorted(os.listdir(self.root)):
+            manifest = self._read_manifest(os.path.join(self.root, entry))
+            if manifest is not None:
+                names.append(manifest['name'])
+        return names
+
+    def __contains__(self, name):
+        return self._read_manifest(self._path(name)) is not None
+
+    def write(self, name, df, metadata=None, amounts=None):
+        """Write a dataset, replacing any previous one of that name. The index is not kept."""
+        path = self._path(name)
+        tmp_path = path + '.tmp'
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+        columns = [_write_column(tmp_path, i, df.iloc[:, i]) for i in range(df.shape[1])]
+        _write_json(os.path.join(tmp_path, 'manifest.json'), {
+            'version': STORE_VERSION,
+            'name': name,
+            'rows': len(df),
+            'names': list(df.columns),
+            'columns': columns,
+            'metadata': metadata or {},
+            'amounts': amounts or {},
+            'partition_by': None,
+        })
+        _swap(tmp_path, path)
+
+    def write_partitions(self, name, partitions, columns, metadata=None, amounts=None, partition_by=None,
+                         replace=False):
+        """Write the given partitions of a partitioned dataset, leaving its others as they are.
+
+        partitions maps partition labels (strings) to their rows, or to None to drop the
+        partition; columns is the dataset's (possibly empty) frame of columns. With
+        replace, partitions not given are dropped and any other dataset of that name
+        is replaced. Each partition goes to a new directory and the manifest is
+        written last, so a failure leaves the dataset as it was.
+        """
+        path = self._path(name)
+        manifest = None if replace else self._read_manifest(path)
+        if manifest is None or manifest['partition_by'] is None:
+            tmp_path = path + '.tmp'
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            os.makedirs(tmp_path)
+            _write_json(os.path.join(tmp_path, 'manifest.json'), {
+                'version': STORE_VERSION, 'name': name, 'partition_by': partition_by,
+                'names': list(columns.columns), 'partitions': {}, 'serial': 0,
+            })
+            _swap(tmp_path, path)
+            manifest = self._read_manifest(path)
+        stale = []
+        for label, df in partitions.items():
+            old = manifest['partitions'].pop(label, None)
+            if old is not None:
+                stale.append(old['dir'])
+            if df is None or len(df) == 0:
+                continue
+            manifest['serial'] += 1
+            directory = f"part-{manifest['serial']}"
+            os.makedirs(os.path.join(path, directory))
+            manifest['partitions'][label] = {
+                'dir': directory,
+                'rows': len(df),
+                'columns': [_write_column(os.path.join(path, directory), i, df.iloc[:, i])
+                            for i in range(df.shape[1])],
+            }
+        manifest.update(names=list(columns.columns), rows=sum(part['rows'] for part in manifest['partitions'].values()),
+                        # Dtypes to give the columns when no partition is left to read them from
+                        columns=[{'dtype': str(dtype)} for dtype in columns.dtypes],
+                        metadata=metadata or {}, amounts=amounts or {}, partition_by=partition_by)
+        _write_json(os.path.join(path, 'manifest.json'), manifest)
+        for directory in stale:
+            shutil.rmtree(os.path.join(path, directory), ignore_errors=True)
+
+    def append(self, name, df, metadata=None):
+        """Append rows in place; False if they do not fit the stored columns (rewrite instead)."""
+        path = self._path(name)
+        manifest = self._read_manifest(path)
+        if manifest is None or manifest['partition_by'] is not None or list(df.columns) != manifest['names']:
+            return False
+        updates = []
+        for i, column in enumerate(manifest['columns']):
+            update = _encode_append(path, column, df.iloc[:, i])
+            if update is None:
+                return False
+            updates.append(update)
+        if len(df) == 0:
+            return True
+        rows = manifest['rows']
+        for column, (arrays, uniques) in zip(manifest['columns'], updates):
+            for key, values in arrays.items():
+                file_path = os.path.join(path, column[key])
+                # A longer file left by an earlier failed append is cut back to the manifest's rows
+                if not _append_npy(file_path, values, rows):
+                    return False
+            if uniques is not None:
+                _write_pickle(os.path.join(path, column['uniques']), uniques)
+        manifest['rows'] = rows + len(df)
+        if metadata is not None:
+            manifest['metadata'].update(metadata)
+        _write_json(os.path.join(path, 'manifest.json'), manifest)
+        return True
+
+    def update_metadata(self, name, metadata):
+        path = self._path(name)
+        manifest = self._read_manifest(path)
+        if manifest is not None:
+            manifest['metadata'] = metadata
+            _write_json(os.path.join(path, 'manifest.json'), manifest)
+
+    def read(self, name):
+        """The dataset as a DataFrame over read-only memory maps, with its manifest.
+
+        A partitioned dataset's partitions are read one after another into one frame.
+        """
+        path = self._path(name)
+        manifest = self._read_manifest(path)
+        if manifest is None:
+            raise KeyError(name)
+        if manifest['partition_by'] is None:
+            return _read_frame(path, manifest['columns'], manifest['names'], manifest['rows']), manifest
+        parts = [_read_frame(os.path.join(path, part['dir']), part['columns'], manifest['names'], part['rows'])
+                 for part in manifest['partitions'].values()]
+        if not parts:
+            empty = {i: pd.Series([], dtype=column['dtype']) for i, column in enumerate(manifest['columns'])}
+            return _read_frame_of(empty, manifest['names'], 0), manifest
+        return pd.concat(parts, ignore_index=True), manifest
+
+    def delete(self, name):
+        shutil.rmtree(self._path(name), ignore_errors=True)
+
+    def _path(self, name):
+        return os.path.join(self.root, quote(str(name), safe=''))
+
+    def _read_manifest(self, path):
+        try:
+            with open(os.path.join(path, 'manifest.json')) as f:
+                manifest = json.load(f)
+        except (FileNotFoundError, NotADirectoryError, ValueError):
+            return None
+        if manifest.get('version') != STORE_VERSION:
+            logger.warning("Ignoring dataset at %s: written by store version %s", path, manifest.get('version'))
+            return None
+        return manifest
+
+
+def _codes_dtype(n_categories):
+    # The code width pandas uses for this many categories, so reading needs no cast
+    for dtype in (np.int8, np.int16, np.int32):
+        if n_categories < np.iinfo(dtype).max:
+            return np.dtype(dtype)
+    return np.dtype(np.int64)
+
+
+def _swap(tmp_path, path):
+    # Swap directories; readers that still map the old files keep them until they close
+    old_path = path + '.old'
+    shutil.rmtree(old_path, ignore_errors=True)
+    if os.path.exists(path):
+        os.replace(path, old_path)
+    os.replace(tmp_path, path)
+    shutil.rmtree(old_path, ignore_errors=True)
+
+
+def _read_frame(path, columns, names, rows):
+    return _read_frame_of({i: _read_column(path, column, rows) for i, column in enumerate(columns)}, names, rows)
+
+
+def _read_frame_of(data, names, rows):
+    df = pd.DataFrame(data, index=pd.RangeIndex(rows), copy=False)
+    df.columns = names
+    return df
+
+
+def _write_column(path, i, series):
+    dtype = series.dtype
+    column = {'dtype': str(dtype)}
+    if isinstance(dtype, pd.CategoricalDtype):
+        codes, uniques = series.array.codes, np.asarray(series.cat.categories, dtype=object)
+        column['encoding'] = 'codes'
+        column['categorical'] = True
+        column['dtype'] = str(series.cat.categories.dtype)
+    elif isinstance(dtype, pd.DatetimeTZDtype):
+        column.update(encoding='datetime_tz', tz=str(dtype.tz), values=f'{i}.values.npy')
+        np.save(os.path.join(path, column['values']), series.dt.tz_convert('UTC').dt.tz_localize(None).to_numpy())
+        return column
+    elif isinstance(series.array, MASKED_ARRAYS):
+        column.update(encoding='masked', values=f'{i}.values.npy', mask=f'{i}.mask.npy')
+        values, mask = _masked_parts(series)
+        np.save(os.path.join(path, column['values']), values)
+        np.save(os.path.join(path, column['mask']), mask)
+        return column
+    elif isinstance(dtype, np.dtype) and dtype.kind in 'biufmM':
+        column.update(encoding='values', values=f'{i}.values.npy')
+        np.save(os.path.join(path, column['values']), series.to_numpy())
+        return column
+    else:
+        codes, uniques = pd.factorize(series)
+        uniques = np.asarray(uniques, dtype=object)
+        column['encoding'] = 'codes'
+    column.update(codes=f'{i}.codes.npy', uniques=f'{i}.uniques.pkl')
+    np.save(os.path.join(path, column['codes']), codes.astype(_codes_dtype(len(uniques))))
+    _write_pickle(os.path.join(path, column['uniques']), uniques)
+    return column
+
+
+def _encode_append(path, column, series):
+    """({file key: array to append}, new uniques or None), or None if the series does not fit."""
+    encoding = column['encoding']
+    if encoding == 'values':
+        if not (isinstance(series.dtype, np.dtype) and str(series.dtype) == column['dtype']):
+            return None
+        return {'values': series.to_numpy()}, None
+    if encoding == 'masked':
+        if str(series.dtype) != column['dtype']:
+            return None
+        values, mask = _masked_parts(series)
+        return {'values': values, 'mask': mask}, None
+    if encoding == 'datetime_tz':
+        if not isinstance(series.dtype, pd.DatetimeTZDtype):
+            return None
+        values = series.dt.tz_convert('UTC').dt.tz_localize(None).to_numpy()
+        stored = np.load(os.path.join(path, column['values']), mmap_mode='r').dtype
+        return ({'values': values}, None) if values.dtype == stored else None
+    # Codes: existing values keep their codes and new ones are numbered after them
+    categorical = isinstance(series.dtype, pd.CategoricalDtype)
+    dtype = series.cat.categories.dtype if categorical else series.dtype
+    if str(dtype) != column['dtype'] or categorical != column.get('categorical', False):
+        return None
+    with open(os.path.join(path, column['uniques']), 'rb') as f:
+        uniques = pickle.load(f)
+    codes, new_uniques = pd.factorize(series)
+    new_uniques = np.asarray(new_uniques, dtype=object)
+    mapping = pd.Index(uniques, dtype=object).get_indexer(new_uniques)
+    added = mapping < 0
+    mapping[added] = len(uniques) + np.arange(added.sum())
+    if added.any():
+        uniques = np.concatenate([uniques, new_uniques[added]])
+    if _codes_dtype(len(uniques)) != _codes_dtype(len(uniques) - added.sum()):
+        # Stored codes are too narrow for the new number of values
+        return None
+    codes = np.where(codes >= 0, mapping[codes], -1).astype(_codes_dtype(len(uniques)))
+    return {'codes': codes}, (uniques if added.any() else None)
+
+
+def _read_column(path, column, rows):
+    encoding = column['encoding']
+    if encoding == 'codes':
+        codes = np.load(os.path.join(path, column['codes']), mmap_mode='r')[:rows]
+        with open(os.path.join(path, column['uniques']), 'rb') as f:
+            uniques = pickle.load(f)
+        if not column.get('categorical'):
+            # Code -1 marks a missing value, which picks the trailing NaN
+            values = np.append(np.asarray(uniques, dtype=object), np.nan)[codes]
+            return pd.array(values, dtype=column['dtype'])
+        try:
+            categories = pd.Index(uniques, dtype=column['dtype'])
+        except (TypeError, ValueError):
+            categories = pd.Index(uniques, dtype=object)
+        return pd.Categorical.from_codes(codes, categories=categories, validate=False)
+    values = np.load(os.path.join(path, column['values']), mmap_mode='r')[:rows]
+    if encoding == 'masked':
+        mask = np.load(os.path.join(path, column['mask']), mmap_mode='r')[:rows]
+        return _masked_array(values, mask, column['dtype'])
+    if encoding == 'datetime_tz':
+        return pd.DatetimeIndex(values).tz_localize('UTC').tz_convert(column['tz']).array
+    return values
+
+
+def _masked_parts(series):
+    numpy_dtype = series.dtype.numpy_dtype
+    return series.to_numpy(dtype=numpy_dtype, na_value=numpy_dtype.type(0)), series.isna().to_numpy()
+
+
+def _masked_array(values, mask, dtype):
+    dtype = pd.api.types.pandas_dtype(dtype)
+    return dtype.construct_array_type()(values, mask)
+
+
+def _append_npy(file_path, values, rows):
+    """Append values to an NPY file holding at least rows items, rewriting its header in place.
+
+    False if the dtype differs or the new header would not fit the old one's space.
+    """
+    values = np.ascontiguousarray(values)
+    with open(file_path, 'r+b') as f:
+        version = np.lib.format.read_magic(f)
+        if version == (1, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+        else:
+            shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+        header_size = f.tell()
+        if dtype != values.dtype or dtype.hasobject or fortran_order or len(shape) != 1 or shape[0] < rows:
+            return False
+        header = io.BytesIO()
+        header_data = {'descr': np.lib.format.dtype_to_descr(dtype), 'fortran_order': False,
+                       'shape': (rows + len(values),)}
+        if version == (1, 0):
+            np.lib.format.write_array_header_1_0(header, header_data)
+        else:
+            np.lib.format.write_array_header_2_0(header, header_data)
+        if len(header.getvalue()) != header_size:
+            return False
+        # Data first, header last: until then readers still see the old length
+        f.seek(header_size + rows * dtype.itemsize)
+        f.truncate()
+        f.write(values.tobytes())
+        f.flush()
+        f.seek(0)
+        f.write(header.getvalue())
+    return True
+
+
+def _write_json(file_path, data):
+    # Write then rename so readers never see a half-written file
+    with open(file_path + '.tmp', 'w') as f:
+        json.dump(data, f, default=str)
+    os.replace(file_path + '.tmp', file_path)
+
+
+def _write_pickle(file_path, data):
+    with open(file_path + '.tmp', 'wb') as f:
+        pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(file_path + '.tmp', file_path)
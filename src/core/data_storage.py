@@ -1,71 +1,1234 @@
+import logging
+import os
+import threading
+from urllib.parse import quote
+
+import numpy as np
 import pandas as pd
 
+try:
+    from . import instrumentation
+    from .dataset_io import DEFAULT_EXPORT_DIR, FORMATS, read_export, read_manifest, write_export
+    from .format_parser import FormatParser, decimal_to_units, units_to_decimal
+    from .sheet_cache import HAS_PYARROW
+except ImportError:
+    import instrumentation
+    from dataset_io import DEFAULT_EXPORT_DIR, FORMATS, read_export, read_manifest, write_export
+    from format_parser import FormatParser, decimal_to_units, units_to_decimal
+    from sheet_cache import HAS_PYARROW
+
+logger = logging.getLogger(__name__)
+
+
+class HashIndex:
+    """Equality index: each distinct value maps to the positions of its rows.
+
+    Positions are kept grouped by value in one array, so a lookup returns a slice
+    (a view, in ascending row order) instead of scanning the column. Missing values
+    are not indexed, just as they never compare equal.
+    """
+    kind = 'hash'
+
+    def __init__(self, series):
+        codes, uniques = pd.factorize(series)
+        self.is_datetime = isinstance(series.dtype, pd.DatetimeTZDtype) or series.dtype.kind == 'M'
+        self.codes = {value: code for code, value in enumerate(uniques)}
+        valid = codes >= 0
+        self.positions = np.flatnonzero(valid)[np.argsort(codes[valid], kind='stable')]
+        self.offsets = np.zeros(len(uniques) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(codes[valid], minlength=len(uniques)), out=self.offsets[1:])
+
+    def lookup(self, value):
+        if self.is_datetime:
+            value = pd.Timestamp(value)
+        code = self.codes.get(value)
+        if code is None:
+            return self.positions[:0]
+        return self.positions[self.offsets[code]:self.offsets[code + 1]]
+
+
+class SortedIndex:
+    """Range index: the column's row positions sorted by value, searched with searchsorted.
+
+    Built for numeric and timezone-naive datetime columns. Missing values are left out.
+    """
+    kind = 'sorted'
+
+    def __init__(self, series):
+        valid = series.notna().to_numpy()
+        if isinstance(series.dtype, pd.api.extensions.ExtensionDtype) and series.dtype.kind in 'iuf':
+            # Nullable (masked) numbers, e.g. fixed-point amount units
+            values = series.to_numpy(dtype=series.dtype.numpy_dtype, na_value=0)
+        else:
+            values = series.to_numpy()
+        order = np.flatnonzero(valid)
+        order = order[np.argsort(values[valid], kind='stable')]
+        self.positions = order
+        self.values = values[order]
+
+    @staticmethod
+    def supports(series):
+        return series.dtype.kind in 'iufM'
+
+    def _coerce(self, value):
+        if self.values.dtype.kind == 'M':
+            return pd.Timestamp(value).to_datetime64()
+        return value
+
+    def lookup(self, value):
+        return self.range(value, value)
+
+    def range(self, low=None, high=None, low_inclusive=True, high_inclusive=True):
+        """Positions (in value order) of rows with low <= value <= high; None means unbounded."""
+        start, stop = 0, len(self.values)
+        if low is not None:
+            start = np.searchsorted(self.values, self._coerce(low), side='left' if low_inclusive else 'right')
+        if high is not None:
+            stop = np.searchsorted(self.values, self._coerce(high), side='right' if high_inclusive else 'left')
+        return self.positions[start:max(start, stop)]
+
+
+# Period codes for date group keys given as (column, period)
+PERIODS = {'day': 'D', 'month': 'M', 'quarter': 'Q', 'year': 'Y'}
+
+
+class AggregateCube:
+    """Materialized sum/count/min/max of measures grouped by fixed keys.
+
+    Keys are column names or (date column, period) pairs with period one of day,
+    month, quarter or year. The cube is updated incrementally with each batch of new
+    rows and answers aggregations over the same keys or any subset of them (a
+    coarser grouping) by rolling its groups up instead of scanning the rows.
+    """
+    AGGS = ('sum', 'count', 'min', 'max')
+    # How partial results combine into a total
+    COMBINE = {'sum': 'sum', 'count': 'sum', 'min': 'min', 'max': 'max'}
+
+    def __init__(self, group_by, measures):
+        self.group_by = list(group_by)
+        self.labels = [_key_label(key) for key in self.group_by]
+        self.measures = list(measures)
+        self.state = None
+        # Rolled-up states by requested key labels, valid until the next update
+        self._rollups = {}
+
+    def update(self, df):
+        if len(df) == 0:
+            return
+        self._rollups = {}
+        # Rows with missing keys are kept: a coarser grouping may not include that key
+        partial = df.groupby(_group_keys(df, self.group_by), dropna=False)[self.measures].agg(list(self.AGGS))
+        if self.state is None:
+            self.state = partial
+            return
+        combined = pd.concat([self.state, partial])
+        self.state = combined.groupby(level=self.labels, dropna=False).agg(
+            {column: self.COMBINE[column[1]] for column in combined.columns}
+        )
+
+    def answer(self, group_by, measures, agg_func):
+        """The aggregation as DataFrame.groupby would return it, or None if not covered."""
+        if agg_func not in self.AGGS + ('mean',) or self.state is None:
+            return None
+        labels = [_key_label(key) for key in group_by]
+        if not set(labels) <= set(self.labels) or not set(measures) <= set(self.measures):
+            return None
+        needed = ('sum', 'count') if agg_func == 'mean' else (agg_func,)
+        state = self._rollup(tuple(labels))
+        state = state[[(measure, agg) for measure in measures for agg in needed]]
+        if agg_func == 'mean':
+            return pd.DataFrame({
+                measure: state[(measure, 'sum')].astype('float64') / state[(measure, 'count')].replace(0, np.nan)
+                for measure in measures
+            })
+        return pd.DataFrame({measure: state[(measure, agg_func)] for measure in measures})
+
+    def _rollup(self, labels):
+        if labels not in self._rollups:
+            state = self.state
+            if list(labels) != self.labels:
+                # Roll the stored groups up to the coarser grouping
+                state = state.groupby(level=list(labels), dropna=False).agg(
+                    {column: self.COMBINE[column[1]] for column in state.columns}
+                )
+            # Like DataFrame.groupby, leave out groups with a missing key
+            present = np.ones(len(state), dtype=bool)
+            for level in range(state.index.nlevels):
+                present &= state.index.get_level_values(level).notna()
+            self._rollups[labels] = state[present]
+        return self._rollups[labels]
+
+
+class Segment:
+    """A run of rows of one partition, with its own indexes and min/max statistics.
+
+    Rows are never changed in place; an upsert marks the rows it replaces as
+    deleted, and compaction later rewrites the partition without them.
+    """
+
+    def __init__(self, key, frame, indexed):
+        self.key = key
+        self.frame = frame.reset_index(drop=True)
+        self.deleted = np.zeros(len(self.frame), dtype=bool)
+        self.live = len(self.frame)
+        self.indexes = {}
+        for column, kind in indexed.items():
+            self.build_index(column, kind)
+        # (min, max) of every numeric and datetime column, None if it has no values.
+        # Deleting rows leaves them as they are: wider bounds are still correct bounds.
+        self.stats = {}
+        for column in self.frame.columns:
+            series = self.frame[column]
+            if series.dtype.kind in 'iufM':
+                low, high = series.min(), series.max()
+                self.stats[column] = None if pd.isna(low) else (low, high)
+
+    def build_index(self, column, kind):
+        series = self.frame[column]
+        self.indexes[column] = SortedIndex(series) if kind == 'sorted' else HashIndex(series)
+
+    def delete(self, position):
+        if not self.deleted[position]:
+            self.deleted[position] = True
+            self.live -= 1
+
+    def rows(self):
+        return self.frame if self.live == len(self.frame) else self.frame[~self.deleted]
+
+    def live_positions(self, positions):
+        """Positions (all rows if None) that have not been deleted."""
+        if positions is None:
+            return np.flatnonzero(~self.deleted)
+        return positions[~self.deleted[positions]]
+
+    def may_match(self, predicates):
+        """False only if the statistics prove no row can satisfy every predicate."""
+        for column, op, operand in predicates:
+            if column in self.stats and not _stats_may_match(self.stats[column], op, operand):
+                return False
+        return True
+
+
+class PartitionedTable:
+    """A dataset split into partitions by a date column's period, each a list of Segments.
+
+    Appending adds one new segment per partition it touches, so only the new rows are
+    indexed and summarized; upserts also mark the rows they replace, found through a
+    key -> (segment, position) map. compact() merges a partition's segments into one
+    once they are small or carry deleted rows.
+    """
+
+    def __init__(self, partition_by):
+        self.partition_by = partition_by if isinstance(partition_by, tuple) else (partition_by, 'month')
+        self.partitions = {}
+        # Bumped on every change to a partition, so compaction can tell it raced one
+        self.versions = {}
+        self.indexed = {}
+        self.key_columns = None
+        self._keys = None
+        self._frame = None
+        self.columns = None
+        self.lock = threading.RLock()
+
+    def append(self, df):
+        with self.lock:
+            if self.columns is None:
+                self.columns = df.iloc[:0]
+            if len(df) == 0:
+                return
+            periods = _group_keys(df, [self.partition_by])[0]
+            for key, part in df.groupby(periods, dropna=False, sort=False):
+                key = None if pd.isna(key) else key
+                segment = Segment(key, part, self.indexed)
+                self.partitions.setdefault(key, []).append(segment)
+                self._touch(key)
+                if self._keys is not None:
+                    self._register_keys(segment)
+
+    def upsert(self, df, key_columns):
+        """Append df, first deleting stored rows with the same key; returns how many were replaced."""
+        with self.lock:
+            df = df.drop_duplicates(subset=key_columns, keep='last')
+            if self._keys is None or self.key_columns != list(key_columns):
+                self.key_columns = list(key_columns)
+                self._keys = {}
+                for segment in self.segments():
+                    self._register_keys(segment)
+            replaced = 0
+            for key in _row_keys(df, self.key_columns):
+                found = self._keys.get(key)
+                if found is not None and not found[0].deleted[found[1]]:
+                    found[0].delete(found[1])
+                    self._touch(found[0].key)
+                    replaced += 1
+            self.append(df)
+            return replaced
+
+    def create_index(self, column, kind):
+        with self.lock:
+            self.indexed[column] = kind
+            for segment in self.segments():
+                segment.build_index(column, kind)
+
+    def segments(self):
+        """Segments in partition order (rows without a date last), then insertion order."""
+        keys = sorted(self.partitions, key=lambda key: (key is None, key.ordinal if key is not None else 0))
+        return [segment for key in keys for segment in self.partitions[key]]
+
+    def frame(self):
+        """All live rows as one DataFrame, built once per change."""
+        with self.lock:
+            if self._frame is None:
+                parts = [segment.rows() for segment in self.segments()]
+                self._frame = pd.concat(parts, ignore_index=True) if parts else self.columns
+            return self._frame
+
+    def needs_compaction(self, key, compact_rows):
+        segments = self.partitions.get(key, [])
+        small = [segment for segment in segments if segment.live < compact_rows]
+        deleted = any(segment.live < len(segment.frame) for segment in segments)
+        return deleted or (len(segments) > 1 and len(small) > 0)
+
+    def compact(self, compact_rows):
+        """Merge the segments of every partition that needs it; returns the partitions merged.
+
+        The merged segment is built outside the lock, so queries and appends carry on
+        meanwhile; a partition that changed during the merge is left for the next run.
+        """
+        merged = []
+        with self.lock:
+            pending = [key for key in self.partitions if self.needs_compaction(key, compact_rows)]
+        for key in pending:
+            with self.lock:
+                version = self.versions.get(key)
+                segments = list(self.partitions.get(key, []))
+                parts = [segment.rows() for segment in segments]
+            if not segments:
+                continue
+            segment = Segment(key, pd.concat(parts, ignore_index=True), self.indexed)
+            with self.lock:
+                if self.versions.get(key) != version or set(self.indexed) != set(segment.indexes):
+                    continue
+                self.partitions[key] = [segment] if len(segment.frame) else []
+                if not self.partitions[key]:
+                    del self.partitions[key]
+                if self._keys is not None:
+                    self._register_keys(segment)
+                self._touch(key)
+                merged.append(key)
+        return merged
+
+    def partition_rows(self, key):
+        """Live rows of one partition, or None once it has none."""
+        with self.lock:
+            parts = [segment.rows() for segment in self.partitions.get(key, [])]
+            return pd.concat(parts, ignore_index=True) if parts else None
+
+    def _touch(self, key):
+        self.versions[key] = self.versions.get(key, 0) + 1
+        self._frame = None
+
+    def _register_keys(self, segment):
+        for position, key in enumerate(_row_keys(segment.frame, self.key_columns)):
+            if not segment.deleted[position]:
+                self._keys[key] = (segment, position)
+
+
 class DataStorage:
-    def __init__(self):
+    def __init__(self, compact_rows=100000, background_compaction=True, backend=None):
         self.data_frames = {}
         self.indexes = {}
         self.metadata = {}
+        # Fixed-point amount columns per dataset: column -> {'scale': ..., 'currency': ...}
+        self.amounts = {}
+        # Declared AggregateCubes per dataset
+        self.cubes = {}
+        # Date-partitioned datasets (PartitionedTable), kept instead of a data_frames entry
+        self.partitions = {}
+        # Partitions whose segments have fewer live rows than this get merged
+        self.compact_rows = compact_rows
+        self.background_compaction = background_compaction
+        self._compaction_lock = threading.Lock()
+        self._compaction_pending = set()
+        self._compactor = None
+        self._parser = None
+        # Optional ColumnStore that datasets are written through to and reopened from
+        self.backend = backend
+        # Partition versions of each partitioned dataset as last written to the backend
+        self._written = {}
+        if backend is not None:
+            for name in backend.names():
+                self._open(name)
+
+    def store_data(self, name, dataframe, metadata=None, amounts=None, partition_by=None):
+        """Store a dataset, replacing any previous one of that name.
 
-    def store_data(self, name, dataframe, metadata=None):
-        self.data_frames[name] = dataframe
+        amounts declares fixed-point amount columns, as a list of column names (scale
+        2) or a dict of column -> {'scale': int, 'currency': code}. They are stored as
+        nullable int64 minor units (numbers converted exactly, text parsed with
+        FormatParser), so sums stay exact and run natively. Every read path
+        (get_data, query_by_criteria, aggregate_data, load) returns them as Decimal
+        amounts, and filters take amounts too; pass units=True to any of them for the
+        stored Int64 minor units instead.
+
+        partition_by, a date column or (date column, period) pair (month by default),
+        stores the rows in date partitions instead of one frame: append_data and
+        upsert_data then only index and summarize the new rows, and queries skip
+        partitions whose min/max statistics rule them out.
+        """
+        self.amounts[name] = _amount_specs(amounts)
+        dataframe = self._to_units(dataframe, self.amounts[name])
+        self._written.pop(name, None)
+        if partition_by is not None:
+            if _key_column(partition_by) not in dataframe.columns:
+                logger.error("Partition column '%s' not found in dataset '%s'", _key_column(partition_by), name)
+                return
+            table = PartitionedTable(partition_by)
+            table.append(dataframe)
+            self.partitions[name] = table
+            self.data_frames.pop(name, None)
+        else:
+            self.data_frames[name] = dataframe
+            self.partitions.pop(name, None)
+        # Indexes describe the previous frame's rows
+        self.indexes.pop(name, None)
         self.metadata[name] = metadata if metadata is not None else {}
-        print(f"Stored data for {name}. Shape: {dataframe.shape}")
+        for cube in self.cubes.get(name, []):
+            cube.state = None
+            cube.update(dataframe)
+        self._persist(name)
+        instrumentation.increment('storage.rows_written', len(dataframe), dataset=name)
+        logger.info("Stored data for %s. Shape: %s", name, dataframe.shape)
 
-    def create_indexes(self, name, columns):
-        if name not in self.data_frames:
-            print(f"Error: Dataset {name} not found.")
+    def append_data(self, name, dataframe, metadata=None, amounts=None, partition_by=None):
+        """Add rows to a dataset, creating it if needed.
+
+        Partitioned datasets index the new rows only; indexes on other datasets are rebuilt.
+        """
+        if self._frame(name) is None:
+            self.store_data(name, dataframe.reset_index(drop=True), metadata, amounts, partition_by)
+            return
+        dataframe = self._to_units(dataframe, self.amounts.get(name, {}))
+        if metadata is not None:
+            self.metadata[name].update(metadata)
+        # The backend appends to its column files in place when the new rows fit them
+        persisted = (self.backend is not None and name not in self.partitions
+                     and self.backend.append(name, dataframe, metadata))
+        if name in self.partitions:
+            self.partitions[name].append(dataframe)
+            self._schedule_compaction(name)
+        else:
+            indexed = {column: index.kind for column, index in self.indexes.get(name, {}).items()}
+            self.data_frames[name] = pd.concat([self.data_frames[name], dataframe], ignore_index=True)
+            self.indexes.pop(name, None)
+            for column, kind in indexed.items():
+                self.create_indexes(name, [column], kind=kind)
+        if not persisted:
+            self._persist(name)
+        for cube in self.cubes.get(name, []):
+            cube.update(dataframe)
+        instrumentation.increment('storage.rows_written', len(dataframe), dataset=name)
+        logger.info("Appended %d rows to %s. Shape: %s", len(dataframe), name, self._frame(name).shape)
+
+    def upsert_data(self, name, dataframe, key_columns, metadata=None, amounts=None, partition_by=None):
+        """Insert rows, replacing stored rows that have the same values in key_columns.
+
+        Within dataframe the last row for a key wins. Returns the number of stored rows
+        replaced. Creates the dataset (see store_data) if it does not exist yet.
+        """
+        key_columns = list(key_columns)
+        missing = [column for column in key_columns if column not in dataframe.columns]
+        if missing:
+            logger.error("Key columns %s not found in the rows for dataset '%s'", missing, name)
+            return 0
+        if self._frame(name) is None:
+            dataframe = dataframe.drop_duplicates(subset=key_columns, keep='last', ignore_index=True)
+            self.store_data(name, dataframe, metadata, amounts, partition_by)
+            return 0
+        dataframe = self._to_units(dataframe, self.amounts.get(name, {}))
+        if name in self.partitions:
+            replaced = self.partitions[name].upsert(dataframe, key_columns)
+            self._schedule_compaction(name)
+        else:
+            dataframe = dataframe.drop_duplicates(subset=key_columns, keep='last')
+            stored = self.data_frames[name]
+            replace = pd.MultiIndex.from_frame(stored[key_columns]).isin(
+                pd.MultiIndex.from_frame(dataframe[key_columns]))
+            replaced = int(replace.sum())
+            indexed = {column: index.kind for column, index in self.indexes.get(name, {}).items()}
+            self.data_frames[name] = pd.concat([stored[~replace], dataframe], ignore_index=True)
+            self.indexes.pop(name, None)
+            for column, kind in indexed.items():
+                self.create_indexes(name, [column], kind=kind)
+        if metadata is not None:
+            self.metadata[name].update(metadata)
+        self._persist(name)
+        for cube in self.cubes.get(name, []):
+            if replaced:
+                # Replaced rows cannot be taken back out of min/max; rebuild from the rows
+                cube.state = None
+                cube.update(self._frame(name))
+            else:
+                cube.update(dataframe)
+        instrumentation.increment('storage.rows_written', len(dataframe), dataset=name)
+        instrumentation.increment('storage.rows_replaced', replaced, dataset=name)
+        logger.info("Upserted %d rows into %s (%d replaced). Shape: %s",
+                    len(dataframe), name, replaced, self._frame(name).shape)
+        return replaced
+
+    def _persist(self, name):
+        """Write a dataset through to the backend, leaving the frame in memory as it is.
+
+        Partitioned datasets only write the partitions that changed since they were
+        last written (all of them after store_data).
+        """
+        if self.backend is None:
+            return
+        table = self.partitions.get(name)
+        try:
+            if table is None:
+                self.backend.write(name, self._frame(name), self.metadata.get(name), self.amounts.get(name))
+                return
+            written = self._written.get(name)
+            with table.lock:
+                versions = dict(table.versions)
+                changed = {key: table.partition_rows(key) for key, version in versions.items()
+                           if written is None or written.get(key) != version}
+            self.backend.write_partitions(
+                name, {_partition_label(key): rows for key, rows in changed.items()}, table.columns,
+                self.metadata.get(name), self.amounts.get(name), list(table.partition_by), replace=written is None)
+            self._written[name] = versions
+        except Exception as e:
+            logger.error("Could not persist dataset '%s': %s", name, e)
+            self._written.pop(name, None)
+
+    def _open(self, name):
+        try:
+            df, manifest = self.backend.read(name)
+        except Exception as e:
+            logger.error("Could not open stored dataset '%s': %s", name, e)
+            return
+        self.metadata[name] = manifest['metadata']
+        self.amounts[name] = manifest['amounts']
+        if manifest['partition_by'] is not None:
+            table = PartitionedTable(tuple(manifest['partition_by']))
+            table.append(df)
+            self.partitions[name] = table
+            self._written[name] = dict(table.versions)
+        else:
+            self.data_frames[name] = df
+
+    def compact(self, name=None):
+        """Merge small segments of a partitioned dataset (all of them if name is None) now.
+
+        append_data and upsert_data already schedule this on a background thread
+        unless the storage was created with background_compaction=False.
+        """
+        names = [name] if name is not None else list(self.partitions)
+        return {
+            name: self.partitions[name].compact(self.compact_rows)
+            for name in names if name in self.partitions
+        }
+
+    def _schedule_compaction(self, name):
+        if not self.background_compaction:
+            return
+        with self._compaction_lock:
+            self._compaction_pending.add(name)
+            if self._compactor is None:
+                self._compactor = threading.Thread(target=self._run_compaction, daemon=True)
+                self._compactor.start()
+
+    def _run_compaction(self):
+        while True:
+            with self._compaction_lock:
+                if not self._compaction_pending:
+                    self._compactor = None
+                    return
+                name = self._compaction_pending.pop()
+            table = self.partitions.get(name)
+            if table is None:
+                continue
+            try:
+                with instrumentation.timed('storage.compact', dataset=name):
+                    table.compact(self.compact_rows)
+            except Exception as e:
+                logger.error("Error compacting dataset '%s': %s", name, e)
+
+    def create_indexes(self, name, columns, kind='auto'):
+        """Build an index on each column of a stored dataset.
+
+        kind is 'hash' (equality lookups), 'sorted' (equality and range lookups, for
+        numeric and datetime columns) or 'auto', which picks 'sorted' where the column
+        supports it and 'hash' otherwise. query_by_criteria uses them automatically.
+        Partitioned datasets keep one index per segment.
+        """
+        df = self._frame(name)
+        if df is None:
+            logger.error("Dataset %s not found.", name)
             return
         
-        df = self.data_frames[name]
-        self.indexes[name] = {}
+        self.indexes.setdefault(name, {})
         for col in columns:
             if col in df.columns:
-                # For simplicity, we'll just store the column itself as an 'index'
-                # In a real system, this would involve more complex indexing structures (e.g., B-trees, hash maps)
-                self.indexes[name][col] = df[col]
-                print(f"Created index for column '{col}' in dataset '{name}'")
+                series = df[col]
+                index_kind = kind
+                if kind == 'auto':
+                    index_kind = 'sorted' if SortedIndex.supports(series) else 'hash'
+                try:
+                    if name in self.partitions:
+                        self.partitions[name].create_index(col, index_kind)
+                    elif index_kind == 'sorted':
+                        self.indexes[name][col] = SortedIndex(series)
+                    else:
+                        self.indexes[name][col] = HashIndex(series)
+                except TypeError as e:
+                    # e.g. unhashable or mutually incomparable cell values
+                    logger.warning("Could not index column '%s' in dataset '%s': %s", col, name, e)
+                    continue
+                logger.info("Created %s index for column '%s' in dataset '%s'", index_kind, col, name)
             else:
-                print(f"Warning: Column '{col}' not found in dataset '{name}'")
+                logger.warning("Column '%s' not found in dataset '%s'", col, name)
+
+    def query_by_criteria(self, name, filters=None, units=False):
+        """Rows matching every filter, in their original order.
+
+        filters is a dict of column -> value (equality) or column -> (op, operand), or
+        a list of (column, op, operand) triples. Operators: ==, !=, <, <=, >, >=,
+        between (operand (low, high), inclusive), in, not in, startswith, isnull and
+        notnull (operand ignored). Index-backed predicates are resolved first, most
+        selective first; the rest are evaluated only on the rows that survived, in
+        order of estimated selectivity. The stored frame is never copied whole.
+
+        Partitioned datasets return rows in partition order with a fresh index, and
+        skip partitions whose min/max statistics exclude the filters.
 
-    def query_by_criteria(self, name, filters=None):
+        Amount columns come back as Decimal amounts, converted for the matching rows
+        only, or as Int64 minor units with units=True.
+        """
+        with instrumentation.timed('storage.query', dataset=name):
+            return self._amounts_out(self._query(name, filters), self.amounts.get(name), units)
+
+    def _query(self, name, filters):
+        if name in self.partitions:
+            return self._query_partitioned(name, filters)
         if name not in self.data_frames:
-            print(f"Error: Dataset {name} not found.")
+            logger.error("Dataset %s not found.", name)
             return pd.DataFrame()
 
         df = self.data_frames[name]
         if filters is None:
             return df
+        steps = self._plan_query(name, filters)
+        if steps is None:
+            return pd.DataFrame()
+        positions = _execute_plan(df, steps)
+        if positions is None:
+            return df
+        return df.iloc[positions]
 
-        filtered_df = df.copy()
-        for column, value in filters.items():
-            if column in filtered_df.columns:
-                filtered_df = filtered_df[filtered_df[column] == value]
-            else:
-                print(f"Warning: Filter column '{column}' not found in dataset '{name}'")
-        return filtered_df
+    def _query_partitioned(self, name, filters):
+        table = self.partitions[name]
+        if filters is None:
+            return table.frame()
+        predicates = self._predicates(name, filters, table.columns.columns)
+        if predicates is None:
+            return pd.DataFrame()
+        with table.lock:
+            parts = []
+            for segment in table.segments():
+                if not segment.may_match(predicates):
+                    continue
+                steps = _plan_predicates(segment.frame, segment.indexes, predicates)
+                positions = segment.live_positions(_execute_plan(segment.frame, steps))
+                if len(positions):
+                    parts.append(segment.frame.iloc[positions])
+        return pd.concat(parts, ignore_index=True) if parts else table.columns
+
+    def explain_query(self, name, filters):
+        """The plan query_by_criteria would run: one entry per predicate, in execution order.
 
-    def aggregate_data(self, name, group_by, measures, agg_func='sum'):
+        For a partitioned dataset, one entry per segment instead: its partition, row
+        count, whether the statistics pruned it, and the plan run on it.
+        """
+        if name in self.partitions:
+            table = self.partitions[name]
+            predicates = self._predicates(name, filters, table.columns.columns)
+            if predicates is None:
+                return []
+            with table.lock:
+                return [{
+                    'partition': None if segment.key is None else str(segment.key),
+                    'rows': segment.live,
+                    'pruned': not segment.may_match(predicates),
+                    'steps': [] if not segment.may_match(predicates) else _describe_steps(
+                        _plan_predicates(segment.frame, segment.indexes, predicates)),
+                } for segment in table.segments()]
         if name not in self.data_frames:
-            print(f"Error: Dataset {name} not found.")
-            return pd.DataFrame()
+            logger.error("Dataset %s not found.", name)
+            return []
+        return _describe_steps(self._plan_query(name, filters) or [])
 
+    def _plan_query(self, name, filters):
         df = self.data_frames[name]
-        if not all(col in df.columns for col in group_by):
-            print(f"Error: One or more group_by columns not found in dataset '{name}'")
+        predicates = self._predicates(name, filters, df.columns)
+        if predicates is None:
+            return None
+        return _plan_predicates(df, self.indexes.get(name, {}), predicates)
+
+    def _predicates(self, name, filters, columns):
+        """Normalized predicates on existing columns, operands in stored units; None if invalid."""
+        try:
+            predicates = _normalize_filters(filters)
+        except ValueError as e:
+            logger.error("%s", e)
+            return None
+        valid = []
+        for column, op, operand in predicates:
+            if column in columns:
+                valid.append((column, op, operand))
+            else:
+                logger.warning("Filter column '%s' not found in dataset '%s'", column, name)
+        return _operands_to_units(valid, self.amounts.get(name, {}))
+
+    def _frame(self, name):
+        """A dataset's rows as one DataFrame, or None if there is no such dataset."""
+        if name in self.partitions:
+            return self.partitions[name].frame()
+        return self.data_frames.get(name)
+
+    def _to_units(self, dataframe, specs):
+        converted = {}
+        for column, spec in specs.items():
+            if column in dataframe.columns and not isinstance(dataframe[column].dtype, pd.Int64Dtype):
+                # Numeric columns convert arithmetically, text columns through the parser
+                if self._parser is None:
+                    self._parser = FormatParser()
+                converted[column] = self._parser.parse_amount_units(dataframe[column], spec['scale'])
+        return dataframe.assign(**converted) if converted else dataframe
+
+    def declare_aggregate(self, name, group_by, measures):
+        """Materialize sum/count/min/max of measures by group_by for a dataset.
+
+        group_by entries are column names or (date column, period) pairs, e.g.
+        ['Account', ('Date', 'month')]. The cube is built now, kept up to date by
+        append_data, upsert_data and store_data, and used by aggregate_data for the
+        same or a coarser grouping.
+        """
+        df = self._frame(name)
+        if df is None:
+            logger.error("Dataset %s not found.", name)
+            return None
+        if not all(_key_column(key) in df.columns for key in group_by):
+            logger.error("One or more group_by columns not found in dataset '%s'", name)
+            return None
+        if not all(col in df.columns for col in measures):
+            logger.error("One or more measure columns not found in dataset '%s'", name)
+            return None
+        cube = AggregateCube(group_by, measures)
+        cube.update(df)
+        self.cubes.setdefault(name, []).append(cube)
+        logger.info("Declared aggregate of %s by %s on dataset '%s'", measures, cube.labels, name)
+        return cube
+
+    def aggregate_data(self, name, group_by, measures, agg_func='sum', units=False):
+        """Group a dataset and aggregate measures, like DataFrame.groupby(...).agg(agg_func).
+
+        group_by entries are column names or (date column, period) pairs. sum, count,
+        min, max and mean are answered from a declared aggregate when one covers the
+        grouping and measures; other requests scan the rows.
+
+        Sums, minima and maxima of amount columns come back as Decimal amounts and
+        means as float amounts; units=True leaves every result in minor units.
+        """
+        with instrumentation.timed('storage.aggregate', dataset=name):
+            return self._aggregate(name, group_by, measures, agg_func, {} if units else self.amounts.get(name, {}))
+
+    def _aggregate(self, name, group_by, measures, agg_func, specs):
+        df = self._frame(name)
+        if df is None:
+            logger.error("Dataset %s not found.", name)
+            return pd.DataFrame()
+
+        if not all(_key_column(key) in df.columns for key in group_by):
+            logger.error("One or more group_by columns not found in dataset '%s'", name)
             return pd.DataFrame()
         if not all(col in df.columns for col in measures):
-            print(f"Error: One or more measure columns not found in dataset '{name}'")
+            logger.error("One or more measure columns not found in dataset '%s'", name)
             return pd.DataFrame()
 
+        if isinstance(agg_func, str):
+            for cube in self.cubes.get(name, []):
+                result = cube.answer(group_by, measures, agg_func)
+                if result is not None:
+                    instrumentation.increment('cache.hits', cache='aggregate_cube')
+                    return _units_result(result, specs, agg_func)
+            if self.cubes.get(name):
+                instrumentation.increment('cache.misses', cache='aggregate_cube')
         try:
-            return df.groupby(group_by)[measures].agg(agg_func)
+            result = df.groupby(_group_keys(df, group_by))[measures].agg(agg_func)
         except Exception as e:
-            print(f"Error during aggregation: {e}")
+            logger.error("Error during aggregation: %s", e)
             return pd.DataFrame()
+        # Fixed-point measures are summed as integers; they become Decimal only here
+        return _units_result(result, specs, agg_func)
 
-    def get_data(self, name):
-        return self.data_frames.get(name)
+    def export(self, name, format='parquet', partition_by=None, path=None, row_group_size=65536):
+        """Write a dataset to data/processed/exports/<name> (or path) for other jobs to read.
+
+        format is 'parquet' or 'feather' (both need pyarrow) or 'csv'. partition_by
+        takes keys like declare_aggregate's group_by, e.g. ['Account', ('Date', 'month')],
+        and lays the files out in hive-style directories (Account=.../Date_month=2024-01/).
+        Parquet is written in row groups of row_group_size rows, whose min/max
+        statistics let load skip them. Amount columns are written as minor units,
+        with their specs in the export's manifest. Returns the export directory, or
+        None on failure.
+        """
+        df = self._frame(name)
+        if df is None:
+            logger.error("Dataset %s not found.", name)
+            return None
+        if format not in FORMATS:
+            logger.error("Unknown export format '%s'; use one of %s", format, ', '.join(FORMATS))
+            return None
+        if format != 'csv' and not HAS_PYARROW:
+            logger.error("Exporting to %s needs pyarrow; install it or use format='csv'", format)
+            return None
+        keys = _partition_keys(partition_by)
+        if not all(_key_column(key) in df.columns for key in keys):
+            logger.error("One or more partition_by columns not found in dataset '%s'", name)
+            return None
+        path = path or os.path.join(DEFAULT_EXPORT_DIR, quote(str(name), safe=''))
+        with instrumentation.timed('storage.export', dataset=name, format=format):
+            # Categorical columns are written as their values
+            df = df.astype({
+                column: df[column].cat.categories.dtype
+                for column in df.columns if isinstance(df[column].dtype, pd.CategoricalDtype)
+            })
+            try:
+                partitions = pd.DataFrame(
+                    {_partition_field(key): values for key, values in zip(keys, _group_keys(df, keys))},
+                    index=df.index,
+                )
+                write_export(path, df, format, partitions, {
+                    'name': name,
+                    'rows': len(df),
+                    'names': list(df.columns),
+                    'dtypes': {column: str(dtype) for column, dtype in df.dtypes.items()},
+                    'metadata': self.metadata.get(name, {}),
+                    'amounts': self.amounts.get(name, {}),
+                    'fields': {_partition_field(key): list(key) if isinstance(key, tuple) else [key, None]
+                               for key in keys},
+                }, row_group_size)
+            except Exception as e:
+                logger.error("Could not export dataset '%s' to %s: %s", name, path, e)
+                return None
+        instrumentation.increment('storage.rows_exported', len(df), dataset=name, format=format)
+        logger.info("Exported %d rows of %s to %s as %s", len(df), name, path, format)
+        return path
+
+    def load(self, name, columns=None, filters=None, path=None, store_as=None, units=False):
+        """Read an export of a dataset back, reading only the columns and rows asked for.
+
+        filters take the query_by_criteria forms and are pushed down to the files:
+        partition directories whose keys rule them out are never opened, Parquet row
+        groups are skipped by their statistics, and only the requested (and filtered)
+        columns are decoded. What is read is then filtered exactly as
+        query_by_criteria would. Returns the rows, leaving stored datasets alone;
+        with store_as they are also stored as that dataset, with the export's metadata
+        and amount columns. A partial read stored as name itself replaces the full
+        dataset, so give it a name of its own unless that is intended.
+
+        Amount columns come back as Decimal amounts, or as Int64 minor units with
+        units=True.
+        """
+        path = path or os.path.join(DEFAULT_EXPORT_DIR, quote(str(name), safe=''))
+        manifest = read_manifest(path)
+        if manifest is None:
+            logger.error("No export of dataset %s found at %s", name, path)
+            return pd.DataFrame()
+        if manifest['format'] != 'csv' and not HAS_PYARROW:
+            logger.error("Reading a %s export needs pyarrow", manifest['format'])
+            return pd.DataFrame()
+        names = manifest['names']
+        columns = list(names if columns is None else columns)
+        for column in columns:
+            if column not in names:
+                logger.warning("Column '%s' not found in the export of '%s'", column, name)
+        columns = [column for column in columns if column in names]
+        try:
+            predicates = _normalize_filters(filters) if filters is not None else []
+        except ValueError as e:
+            logger.error("%s", e)
+            return pd.DataFrame()
+        for column, _, _ in predicates:
+            if column not in names:
+                logger.warning("Filter column '%s' not found in the export of '%s'", column, name)
+        amounts = manifest['amounts']
+        predicates = _operands_to_units([predicate for predicate in predicates if predicate[0] in names], amounts)
+        read_columns = columns + [column for column, _, _ in predicates if column not in columns]
+        with instrumentation.timed('storage.load', dataset=name, format=manifest['format']):
+            try:
+                df = read_export(path, manifest, list(dict.fromkeys(read_columns)), predicates,
+                                 _partition_predicates(predicates, manifest), _filter_rows)
+            except Exception as e:
+                logger.error("Could not load the export of '%s' from %s: %s", name, path, e)
+                return pd.DataFrame()
+        df = df[columns].reset_index(drop=True)
+        instrumentation.increment('storage.rows_loaded', len(df), dataset=name, format=manifest['format'])
+        if store_as is None:
+            return self._amounts_out(df, amounts, units)
+        self.store_data(store_as, df, manifest['metadata'],
+                        {column: spec for column, spec in amounts.items() if column in columns})
+        return self.get_data(store_as, units)
+
+    def get_data(self, name, units=False):
+        """The stored frame, with amount columns as Decimal amounts (a copy) unless units=True."""
+        return self._amounts_out(self._frame(name), self.amounts.get(name), units)
+
+    @staticmethod
+    def _amounts_out(df, specs, units):
+        """df as returned to callers: amount columns as Decimal, or left in minor units."""
+        if df is None or units or not specs:
+            return df
+        converted = {column: _units_to_decimals(df[column], spec['scale'])
+                     for column, spec in specs.items() if column in df.columns}
+        return df.assign(**converted) if converted else df
+
+    def get_amount_info(self, name):
+        """Scale and currency of each fixed-point amount column of a dataset."""
+        return self.amounts.get(name, {})
 
     def get_metadata(self, name):
         return self.metadata.get(name)
 
+
+def _key_column(key):
+    return key[0] if isinstance(key, tuple) else key
+
+
+def _key_label(key):
+    return f"{key[0]}:{key[1]}" if isinstance(key, tuple) else key
+
+
+def _partition_keys(partition_by):
+    """export's partition_by as a list of keys; one key may be given on its own."""
+    if partition_by is None:
+        return []
+    if isinstance(partition_by, (str, tuple)):
+        return [partition_by]
+    return [tuple(key) if isinstance(key, list) else key for key in partition_by]
+
+
+def _partition_label(key):
+    # A PartitionedTable key as a ColumnStore partition name; rows without a date have key None
+    return 'none' if key is None else str(key)
+
+
+def _partition_field(key):
+    """Directory name of a partition key, e.g. Date_month for ('Date', 'month')."""
+    return f"{key[0]}_{key[1]}" if isinstance(key, tuple) else key
+
+
+def _partition_predicates(predicates, manifest):
+    """Predicates on an export's partition keys, compared as strings, implied by predicates on its columns.
+
+    A key holding a column's values as they are can take the column's predicates
+    when they compare text with text. A date period key (e.g. 2024-01 for a month)
+    holds labels that sort like the dates, so date comparisons become label ones.
+    """
+    implied = []
+    for field, (column, period) in manifest['fields'].items():
+        for predicate_column, op, operand in predicates:
+            if predicate_column != column:
+                continue
+            if period is None:
+                if _compares_text(op, operand):
+                    implied.append((field, op, operand))
+                continue
+            try:
+                implied.extend(_period_predicates(field, PERIODS[period], op, operand))
+            except (KeyError, TypeError, ValueError):
+                # Not a date the period labels can be compared with; the rows decide
+                continue
+    return implied
+
+
+def _compares_text(op, operand):
+    if op in ('isnull', 'notnull'):
+        return True
+    values = operand if op in ('between', 'in', 'not in') else [operand]
+    return all(isinstance(value, str) for value in values)
+
+
+def _period_predicates(field, freq, op, operand):
+    def label(value):
+        return str(pd.Timestamp(value).to_period(freq))
+
+    if op == '==':
+        return [(field, '==', label(operand))]
+    if op == 'in':
+        return [(field, 'in', [label(value) for value in operand])]
+    if op == 'between':
+        return [(field, 'between', (label(operand[0]), label(operand[1])))]
+    # A partial period at either end still has to be read
+    if op in ('<', '<='):
+        return [(field, '<=', label(operand))]
+    if op in ('>', '>='):
+        return [(field, '>=', label(operand))]
+    if op in ('isnull', 'notnull'):
+        return [(field, op, None)]
+    return []
+
+
+def _filter_rows(df, predicates):
+    positions = _execute_plan(df, _plan_predicates(df, {}, predicates))
+    return df if positions is None else df.iloc[positions]
+
+
+def _group_keys(df, group_by):
+    """groupby keys for column names and (date column, period) pairs."""
+    keys = []
+    for key in group_by:
+        if isinstance(key, tuple):
+            column, period = key
+            if period not in PERIODS:
+                raise ValueError(f"Unknown period '{period}'; use one of {', '.join(PERIODS)}")
+            keys.append(pd.to_datetime(df[column]).dt.to_period(PERIODS[period]).rename(_key_label(key)))
+        elif isinstance(df[key].dtype, pd.CategoricalDtype):
+            # Group Categoricals by the values themselves, sorted as they would be in an
+            # ordinary column
+            categories = df[key].cat.categories
+            keys.append(df[key].astype(categories.dtype))
+        else:
+            keys.append(df[key])
+    return keys
+
+
+def _amount_specs(amounts):
+    if not amounts:
+        return {}
+    if not isinstance(amounts, dict):
+        amounts = {column: {} for column in amounts}
+    return {
+        column: {'scale': spec.get('scale', 2), 'currency': spec.get('currency')}
+        for column, spec in amounts.items()
+    }
+
+
+def _units_result(result, specs, agg_func):
+    """Turn aggregated minor units back into amounts.
+
+    sum, min, max, first and last of units are exact, so they become Decimal; count,
+    size and nunique stay counts; anything else (mean, std, ...) becomes float in
+    major units. Results of list or dict agg_func specs are left in units.
+    """
+    if not isinstance(agg_func, str):
+        return result
+    for column, spec in specs.items():
+        if column not in result.columns or agg_func in ('count', 'size', 'nunique'):
+            continue
+        if agg_func in ('sum', 'min', 'max', 'first', 'last'):
+            result[column] = [units_to_decimal(units, spec['scale']) for units in result[column]]
+        else:
+            result[column] = result[column].astype('float64') / 10 ** spec['scale']
+    return result
+
+
+def _units_to_decimals(values, scale):
+    """An object Series of Decimal amounts (None where missing) for minor units."""
+    if not isinstance(values.dtype, pd.Int64Dtype):
+        return values
+    return pd.Series([units_to_decimal(units, scale) for units in values.to_numpy(dtype=object, na_value=None)],
+                     index=values.index, name=values.name, dtype=object)
+
+
+def _operands_to_units(predicates, specs):
+    """Rewrite operands on fixed-point columns from amounts to minor units."""
+    if not specs:
+        return predicates
+    converted = []
+    for column, op, operand in predicates:
+        if column in specs and op not in ('isnull', 'notnull', 'startswith') and operand is not None:
+            scale = specs[column]['scale']
+            if op == 'between':
+                operand = tuple(decimal_to_units(value, scale) for value in operand)
+            elif op in ('in', 'not in'):
+                operand = [decimal_to_units(value, scale) for value in operand]
+            else:
+                operand = decimal_to_units(operand, scale)
+        converted.append((column, op, operand))
+    return converted
+
+
+OPERATORS = ('==', '!=', '<', '<=', '>', '>=', 'between', 'in', 'not in', 'startswith', 'isnull', 'notnull')
+
+# Rough fraction of rows each operator keeps, used to order predicates that have no
+# index (index-backed predicates are costed with their exact match count)
+_SELECTIVITY = {
+    '==': 0.05, 'in': 0.1, 'isnull': 0.1, 'startswith': 0.2, 'between': 0.25,
+    '<': 0.4, '<=': 0.4, '>': 0.4, '>=': 0.4, 'not in': 0.9, '!=': 0.95, 'notnull': 0.9,
+}
+
+
+def _row_keys(df, key_columns):
+    return list(zip(*(df[column].tolist() for column in key_columns)))
+
+
+def _stats_may_match(stats, op, operand):
+    """Whether a column with these (min, max) statistics can have a row satisfying the predicate."""
+    if op not in ('==', '<', '<=', '>', '>=', 'between', 'in'):
+        return True
+    if stats is None:
+        # No values at all, and missing values never compare true
+        return False
+    low, high = stats
+    try:
+        if isinstance(low, pd.Timestamp):
+            if op == 'between':
+                operand = tuple(pd.Timestamp(value) for value in operand)
+            elif op == 'in':
+                operand = [pd.Timestamp(value) for value in operand]
+            else:
+                operand = pd.Timestamp(operand)
+        if op == '==':
+            return bool(low <= operand <= high)
+        if op == 'in':
+            return any(bool(low <= value <= high) for value in operand)
+        if op == 'between':
+            return bool(operand[0] <= high and operand[1] >= low)
+        if op == '<':
+            return bool(low < operand)
+        if op == '<=':
+            return bool(low <= operand)
+        if op == '>':
+            return bool(high > operand)
+        return bool(high >= operand)
+    except (TypeError, ValueError):
+        # Not comparable with the statistics; let the rows decide
+        return True
+
+
+def _describe_steps(steps):
+    return [
+        {key: step[key] for key in ('column', 'op', 'operand', 'access', 'estimated_rows')}
+        for step in steps
+    ]
+
+
+def _normalize_filters(filters):
+    """(column, op, operand) triples from either accepted filter form."""
+    if isinstance(filters, dict):
+        items = []
+        for column, value in filters.items():
+            if isinstance(value, tuple) and value and isinstance(value[0], str) and value[0] in OPERATORS:
+                items.append((column,) + value)
+            else:
+                items.append((column, '==', value))
+    else:
+        items = [tuple(item) for item in filters]
+    predicates = []
+    for item in items:
+        if len(item) not in (2, 3) or item[1] not in OPERATORS:
+            raise ValueError(f"Unsupported filter {item!r}; operators are {', '.join(OPERATORS)}")
+        column, op, operand = item if len(item) == 3 else item + (None,)
+        if op == 'between' and (not isinstance(operand, (tuple, list)) or len(operand) != 2):
+            raise ValueError(f"'between' on '{column}' needs a (low, high) operand")
+        predicates.append((column, op, operand))
+    return predicates
+
+
+def _index_lookup(index, op, operand):
+    """Row positions an index answers for a predicate, or None if it cannot."""
+    if op in ('==', 'in'):
+        values = operand if op == 'in' else [operand]
+        found = [index.lookup(value) for value in values]
+        return np.concatenate(found) if found else np.empty(0, dtype=np.int64)
+    if index.kind != 'sorted':
+        return None
+    if op == 'between':
+        return index.range(operand[0], operand[1])
+    if op in ('>', '>='):
+        return index.range(low=operand, low_inclusive=op == '>=')
+    if op in ('<', '<='):
+        return index.range(high=operand, high_inclusive=op == '<=')
+    return None
+
+
+def _plan_predicates(df, indexes, predicates):
+    """Order predicates for execution: index lookups by match count, then scans by estimated selectivity."""
+    indexed, scanned = [], []
+    for column, op, operand in predicates:
+        step = {'column': column, 'op': op, 'operand': operand, 'access': 'scan', 'positions': None}
+        index = indexes.get(column)
+        if index is not None:
+            try:
+                step['positions'] = _index_lookup(index, op, operand)
+            except (TypeError, ValueError):
+                # Operands the index cannot compare (e.g. unhashable); scan instead
+                step['positions'] = None
+        if step['positions'] is not None:
+            step['access'] = f"{index.kind} index"
+            step['estimated_rows'] = len(step['positions'])
+            indexed.append(step)
+        else:
+            step['estimated_rows'] = int(len(df) * _SELECTIVITY[op])
+            scanned.append(step)
+    return sorted(indexed, key=lambda step: step['estimated_rows']) + sorted(
+        scanned, key=lambda step: step['estimated_rows'])
+
+
+def _execute_plan(df, steps):
+    """Sorted row positions satisfying every step, or None when there were no predicates."""
+    positions = None
+    for step in steps:
+        if positions is not None and len(positions) == 0:
+            break
+        # Intersecting a large index result costs more than checking the few surviving rows
+        if step['positions'] is not None and (positions is None or len(step['positions']) <= 4 * len(positions)):
+            found = np.unique(step['positions'])
+            positions = found if positions is None else np.intersect1d(positions, found, assume_unique=True)
+            continue
+        values = df[step['column']]
+        if positions is not None:
+            values = values.iloc[positions]
+        mask = _predicate_mask(values, step['op'], step['operand'])
+        positions = np.flatnonzero(mask) if positions is None else positions[mask]
+    return positions
+
+
+def _predicate_mask(values, op, operand):
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        # Evaluate once per distinct value (plus one missing value, code -1) and map by code
+        categories = values.cat.categories
+        distinct = pd.Series(np.append(np.asarray(categories, dtype=object), np.nan), dtype=categories.dtype
+                             if categories.dtype == object or pd.api.types.is_string_dtype(categories.dtype)
+                             else object)
+        return _predicate_mask(distinct, op, operand)[values.cat.codes.to_numpy()]
+    if op == '==':
+        mask = values == operand
+    elif op == '!=':
+        mask = values != operand
+    elif op == '<':
+        mask = values < operand
+    elif op == '<=':
+        mask = values <= operand
+    elif op == '>':
+        mask = values > operand
+    elif op == '>=':
+        mask = values >= operand
+    elif op == 'between':
+        mask = values.between(operand[0], operand[1])
+    elif op == 'in':
+        mask = values.isin(list(operand))
+    elif op == 'not in':
+        mask = ~values.isin(list(operand))
+    elif op == 'startswith':
+        if not (values.dtype == object or pd.api.types.is_string_dtype(values.dtype)):
+            values = values.astype(str)
+        mask = values.str.startswith(operand, na=False)
+    elif op == 'isnull':
+        mask = values.isna()
+    else:
+        mask = values.notna()
+    return mask.to_numpy(dtype=bool, na_value=False)
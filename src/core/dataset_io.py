@@ -0,0 +1,267 @@
+
+import json
+import logging
+import os
+import shutil
+from urllib.parse import quote, unquote
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_EXPORT_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), '..', '..', 'data', 'processed', 'exports'
+)
+
+FORMATS = ('parquet', 'feather', 'csv')
+
+# Bump whenever the export layout changes, so older exports are rejected instead of misread
+EXPORT_VERSION = 1
+
+# Directory value for a missing partition key, as pyarrow's hive partitioning writes it
+NULL_PARTITION = '__HIVE_DEFAULT_PARTITION__'
+
+# The leading underscore keeps pyarrow's dataset discovery from reading it as data
+MANIFEST = '_manifest.json'
+
+
+def write_export(path, df, fmt, partitions, manifest, row_group_size=65536):
+    """Write df as an export directory at path, replacing any previous one.
+
+    partitions is a frame of partition key values aligned with df, one column per
+    key (none for an unpartitioned export); files go into hive-style directories,
+    key=value/..., one level per key. A key named like a column of df takes that
+    column's place, as in hive tables: its values live only in the directory names.
+    Parquet files are written in row groups of at most row_group_size rows.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format {fmt!r}; use one of {', '.join(FORMATS)}")
+    df = df.reset_index(drop=True)
+    partitions = partitions.reset_index(drop=True)
+    data = df.drop(columns=[column for column in partitions.columns if column in df.columns])
+    tmp_path = path + '.tmp'
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+    if fmt == 'csv':
+        _write_csv(tmp_path, data, partitions)
+    else:
+        _write_arrow(tmp_path, data, partitions, fmt, row_group_size)
+    _write_json(os.path.join(tmp_path, MANIFEST), dict(manifest, version=EXPORT_VERSION, format=fmt,
+                                                       partitions=list(partitions.columns)))
+    # Swap directories, as ColumnStore.write does
+    old_path = path + '.old'
+    shutil.rmtree(old_path, ignore_errors=True)
+    if os.path.exists(path):
+        os.replace(path, old_path)
+    os.replace(tmp_path, path)
+    shutil.rmtree(old_path, ignore_errors=True)
+
+
+def read_manifest(path):
+    """The manifest of the export at path, or None if there is no readable export there."""
+    try:
+        with open(os.path.join(path, MANIFEST)) as f:
+            manifest = json.load(f)
+    except (FileNotFoundError, NotADirectoryError, ValueError):
+        return None
+    if manifest.get('version') != EXPORT_VERSION:
+        logger.warning("Ignoring export at %s: written by export version %s", path, manifest.get('version'))
+        return None
+    return manifest
+
+
+def read_export(path, manifest, columns, predicates=(), partition_predicates=(), row_filter=None,
+                chunksize=100000):
+    """The columns of an export, skipping what the predicates rule out.
+
+    predicates are (column, op, operand) triples on the data. partition_predicates
+    apply to the partition keys, whose values are read as strings: directories that
+    fail them are never opened. Parquet and Feather are read through pyarrow with
+    both pushed down as a dataset filter, so Parquet row groups whose statistics
+    exclude the predicates are skipped as well. CSV files are read in chunks of
+    chunksize rows. row_filter(frame, predicates) -> frame applies predicates
+    exactly; it finishes the filtering of every piece read, so pushdown only has to
+    be conservative, and decides which CSV partition directories to open.
+    """
+    if manifest['format'] == 'csv':
+        df = _read_csv(path, manifest, columns, predicates, partition_predicates, row_filter, chunksize)
+    else:
+        df = _read_arrow(path, manifest, columns, predicates, partition_predicates, row_filter)
+    return df[[column for column in columns if column in df.columns]]
+
+
+def _write_csv(path, data, partitions):
+    if partitions.shape[1] == 0:
+        data.to_csv(os.path.join(path, 'part-0.csv'), index=False)
+        return
+    segments = pd.DataFrame({
+        field: [NULL_PARTITION if value is None else quote(value, safe='') for value in values]
+        for field, values in _partition_strings(partitions).items()
+    })
+    for values, positions in segments.groupby(list(segments.columns), sort=False).indices.items():
+        values = values if isinstance(values, tuple) else (values,)
+        directory = os.path.join(path, *(f"{field}={value}" for field, value in zip(segments.columns, values)))
+        os.makedirs(directory)
+        data.iloc[positions].to_csv(os.path.join(directory, 'part-0.csv'), index=False)
+
+
+def _write_arrow(path, data, partitions, fmt, row_group_size):
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    partition_columns = _partition_strings(partitions)
+    table = pa.Table.from_pandas(data.assign(**partition_columns), preserve_index=False)
+    partitioning = None
+    if partition_columns:
+        partitioning = ds.partitioning(pa.schema([(field, pa.string()) for field in partition_columns]),
+                                       flavor='hive')
+    ds.write_dataset(
+        table, path, format=fmt, partitioning=partitioning, basename_template=f'part-{{i}}.{fmt}',
+        max_rows_per_group=row_group_size, existing_data_behavior='overwrite_or_ignore',
+    )
+
+
+def _read_arrow(path, manifest, columns, predicates, partition_predicates, row_filter):
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    fields = manifest['partitions']
+    partitioning = None
+    if fields:
+        partitioning = ds.partitioning(pa.schema([(field, pa.string()) for field in fields]), flavor='hive')
+    dataset = ds.dataset(path, format=manifest['format'], partitioning=partitioning)
+    dtypes = manifest['dtypes']
+    expression = _arrow_filter(ds, partition_predicates, {})
+    data_filter = _arrow_filter(ds, [predicate for predicate in predicates if predicate[0] not in fields], dtypes)
+    if data_filter is not None:
+        expression = data_filter if expression is None else expression & data_filter
+    read_columns = [column for column in columns if column in dataset.schema.names]
+    try:
+        table = dataset.to_table(columns=read_columns, filter=expression)
+    except (pa.ArrowException, TypeError, ValueError) as e:
+        # e.g. an operand pyarrow cannot compare with the column; row_filter still applies
+        logger.debug("Reading %s without the pushed-down filter: %s", path, e)
+        table = dataset.to_table(columns=read_columns)
+    df = _restore_dtypes(table.to_pandas(), manifest['dtypes'])
+    return row_filter(df, predicates) if row_filter is not None else df
+
+
+def _arrow_filter(ds, predicates, dtypes):
+    """A pyarrow dataset expression for the predicates it can express, or None."""
+    expression = None
+    for column, op, operand in predicates:
+        if str(dtypes.get(column, '')).startswith('datetime64') and op not in ('isnull', 'notnull'):
+            try:
+                operand = _timestamps(op, operand)
+            except (TypeError, ValueError):
+                continue
+        part = _arrow_predicate(ds.field(column), op, operand)
+        if part is not None:
+            expression = part if expression is None else expression & part
+    return expression
+
+
+def _arrow_predicate(field, op, operand):
+    # Missing values never pass a comparison, but do pass != and not in
+    if op == 'isnull':
+        return field.is_null()
+    if op == 'notnull':
+        return field.is_valid()
+    if op == 'startswith' or operand is None:
+        return None
+    if op == '==':
+        return field == operand
+    if op == '!=':
+        return (field != operand) | field.is_null()
+    if op == '<':
+        return field < operand
+    if op == '<=':
+        return field <= operand
+    if op == '>':
+        return field > operand
+    if op == '>=':
+        return field >= operand
+    if op == 'between':
+        return (field >= operand[0]) & (field <= operand[1])
+    if op == 'in':
+        return field.isin(list(operand))
+    return ~field.isin(list(operand)) | field.is_null()
+
+
+def _timestamps(op, operand):
+    if op == 'between':
+        return tuple(pd.Timestamp(value) for value in operand)
+    if op in ('in', 'not in'):
+        return [pd.Timestamp(value) for value in operand]
+    return pd.Timestamp(operand)
+
+
+def _read_csv(path, manifest, columns, predicates, partition_predicates, row_filter, chunksize):
+    fields = manifest['partitions']
+    dtypes = {column: dtype for column, dtype in manifest['dtypes'].items()
+              if not dtype.startswith('datetime64') and dtype != 'category'}
+    parts = []
+    for directory, values in _csv_partitions(path, fields):
+        if partition_predicates and row_filter is not None:
+            # Evaluate the partition predicates on the directory's key values, as strings
+            keys = pd.DataFrame({field: pd.Series([value], dtype=object) for field, value in values.items()})
+            if len(row_filter(keys, partition_predicates)) == 0:
+                continue
+        file_columns = [column for column in columns if column in manifest['names'] and column not in values]
+        reader = pd.read_csv(
+            os.path.join(directory, 'part-0.csv'), usecols=file_columns, chunksize=chunksize,
+            dtype={column: dtype for column, dtype in dtypes.items() if column in file_columns},
+        )
+        for chunk in reader:
+            chunk = chunk.assign(**{field: value for field, value in values.items() if field in columns})
+            chunk = _restore_dtypes(chunk, manifest['dtypes'])
+            parts.append(row_filter(chunk, predicates) if row_filter is not None else chunk)
+    if not parts:
+        return _restore_dtypes(pd.DataFrame({column: pd.Series(dtype=object) for column in columns}),
+                               manifest['dtypes'])
+    return pd.concat(parts, ignore_index=True)
+
+
+def _partition_strings(partitions):
+    """Partition key values as strings, None where missing: the form they take in directory names."""
+    return {
+        field: [None if pd.isna(value) else str(value) for value in partitions[field]]
+        for field in partitions.columns
+    }
+
+
+def _csv_partitions(path, fields, values=None):
+    """(directory, {field: value or None}) for every leaf directory of a hive layout."""
+    values = values or {}
+    if len(values) == len(fields):
+        yield path, values
+        return
+    field = fields[len(values)]
+    prefix = field + '='
+    for entry in sorted(os.listdir(path)):
+        if entry.startswith(prefix) and os.path.isdir(os.path.join(path, entry)):
+            value = entry[len(prefix):]
+            value = None if value == NULL_PARTITION else unquote(value)
+            yield from _csv_partitions(os.path.join(path, entry), fields, dict(values, **{field: value}))
+
+
+def _restore_dtypes(df, dtypes):
+    """Cast columns back to the dtypes recorded at export, where they differ and can be."""
+    converted = {}
+    for column in df.columns:
+        dtype = dtypes.get(column)
+        if dtype is None or str(df[column].dtype) == dtype:
+            continue
+        try:
+            if dtype.startswith('datetime64'):
+                converted[column] = pd.to_datetime(df[column], format='ISO8601').astype(dtype)
+            else:
+                converted[column] = df[column].astype(dtype)
+        except (TypeError, ValueError) as e:
+            logger.debug("Keeping column '%s' as %s instead of %s: %s", column, df[column].dtype, dtype, e)
+    return df.assign(**converted) if converted else df
+
+
+def _write_json(file_path, data):
+    with open(file_path, 'w') as f:
+        json.dump(data, f, default=str)
@@ -1,74 +1,367 @@
 
+import asyncio
+import functools
+import hashlib
+import inspect
+import io
+import json
+import logging
+import os
+import re
+import threading
+import time
+import weakref
+import zipfile
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from xml.etree import ElementTree
+
+import numpy as np
 import pandas as pd
-import openpyxl
+from pandas.io.parsers import TextParser
+
+try:
+    from . import instrumentation
+    from .format_parser import FormatParser
+    from .lazy_import import LazyModule
+    from .sheet_cache import pack_frame, unpack_frame
+    from .type_detector import ColumnHint, ColumnSchema, DataTypeDetector, Schema
+except ImportError:
+    import instrumentation
+    from format_parser import FormatParser
+    from lazy_import import LazyModule
+    from sheet_cache import pack_frame, unpack_frame
+    from type_detector import ColumnHint, ColumnSchema, DataTypeDetector, Schema
+
+# Only needed for streaming and sheet listing; pd.read_excel imports it itself
+openpyxl = LazyModule('openpyxl')
+
+logger = logging.getLogger(__name__)
+
+# Modules whose code decides what extract_typed returns (see _typed_fingerprint)
+TYPED_SOURCES = ('excel_processor.py', 'type_detector.py', 'format_parser.py', 'amount_kernel.py')
 
 class ExcelProcessor:
-    def __init__(self):
+    def __init__(self, max_cached_sheets=None, cache=None, async_workers=4, async_executor='thread'):
         self.files = {}
+        # Optional SheetCache: parsed sheets are read from and written to it. The
+        # lock lets aload look up and store sheets from several threads at once.
+        self.cache = cache
+        self._cache_lock = threading.Lock()
+        # Sheets are parsed on first use; at most max_cached_sheets parsed DataFrames
+        # are kept, evicting the least recently used one (None means no limit)
+        self.max_cached_sheets = max_cached_sheets
+        self._sheet_lru = OrderedDict()
+        self.load_report = {}
+        # ColumnHints by (file_path, sheet_name), from extract_with_hints
+        self.hints = {}
+        # aload/aiter_chunks run at most async_workers parses at a time, on pools
+        # created on first use; aload parses on processes with async_executor='process'
+        if async_executor not in ('process', 'thread'):
+            raise ValueError(f"executor must be 'process' or 'thread', not {async_executor!r}")
+        self.async_workers = async_workers
+        self.async_executor = async_executor
+        self._async_threads = None
+        self._async_processes = None
+        # One semaphore per event loop, since each is bound to the loop it first waits on
+        self._async_semaphores = weakref.WeakKeyDictionary()
+
+    def load_files(self, file_paths, workers=None, executor='process'):
+        """Register Excel files and return a per-file load report.
 
-    def load_files(self, file_paths):
+        By default sheets are parsed lazily in extract_data. With workers > 1 every
+        sheet of every file is parsed up front on a pool of that size; executor is
+        'process' (one task per sheet, results sent back as packed column arrays) or
+        'thread'. A file that fails with pandas falls back to openpyxl, and a failing
+        file never stops the others. The report maps each path to its status, engine,
+        error and parse timing in seconds (total and per sheet), and is also kept in
+        self.load_report.
+        """
+        if workers is not None and workers > 1:
+            return self._load_files_parallel(file_paths, workers, executor)
         for file_path in file_paths:
+            start = time.perf_counter()
+            report = {'status': 'ok', 'engine': 'pandas', 'error': None, 'seconds': 0.0, 'sheets': {}}
+            _record_file(file_path)
             try:
-                # Try to read with pandas first
+                # Try to read with pandas first; sheets are parsed lazily in extract_data
                 xls = pd.ExcelFile(file_path)
                 self.files[file_path] = {
                     'pandas_excel_file': xls,
-                    'sheets': {sheet_name: pd.read_excel(xls, sheet_name=sheet_name) for sheet_name in xls.sheet_names}
+                    'sheets': {sheet_name: None for sheet_name in xls.sheet_names}
                 }
-                print(f"Successfully loaded {file_path} with pandas.")
+                logger.info("Successfully loaded %s with pandas.", file_path)
             except Exception as e:
-                print(f"Could not load {file_path} with pandas: {e}")
+                logger.warning("Could not load %s with pandas: %s", file_path, e)
                 try:
                     # Fallback to openpyxl if pandas fails
-                    workbook = openpyxl.load_workbook(file_path)
+                    workbook = openpyxl.load_workbook(file_path, read_only=True)
                     self.files[file_path] = {
                         'openpyxl_workbook': workbook,
                         'sheets': {sheet_name: None for sheet_name in workbook.sheetnames} # Data will be extracted on demand
                     }
-                    print(f"Successfully loaded {file_path} with openpyxl.")
+                    report['engine'] = 'openpyxl'
+                    logger.info("Successfully loaded %s with openpyxl.", file_path)
                 except Exception as e_openpyxl:
-                    print(f"Could not load {file_path} with openpyxl: {e_openpyxl}")
+                    logger.error("Could not load %s with openpyxl: %s", file_path, e_openpyxl)
+                    report.update(status='failed', engine=None, error=str(e_openpyxl))
+            report['seconds'] = time.perf_counter() - start
+            self.load_report[file_path] = report
+        return self.load_report
+
+    def _load_files_parallel(self, file_paths, workers, executor):
+        if executor not in ('process', 'thread'):
+            raise ValueError(f"executor must be 'process' or 'thread', not {executor!r}")
+        pool_class = ProcessPoolExecutor if executor == 'process' else ThreadPoolExecutor
+        # Threads share memory, so only process results need packing
+        pack = executor == 'process'
+        with pool_class(max_workers=workers) as pool:
+            tasks = {}
+            for file_path in file_paths:
+                # One task per sheet when the sheet names can be listed cheaply, else one per file
+                sheet_names = _sheet_names(file_path)
+                cached = self._cached_sheets(file_path, sheet_names)
+                tasks[file_path] = (cached, [
+                    pool.submit(_load_sheets, file_path, name, pack)
+                    for name in sheet_names if cached is None or name not in cached['sheets']
+                ])
+
+            for file_path, (cached, futures) in tasks.items():
+                results = [cached] if cached else []
+                for future in futures:
+                    try:
+                        results.append(future.result())
+                    except Exception as e:
+                        # e.g. a worker process that died; only this file is affected
+                        results.append({'engine': None, 'sheets': {}, 'seconds': {}, 'error': str(e)})
+                self._store_loaded(file_path, results)
+        return self.load_report
+
+    def _store_loaded(self, file_path, results):
+        self._register_loaded(file_path, self._unpack_loaded(file_path, results))
+
+    def _unpack_loaded(self, file_path, results, cache=True):
+        """Unpack process results in place, writing freshly parsed sheets to the cache."""
+        for result in results:
+            sheets = result['sheets']
+            for sheet_name, df in sheets.items():
+                if isinstance(df, dict):
+                    sheets[sheet_name] = df = unpack_frame(df)
+                if cache and result['engine'] != 'cache':
+                    self._cache_put(file_path, sheet_name, df)
+        return results
+
+    def _register_loaded(self, file_path, results):
+        errors = [result['error'] for result in results if result['error']]
+        sheets, seconds = {}, {}
+        for result in results:
+            sheets.update(result['sheets'])
+            seconds.update(result['seconds'])
+        engines = {result['engine'] for result in results if result['engine']}
+        report = {
+            'status': 'ok' if not errors else ('partial' if sheets else 'failed'),
+            'engine': next((engine for engine in ('openpyxl', 'pandas', 'cache') if engine in engines), None),
+            'error': '; '.join(errors) or None,
+            'seconds': sum(seconds.values()),
+            'sheets': seconds,
+        }
+        self.load_report[file_path] = report
+        if not sheets:
+            logger.error("Could not load %s: %s", file_path, report['error'])
+            return
+        self.files[file_path] = {'sheets': sheets}
+        _record_file(file_path)
+        for sheet_name in sheets:
+            self._touch(file_path, sheet_name)
+            if instrumentation.enabled() and sheets[sheet_name] is not None:
+                instrumentation.observe('excel.read_sheet', seconds.get(sheet_name, 0.0),
+                                        file=os.path.basename(file_path), sheet=sheet_name)
+                instrumentation.increment('excel.rows', len(sheets[sheet_name]),
+                                          file=os.path.basename(file_path), sheet=sheet_name)
+        logger.info("Successfully loaded %s with %s in %.2fs.", file_path, report['engine'], report['seconds'])
+
+    def _cached_sheets(self, file_path, sheet_names):
+        """Load result holding the sheets already in the cache, or None if there are none."""
+        if self.cache is None or None in sheet_names:
+            return None
+        sheets, seconds = {}, {}
+        for sheet_name in sheet_names:
+            start = time.perf_counter()
+            df = self._cache_get(file_path, sheet_name)
+            if df is not None:
+                sheets[sheet_name] = df
+                seconds[sheet_name] = time.perf_counter() - start
+        if not sheets:
+            return None
+        return {'engine': 'cache', 'sheets': sheets, 'seconds': seconds, 'error': None}
+
+    def _cache_get(self, file_path, sheet_name, variant='raw', with_metadata=False):
+        try:
+            with self._cache_lock:
+                return self.cache.get(file_path, sheet_name, variant, with_metadata)
+        except Exception as e:
+            logger.warning("Could not read %s from %s out of the cache: %s", sheet_name, file_path, e)
+            return (None, None) if with_metadata else None
+
+    def _cache_put(self, file_path, sheet_name, df, variant='raw', metadata=None):
+        if self.cache is None or df is None:
+            return
+        try:
+            with self._cache_lock:
+                self.cache.put(file_path, sheet_name, df, variant, metadata)
+        except Exception as e:
+            logger.warning("Could not cache %s from %s: %s", sheet_name, file_path, e)
 
     def get_sheet_info(self):
+        """Sheet names, dimensions and column names for every loaded file.
+
+        Sheets that are already parsed report their DataFrame's shape and columns.
+        Otherwise XLSX metadata is read from the sheet XML (the recorded dimension and
+        the header row) without parsing any data rows; other formats are parsed.
+        """
         info = {}
         for file_path, file_data in self.files.items():
             file_info = {'sheets': {}}
-            if 'pandas_excel_file' in file_data:
-                for sheet_name, df in file_data['sheets'].items():
-                    file_info['sheets'][sheet_name] = {
-                        'dimensions': df.shape,
-                        'column_names': df.columns.tolist()
-                    }
-            elif 'openpyxl_workbook' in file_data:
-                workbook = file_data['openpyxl_workbook']
-                for sheet_name in workbook.sheetnames:
-                    # For openpyxl, we can't get dimensions/column names without loading the sheet
-                    # This is a placeholder, actual data extraction would be in extract_data
-                    file_info['sheets'][sheet_name] = {
-                        'dimensions': 'N/A (load with extract_data)',
-                        'column_names': 'N/A (load with extract_data)'
-                    }
+            metadata = None
+            for sheet_name, df in file_data['sheets'].items():
+                if df is None and metadata is None and zipfile.is_zipfile(file_path):
+                    try:
+                        metadata = read_xlsx_metadata(file_path)
+                    except Exception as e:
+                        logger.warning("Could not read sheet metadata from %s: %s", file_path, e)
+                        metadata = {}
+                if df is None and metadata and sheet_name in metadata:
+                    file_info['sheets'][sheet_name] = metadata[sheet_name]
+                    continue
+                if df is None:
+                    df = self.extract_data(file_path, sheet_name)
+                file_info['sheets'][sheet_name] = {
+                    'dimensions': df.shape,
+                    'column_names': df.columns.tolist()
+                }
             info[file_path] = file_info
         return info
 
     def extract_data(self, file_path, sheet_name):
         if file_path in self.files:
             file_data = self.files[file_path]
-            if 'pandas_excel_file' in file_data:
-                return file_data['sheets'].get(sheet_name)
-            elif 'openpyxl_workbook' in file_data:
-                workbook = file_data['openpyxl_workbook']
-                if sheet_name in workbook.sheetnames:
-                    # Load sheet data into a pandas DataFrame
-                    sheet = workbook[sheet_name]
-                    data = sheet.values
-                    cols = next(data) # Get header row
-                    df = pd.DataFrame(data, columns=cols)
-                    # Store the DataFrame for future access
-                    self.files[file_path]['sheets'][sheet_name] = df
-                    return df
+            if sheet_name not in file_data['sheets']:
+                return None
+            df = file_data['sheets'][sheet_name]
+            instrumentation.increment('cache.hits' if df is not None else 'cache.misses', cache='sheets')
+            if df is None:
+                if self.cache is not None:
+                    df = self._cache_get(file_path, sheet_name)
+                if df is None:
+                    df = self._read_sheet(file_path, file_data, sheet_name)
+                    self._cache_put(file_path, sheet_name, df)
+                # Store the DataFrame for future access
+                file_data['sheets'][sheet_name] = df
+            self._touch(file_path, sheet_name)
+            return df
         return None
 
+    def _read_sheet(self, file_path, file_data, sheet_name):
+        with instrumentation.timed('excel.read_sheet', file=os.path.basename(file_path), sheet=sheet_name):
+            df = self._parse_sheet(file_path, file_data, sheet_name)
+        if df is not None:
+            instrumentation.increment('excel.rows', len(df), file=os.path.basename(file_path), sheet=sheet_name)
+        return df
+
+    def _parse_sheet(self, file_path, file_data, sheet_name):
+        if 'pandas_excel_file' in file_data:
+            return pd.read_excel(file_data['pandas_excel_file'], sheet_name=sheet_name)
+        if 'openpyxl_workbook' in file_data:
+            return _openpyxl_frame(file_data['openpyxl_workbook'][sheet_name])
+        # Loaded in parallel and since evicted (or failed there): read just this sheet again
+        source = file_data.get('buffer', file_path)
+        return _load_sheets(source, sheet_name, pack=False)['sheets'].get(sheet_name)
+
+    def _touch(self, file_path, sheet_name):
+        """Mark a parsed sheet as most recently used and evict beyond the cache limit."""
+        key = (file_path, sheet_name)
+        self._sheet_lru[key] = True
+        self._sheet_lru.move_to_end(key)
+        while self.max_cached_sheets is not None and len(self._sheet_lru) > self.max_cached_sheets:
+            (old_path, old_sheet), _ = self._sheet_lru.popitem(last=False)
+            if old_path in self.files:
+                self.files[old_path]['sheets'][old_sheet] = None
+            self.hints.pop((old_path, old_sheet), None)
+
+    def extract_typed(self, file_path, sheet_name, schema=None, workers=None, scale=None, use_hints=False,
+                      currencies=False, amount_columns=None, parser=None):
+        """Sheet data with date and number columns parsed according to a schema.
+
+        The schema is detected with DataTypeDetector.detect_schema when not given;
+        with use_hints the sheet is read by extract_with_hints and columns of real
+        dates or numbers skip sampling and pattern matching.
+        With scale, amount columns hold exact int64 minor units, and with currencies
+        amounts written with currency symbols get a currency code column (see apply_schema).
+        parser is the FormatParser to parse with (a default one if not given).
+        With a SheetCache, the typed frame and its schema are cached too, keyed on the
+        given schema (or the detection settings), the parsing settings including the
+        parser's locale and currency symbols, and the source of the parsing modules,
+        so warm calls skip reading, detection and parsing.
+        Returns (typed DataFrame, schema), or (None, None) if the sheet is unknown.
+        """
+        if file_path not in self.files or sheet_name not in self.files[file_path]['sheets']:
+            return None, None
+        parser = parser if parser is not None else FormatParser()
+        variant = None
+        if self.cache is not None and 'buffer' not in self.files[file_path]:
+            variant = _typed_variant(schema, parser, use_hints, scale, currencies, amount_columns)
+        if variant is not None:
+            typed, columns = self._cache_get(file_path, sheet_name, variant, with_metadata=True)
+            if typed is not None and columns is not None:
+                return typed, Schema([ColumnSchema(*column) for column in columns])
+        hints = None
+        if use_hints:
+            df, hints = self.extract_with_hints(file_path, sheet_name)
+        else:
+            df = self.extract_data(file_path, sheet_name)
+        if df is None:
+            return None, None
+        if schema is None:
+            schema = DataTypeDetector().detect_schema(df, workers=workers, hints=hints)
+        typed = apply_schema(df, schema, parser, scale=scale, currencies=currencies, amount_columns=amount_columns)
+        if variant is not None:
+            self._cache_put(file_path, sheet_name, typed, variant, _schema_rows(schema))
+        return typed, schema
+
+    def extract_with_hints(self, file_path, sheet_name):
+        """Sheet data plus a ColumnHint per column, read in one streaming pass.
+
+        XLSX sheets are read in openpyxl's read-only mode cell by cell, so every
+        column's native value types (real numbers, dates, text) and Excel number
+        format codes are collected while the frame is built; the frame is the one
+        pd.read_excel would return, and is kept like an extract_data result. Pass
+        the hints to DataTypeDetector.detect_schema to take the type of well-formed
+        columns from them. Returns (df, {column: ColumnHint}), or (None, None) if
+        the sheet is unknown; workbooks without cell styles (.xls) give no hints.
+        """
+        if file_path not in self.files or sheet_name not in self.files[file_path]['sheets']:
+            return None, None
+        key = (file_path, sheet_name)
+        file_data = self.files[file_path]
+        if key in self.hints and file_data['sheets'][sheet_name] is not None:
+            return self.extract_data(file_path, sheet_name), self.hints[key]
+        source = file_data.get('buffer', file_path)
+        source = io.BytesIO(source) if isinstance(source, bytes) else source
+        try:
+            if not zipfile.is_zipfile(source):
+                raise ValueError("not an XLSX workbook")
+            with instrumentation.timed('excel.read_sheet', file=_source_label(file_path), sheet=sheet_name):
+                df, hints = _read_with_hints(source, sheet_name)
+        except Exception as e:
+            logger.info("No cell hints for %s in %s (%s); reading values only", sheet_name, file_path, e)
+            return self.extract_data(file_path, sheet_name), {}
+        _record_file(source)
+        instrumentation.increment('excel.rows', len(df), file=_source_label(file_path), sheet=sheet_name)
+        file_data['sheets'][sheet_name] = df
+        self._touch(file_path, sheet_name)
+        self.hints[key] = hints
+        return df, hints
+
     def preview_data(self, file_path, sheet_name, rows=5):
         df = self.extract_data(file_path, sheet_name)
         if df is not None:
@@ -77,4 +370,572 @@ class ExcelProcessor:
         else:
             print(f"Could not preview data for {sheet_name} from {file_path}.")
 
+    def iter_chunks(self, file_path, sheet_name, chunksize=10000, dtypes=None):
+        """Yield DataFrames of up to chunksize rows from one sheet.
+
+        XLSX sheets are streamed with openpyxl's read-only, values-only row iteration,
+        so peak memory follows the chunk size rather than the workbook size. The first
+        row is the header. Cells are converted and typed the way pd.read_excel does it;
+        pass dtypes (column name -> dtype) to keep column types stable across chunks.
+        Legacy .xls files cannot be streamed and are read once, then sliced. file_path
+        may also be a binary file-like object such as io.BytesIO.
+        """
+        _record_file(file_path)
+        start = time.perf_counter()
+        if not zipfile.is_zipfile(file_path):
+            if hasattr(file_path, 'seek'):
+                file_path.seek(0)
+            df = pd.read_excel(file_path, sheet_name=sheet_name)
+            for offset in range(0, len(df), chunksize):
+                chunk = _type_chunk(df.iloc[offset:offset + chunksize], dtypes)
+                _record_chunk(file_path, sheet_name, chunk, start)
+                yield chunk
+                start = time.perf_counter()
+            return
+
+        workbook = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+        try:
+            rows = _sheet_rows(workbook[sheet_name])
+            header = next(rows, None)
+            if header is None:
+                return
+            buffer = []
+            for row in rows:
+                buffer.append(row)
+                if len(buffer) >= chunksize:
+                    chunk = _make_chunk(header, buffer[:chunksize], dtypes)
+                    buffer = buffer[chunksize:]
+                    # Only time spent reading counts, not time the consumer holds the chunk
+                    _record_chunk(file_path, sheet_name, chunk, start)
+                    yield chunk
+                    start = time.perf_counter()
+            while buffer:
+                chunk = _make_chunk(header, buffer[:chunksize], dtypes)
+                buffer = buffer[chunksize:]
+                _record_chunk(file_path, sheet_name, chunk, start)
+                yield chunk
+                start = time.perf_counter()
+        finally:
+            workbook.close()
+
+    async def aload(self, source, name=None):
+        """Load a workbook without blocking the event loop and return its load report.
+
+        source is a path, bytes (or bytearray/memoryview), or a binary file-like object
+        whose read() may be a coroutine, like an uploaded file in a web framework.
+        Buffers are parsed in memory, never written to a temporary file, and are
+        registered under name (by default '<buffer ' plus a content hash prefix '>'),
+        which extract_data then takes as the file path. Every sheet is parsed up front
+        as its own task on the async pool, with at most async_workers parses running
+        across all aload and aiter_chunks calls; paths use the SheetCache as
+        load_files does.
+
+        Cancelling aload drops its queued sheets and leaves the file unregistered; a
+        sheet that is already being parsed finishes on its worker and is discarded.
+        """
+        loop = asyncio.get_running_loop()
+        threads = self._thread_pool()
+        if isinstance(source, (str, os.PathLike)):
+            file_path = data = os.fspath(source)
+        else:
+            data = await _read_buffer(source)
+            file_path = name or f"<buffer {await loop.run_in_executor(threads, _content_hash, data)}>"
+            instrumentation.increment('excel.bytes_read', len(data), file=file_path)
+        cached, sheet_names = await loop.run_in_executor(threads, self._plan_load, data)
+        pool = self._parse_pool()
+        pack = pool is self._async_processes
+
+        async def load_sheet(sheet_name):
+            async with self._async_slot():
+                try:
+                    return await loop.run_in_executor(pool, _load_sheets, data, sheet_name, pack)
+                except Exception as e:
+                    # e.g. a worker process that died; only this file is affected
+                    return {'engine': None, 'sheets': {}, 'seconds': {}, 'error': str(e)}
+
+        results = [cached] if cached else []
+        results += await asyncio.gather(*(
+            load_sheet(sheet_name) for sheet_name in sheet_names
+            if cached is None or sheet_name not in cached['sheets']
+        ))
+        # Unpacking and cache writes are I/O and CPU work too, so they stay off the loop
+        results = await loop.run_in_executor(threads, self._unpack_loaded, file_path, results, data is file_path)
+        self._register_loaded(file_path, results)
+        if data is not file_path and file_path in self.files:
+            # Evicted sheets of a buffer are parsed again from it
+            self.files[file_path]['buffer'] = data
+        return self.load_report[file_path]
+
+    async def aiter_chunks(self, source, sheet_name, chunksize=10000, dtypes=None):
+        """iter_chunks for async code: async for chunk in processor.aiter_chunks(...).
+
+        source is a path, bytes or file-like object as for aload. Each chunk is read
+        on a worker thread within the async_workers limit, so the loop stays free
+        while a slow consumer holds no worker. Leaving the loop early, or cancelling
+        the consumer, closes the workbook once any chunk still being read is done.
+        """
+        if not isinstance(source, (str, os.PathLike)):
+            source = io.BytesIO(await _read_buffer(source))
+        chunks = self.iter_chunks(source, sheet_name, chunksize, dtypes)
+        threads = self._thread_pool()
+        future = None
+        try:
+            while True:
+                async with self._async_slot():
+                    future = threads.submit(next, chunks, None)
+                    chunk = await asyncio.wrap_future(future)
+                if chunk is None:
+                    return
+                yield chunk
+        finally:
+            # A generator cannot be closed while a worker is still advancing it
+            if future is None:
+                chunks.close()
+            else:
+                future.add_done_callback(lambda _: chunks.close())
+
+    def close(self):
+        """Shut down the async pools (queued work is cancelled, running work finishes) and save the cache index."""
+        for pool in (self._async_threads, self._async_processes):
+            if pool is not None:
+                pool.shutdown(wait=False, cancel_futures=True)
+        self._async_threads = self._async_processes = None
+        if self.cache is not None:
+            with self._cache_lock:
+                self.cache.close()
+
+    def _plan_load(self, source):
+        """(cached load result or None, sheet names to parse) for aload."""
+        sheet_names = _sheet_names(source)
+        if isinstance(source, bytes):
+            return None, sheet_names
+        return self._cached_sheets(source, sheet_names), sheet_names
+
+    def _async_slot(self):
+        loop = asyncio.get_running_loop()
+        with self._cache_lock:
+            semaphore = self._async_semaphores.get(loop)
+            if semaphore is None:
+                semaphore = self._async_semaphores[loop] = asyncio.Semaphore(self.async_workers)
+        return semaphore
+
+    def _thread_pool(self):
+        if self._async_threads is None:
+            self._async_threads = ThreadPoolExecutor(max_workers=self.async_workers,
+                                                     thread_name_prefix='excel-async')
+        return self._async_threads
+
+    def _parse_pool(self):
+        if self.async_executor == 'thread':
+            return self._thread_pool()
+        if self._async_processes is None:
+            self._async_processes = ProcessPoolExecutor(max_workers=self.async_workers)
+        return self._async_processes
+
+
+def list_sheets(file_path):
+    """Sheet names of a workbook, read from the XLSX index without parsing any sheet."""
+    if zipfile.is_zipfile(file_path):
+        with zipfile.ZipFile(file_path) as archive:
+            return list(_xlsx_sheet_paths(archive))
+    with pd.ExcelFile(file_path) as xls:
+        return xls.sheet_names
+
+
+def apply_schema(df, schema, parser=None, scale=None, currencies=False, amount_columns=None):
+    """Copy of df with its date columns as datetime64 and number columns as float64.
+
+    Columns are parsed whole with FormatParser's series parsers; values that do not
+    parse become NaT/NaN. With scale, amount columns are nullable Int64 minor units
+    instead (10**scale per unit of currency): the number columns in amount_columns,
+    or by default those written as money (Schema.amount_columns). Other number
+    columns, such as rates and quantities, stay float64. String columns, and
+    columns missing from the schema, are left as they are.
+
+    With currencies, a number column whose values are written with currency symbols
+    or codes is followed by a '<name> Currency' column of ISO codes for its parsed
+    amounts (see FormatParser.parse_currency_series), ready for FxRates.convert_frame.
+    """
+    parser = parser or FormatParser()
+    amounts = set(schema.amount_columns() if amount_columns is None else amount_columns)
+    typed = []
+    names = []
+    for i, name in enumerate(df.columns):
+        column = df.iloc[:, i]
+        kind = schema[name].type if name in schema else None
+        codes = None
+        if kind == 'number' and currencies and f"{name} Currency" not in df.columns:
+            codes = parser.parse_currency_series(column)
+        if kind == 'date':
+            column = parser.parse_date_series(column)
+        elif kind == 'number' and scale is not None and name in amounts:
+            column = parser.parse_amount_units(column, scale)
+        elif kind == 'number':
+            values, valid = parser.parse_amount_series(column)
+            column = pd.Series(np.where(valid, values, np.nan), index=df.index, name=name)
+        typed.append(column)
+        names.append(name)
+        if codes is not None and codes.notna().any():
+            typed.append(codes.where(column.notna().to_numpy(dtype=bool, na_value=False)))
+            names.append(f"{name} Currency")
+    result = pd.DataFrame(dict(enumerate(typed)), index=df.index)
+    result.columns = names
+    return result
+
+
+def _typed_variant(schema, parser, use_hints, scale, currencies, amount_columns):
+    """SheetCache variant of an extract_typed result: everything that changes the typed frame."""
+    settings = {
+        'schema': _schema_rows(schema) if schema is not None else {'detector': 'default', 'hints': use_hints},
+        'scale': scale,
+        'currencies': currencies,
+        'amount_columns': list(amount_columns) if amount_columns is not None else None,
+        'number_locale': repr(parser.number_locale),
+        'currency_symbols': sorted(parser.currency_symbols.items()),
+        'code': _typed_fingerprint(),
+    }
+    if settings['code'] is None:
+        return None
+    digest = hashlib.sha256(json.dumps(settings, default=str, sort_keys=True).encode('utf-8'))
+    return 'typed-' + digest.hexdigest()[:16]
+
+
+@functools.lru_cache(maxsize=None)
+def _typed_fingerprint():
+    """Hash of the source of the modules that decide what a typed sheet contains.
+
+    Part of every typed cache key, so changing how columns are detected or parsed
+    retires older typed entries without anyone bumping a version. None, which
+    turns typed caching off, when the source cannot be read.
+    """
+    digest = hashlib.sha256()
+    try:
+        for name in TYPED_SOURCES:
+            with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), name), 'rb') as f:
+                digest.update(f.read())
+    except OSError as e:
+        logger.warning("Not caching typed sheets: cannot read the parser source (%s)", e)
+        return None
+    return digest.hexdigest()[:16]
+
+
+def _schema_rows(schema):
+    # In column order, as JSON keeps lists (and non-string column names) intact
+    return [[column.name, column.type, float(column.confidence), column.format] for column in schema]
+
+
+def _record_file(file_path):
+    if instrumentation.enabled():
+        try:
+            size = file_path.getbuffer().nbytes if isinstance(file_path, io.BytesIO) else os.path.getsize(file_path)
+        except OSError:
+            return
+        instrumentation.increment('excel.bytes_read', size, file=_source_label(file_path))
+
+
+def _record_chunk(file_path, sheet_name, chunk, start):
+    if instrumentation.enabled():
+        labels = {'file': _source_label(file_path), 'sheet': sheet_name}
+        instrumentation.observe('excel.read_chunk', time.perf_counter() - start, **labels)
+        instrumentation.increment('excel.rows', len(chunk), **labels)
+
+
+def _source_label(source):
+    return os.path.basename(source) if isinstance(source, (str, os.PathLike)) else '<buffer>'
+
+
+async def _read_buffer(source):
+    """The bytes of an in-memory source: a bytes-like object or a binary file-like object."""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return bytes(source)
+    if isinstance(source, io.BytesIO):
+        return source.getvalue()
+    if inspect.iscoroutinefunction(source.read):
+        return bytes(await source.read())
+    # A blocking file object is read on a thread
+    return bytes(await asyncio.to_thread(source.read))
+
+
+def _content_hash(data):
+    return hashlib.sha256(data).hexdigest()[:16]
+
+
+def _sheet_names(source):
+    """Sheet names of a path or bytes when listed cheaply (XLSX), else [None] for all sheets."""
+    try:
+        archive_source = io.BytesIO(source) if isinstance(source, bytes) else source
+        if zipfile.is_zipfile(archive_source):
+            with zipfile.ZipFile(archive_source) as archive:
+                return list(_xlsx_sheet_paths(archive)) or [None]
+    except Exception:
+        pass
+    return [None]
+
+
+def _convert_value(value):
+    """Normalize a raw openpyxl cell value the way pandas' openpyxl reader does."""
+    if value is None:
+        return ''
+    if type(value) is float and value.is_integer():
+        return int(value)
+    return value
+
+
+def _sheet_rows(sheet, hints=None):
+    """The header row, then data rows converted like pd.read_excel, without trailing blank rows.
+
+    With hints (a list), cells are read with their styles and a ColumnHint per
+    header column is appended to it, recording each value's type and number format.
+    """
+    rows = sheet.iter_rows(values_only=hints is None)
+    header = next(rows, None)
+    if header is None:
+        return
+    if hints is not None:
+        header = [cell.value for cell in header]
+    header = [_convert_value(value) for value in header]
+    width = len(header)
+    yield header
+    if hints is not None:
+        hints.extend(ColumnHint() for _ in range(width))
+        rows = _hinted_values(rows, hints)
+    blank_rows = 0
+    for row in rows:
+        row = [_convert_value(value) for value in row[:width]]
+        if not any(value != '' for value in row):
+            # Held back so trailing blank rows are dropped, as pd.read_excel does
+            blank_rows += 1
+            continue
+        for _ in range(blank_rows):
+            yield [''] * width
+        blank_rows = 0
+        row.extend([''] * (width - len(row)))
+        yield row
+
+
+def _hinted_values(rows, hints):
+    # zip stops at the header's width, like the value rows are cut
+    for cells in rows:
+        values = []
+        for hint, cell in zip(hints, cells):
+            value = cell.value
+            if value is not None:
+                hint.add(value, cell.number_format)
+            values.append(value)
+        yield values
+
+
+def _read_with_hints(file_path, sheet_name):
+    workbook = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        hints = []
+        rows = _sheet_rows(workbook[sheet_name], hints)
+        header = next(rows, None)
+        if header is None:
+            return pd.DataFrame(), {}
+        df = _make_chunk(header, list(rows), None)
+    finally:
+        workbook.close()
+    for hint, column in zip(hints, df.columns):
+        hint.name = column
+    return df, {hint.name: hint for hint in hints}
+
+
+def _make_chunk(header, rows, dtypes):
+    # TextParser applies read_excel's column naming, NA handling and type inference
+    return _type_chunk(TextParser([header] + rows, header=0).read(), dtypes)
+
+
+def _type_chunk(df, dtypes):
+    if dtypes:
+        return df.astype({col: dtype for col, dtype in dtypes.items() if col in df.columns})
+    return df
+
+
+def _openpyxl_frame(sheet):
+    # Load sheet data into a pandas DataFrame
+    data = sheet.values
+    cols = next(data, None) # Get header row
+    if cols is None:
+        return pd.DataFrame()
+    return pd.DataFrame(data, columns=cols)
+
+
+def _load_sheets(file_path, sheet_name, pack):
+    """Parse one sheet (or all sheets when sheet_name is None) in a pool worker.
+
+    file_path may also be the workbook's bytes. Errors are returned rather than
+    raised so one bad file cannot fail the batch.
+    """
+    sheets, seconds = {}, {}
+    start = time.perf_counter()
+    if isinstance(file_path, bytes):
+        file_path = io.BytesIO(file_path)
+    try:
+        frames = pd.read_excel(file_path, sheet_name=sheet_name)
+        engine = 'pandas'
+    except Exception as e:
+        try:
+            # Fallback to openpyxl if pandas fails
+            workbook = openpyxl.load_workbook(file_path, read_only=True)
+            try:
+                names = workbook.sheetnames if sheet_name is None else [sheet_name]
+                frames = {name: _openpyxl_frame(workbook[name]) for name in names}
+            finally:
+                workbook.close()
+            engine = 'openpyxl'
+        except Exception as e_openpyxl:
+            return {'engine': None, 'sheets': {}, 'seconds': {},
+                    'error': f"pandas: {e}; openpyxl: {e_openpyxl}"}
+    if sheet_name is not None and not isinstance(frames, dict):
+        frames = {sheet_name: frames}
+    elapsed = time.perf_counter() - start
+    for name, df in frames.items():
+        sheets[name] = pack_frame(df) if pack else df
+        seconds[name] = elapsed / len(frames)
+    return {'engine': engine, 'sheets': sheets, 'seconds': seconds, 'error': None}
+
+
+def read_xlsx_metadata(file_path):
+    """Read each sheet's dimensions and header row straight from an XLSX archive.
+
+    Returns {sheet_name: {'dimensions': (rows, columns), 'column_names': [...]}}, with
+    rows excluding the header like DataFrame.shape. Only the workbook index, the start
+    of each sheet's XML and as much of the shared strings as the headers need are
+    read. Dimensions come from the sheet's recorded used range, so trailing rows that
+    hold only formatting are counted.
+    """
+    with zipfile.ZipFile(file_path) as archive:
+        sheets = _xlsx_sheet_paths(archive)
+        headers = {}
+        shared_needed = set()
+        for sheet_name, path in sheets.items():
+            headers[sheet_name] = _read_sheet_header(archive, path)
+            shared_needed.update(
+                int(value) for cell_type, value in headers[sheet_name]['cells'].values() if cell_type == 's'
+            )
+        shared = _read_shared_strings(archive, shared_needed) if shared_needed else {}
+
+    # Like pd.read_excel, row 1 is the header and columns start at A
+    metadata = {}
+    for sheet_name, header in headers.items():
+        last_row, last_col = header['last']
+        if last_row == 0:
+            metadata[sheet_name] = {'dimensions': (0, 0), 'column_names': []}
+            continue
+        row = [''] * last_col
+        for col, (cell_type, value) in header['cells'].items():
+            if col <= last_col:
+                row[col - 1] = _header_value(cell_type, value, shared)
+        metadata[sheet_name] = {
+            'dimensions': (last_row - 1, last_col),
+            'column_names': (
+                TextParser([row], header=0).read().columns.tolist() if any(value != '' for value in row)
+                else [f"Unnamed: {i}" for i in range(last_col)]
+            )
+        }
+    return metadata
+
+
+_CELL_REF_RE = re.compile(r'^([A-Z]+)(\d+)$')
+
+
+def _xlsx_sheet_paths(archive):
+    """Sheet names in workbook order, mapped to their XML part in the archive."""
+    targets = {}
+    for rel in ElementTree.fromstring(archive.read('xl/_rels/workbook.xml.rels')):
+        target = rel.get('Target').lstrip('/')
+        targets[rel.get('Id')] = target if target.startswith('xl/') else 'xl/' + target
+
+    sheets = {}
+    for element in ElementTree.fromstring(archive.read('xl/workbook.xml')).iter():
+        if _local_name(element.tag) == 'sheet':
+            rel_id = next(value for key, value in element.attrib.items() if _local_name(key) == 'id')
+            sheets[element.get('name')] = targets[rel_id]
+    return sheets
+
+
+def _local_name(tag):
+    return tag.rsplit('}', 1)[-1]
+
+
+def _cell_position(ref):
+    """(row, column) of an A1-style reference, both 1-based."""
+    letters, row = _CELL_REF_RE.match(ref.replace('$', '')).groups()
+    col = 0
+    for letter in letters:
+        col = col * 26 + ord(letter) - ord('A') + 1
+    return int(row), col
+
+
+def _read_sheet_header(archive, path):
+    """Last used row/column and the raw row-1 cells of a worksheet.
+
+    Stops after the first row when the sheet records its dimension; otherwise the row
+    elements are scanned to find the last one, without building any cell values.
+    """
+    last = None
+    cells = {}
+    last_row, last_col = 0, 0
+    with archive.open(path) as stream:
+        for event, element in ElementTree.iterparse(stream, events=('end',)):
+            name = _local_name(element.tag)
+            if name == 'dimension':
+                refs = element.get('ref', 'A1').split(':')
+                # A single-cell dimension is what some writers record for any sheet
+                if len(refs) == 2:
+                    last = _cell_position(refs[1])
+            elif name == 'c':
+                row, col = _cell_position(element.get('r'))
+                if row == 1:
+                    value = None
+                    for child in element.iter():
+                        if _local_name(child.tag) in ('v', 't') and child.text is not None:
+                            value = (value or '') + child.text
+                    if value is not None:
+                        cells[col] = (element.get('t', 'n'), value)
+                last_row, last_col = max(last_row, row), max(last_col, col)
+            elif name == 'row':
+                element.clear()
+                if last is not None and last_row:
+                    break
+    if last_row == 0:
+        return {'last': (0, 0), 'cells': cells}
+    return {'last': last or (last_row, last_col), 'cells': cells}
+
+
+def _read_shared_strings(archive, needed):
+    """Resolve only the shared-string indexes in needed, stopping once they are found."""
+    strings = {}
+    if 'xl/sharedStrings.xml' not in archive.namelist():
+        return strings
+    remaining = max(needed)
+    index = 0
+    with archive.open('xl/sharedStrings.xml') as stream:
+        for event, element in ElementTree.iterparse(stream, events=('end',)):
+            if _local_name(element.tag) != 'si':
+                continue
+            if index in needed:
+                # Rich text runs are concatenated; phonetic hints (rPh) are not part of the text
+                strings[index] = ''.join(
+                    t.text or '' for r in element if _local_name(r.tag) in ('t', 'r')
+                    for t in r.iter() if _local_name(t.tag) == 't'
+                )
+            element.clear()
+            if index >= remaining:
+                break
+            index += 1
+    return strings
+
 
+def _header_value(cell_type, value, shared):
+    if cell_type == 's':
+        return shared.get(int(value), '')
+    if cell_type == 'b':
+        return value == '1'
+    if cell_type == 'e':
+        return ''
+    if cell_type == 'n':
+        number = float(value)
+        return int(number) if number.is_integer() else number
+    return value
@@ -1,24 +1,208 @@
+import logging
+import numbers
 import re
 from datetime import datetime
-from decimal import Decimal, InvalidOperation
-import locale
+from decimal import Decimal, InvalidOperation, ROUND_HALF_EVEN
+from functools import lru_cache
+
+try:
+    from . import instrumentation
+    from .lazy_import import LazyModule
+except ImportError:
+    import instrumentation
+    from lazy_import import LazyModule
+
+# Imported on first use, so importing this module and parsing single values stays
+# cheap; the column parsers load them when they first run
+np = LazyModule('numpy')
+pd = LazyModule('pandas')
+amount_kernel = LazyModule('amount_kernel', __package__)
+
+logger = logging.getLogger(__name__)
+
+# Patterns for the scalar amount parser, compiled once instead of on every call.
+# parse_amount_series implements the same rules on arrays of character codes.
+ABBREVIATED_RE = re.compile(r'^[\d.]+[KMB]$', re.IGNORECASE)
+PARENTHESES_RE = re.compile(r'^\([\d,.]+\)$')
+NON_NUMERIC_RE = re.compile(r'[^\d.,-]')
+# Indian numbering system (e.g., 1,23,456.78): a digit, optional groups of two digits
+# preceded by a comma, then a comma and three digits, then an optional decimal part
+INDIAN_RE = re.compile(r'^\d{1,3}(?:,\d{2})*(?:,\d{3})?(?:\.\d+)?$')
+
+# ISO 4217 codes for the currency symbols amounts are written with; FormatParser's
+# currency_symbols overrides them (e.g. {'$': 'CAD'} for a Canadian statement)
+CURRENCY_SYMBOLS = {'$': 'USD', '€': 'EUR', '₹': 'INR', '£': 'GBP', '¥': 'JPY'}
+# Active ISO 4217 codes; three capital letters next to an amount only count as a
+# currency when they are one of these (or a code in currency_symbols), so references
+# like "INV 123" or "ABC-1" are not mistaken for currencies
+ISO_CURRENCY_CODES = frozenset({
+    'AED', 'AFN', 'ALL', 'AMD', 'ANG', 'AOA', 'ARS', 'AUD', 'AWG', 'AZN', 'BAM', 'BBD', 'BDT',
+    'BGN', 'BHD', 'BIF', 'BMD', 'BND', 'BOB', 'BRL', 'BSD', 'BTN', 'BWP', 'BYN', 'BZD', 'CAD',
+    'CDF', 'CHF', 'CLP', 'CNY', 'COP', 'CRC', 'CUP', 'CVE', 'CZK', 'DJF', 'DKK', 'DOP', 'DZD',
+    'EGP', 'ERN', 'ETB', 'EUR', 'FJD', 'FKP', 'GBP', 'GEL', 'GHS', 'GIP', 'GMD', 'GNF', 'GTQ',
+    'GYD', 'HKD', 'HNL', 'HTG', 'HUF', 'IDR', 'ILS', 'INR', 'IQD', 'IRR', 'ISK', 'JMD', 'JOD',
+    'JPY', 'KES', 'KGS', 'KHR', 'KMF', 'KPW', 'KRW', 'KWD', 'KYD', 'KZT', 'LAK', 'LBP', 'LKR',
+    'LRD', 'LSL', 'LYD', 'MAD', 'MDL', 'MGA', 'MKD', 'MMK', 'MNT', 'MOP', 'MRU', 'MUR', 'MVR',
+    'MWK', 'MXN', 'MYR', 'MZN', 'NAD', 'NGN', 'NIO', 'NOK', 'NPR', 'NZD', 'OMR', 'PAB', 'PEN',
+    'PGK', 'PHP', 'PKR', 'PLN', 'PYG', 'QAR', 'RON', 'RSD', 'RUB', 'RWF', 'SAR', 'SBD', 'SCR',
+    'SDG', 'SEK', 'SGD', 'SHP', 'SLE', 'SOS', 'SRD', 'SSP', 'STN', 'SVC', 'SYP', 'SZL', 'THB',
+    'TJS', 'TMT', 'TND', 'TOP', 'TRY', 'TTD', 'TWD', 'TZS', 'UAH', 'UGX', 'USD', 'UYU', 'UZS',
+    'VES', 'VND', 'VUV', 'WST', 'XAF', 'XCD', 'XOF', 'XPF', 'YER', 'ZAR', 'ZMW', 'ZWL'
+})
+# A symbol or three-letter code leading or trailing the amount, outside any sign or
+# parentheses: "$1,234.56", "-€12,50", "(USD 1,234.56)", "1.234,56 EUR"
+CURRENCY_RE = re.compile(
+    r'^[(\s-]*([^\w\s(),.\'-]|[A-Z]{3}(?![A-Za-z]))|(?<![A-Za-z])([A-Z]{3}|[^\w\s(),.\'-])[)\s-]*$'
+)
+
+# Date formats recognised by parse_date, besides the strptime ones
+EXCEL_SERIAL = 'excel_serial'
+QUARTER = 'quarter'
+QUARTER_RE = re.compile(r'Q[1-4][\s-]?\d{2,4}', re.IGNORECASE)
+YEAR_RE = re.compile(r'\d{2,4}')
+MONTH_YEAR_RE = re.compile(r'[A-Za-z]{3,9}\s\d{4}', re.IGNORECASE)
+MON_YY_RE = re.compile(r'[A-Za-z]{3}-\d{2}', re.IGNORECASE)
+STANDARD_DATE_FORMATS = [
+    '%m/%d/%Y', '%d/%m/%Y',  # MM/DD/YYYY, DD/MM/YYYY
+    '%Y-%m-%d', '%d-%b-%Y',  # YYYY-MM-DD, DD-MON-YYYY
+    '%Y/%m/%d', '%d/%m/%y', '%m/%d/%y', # Additional common formats
+    '%b %d, %Y', '%B %d, %Y' # e.g., Jan 01, 2023
+]
+# Quarters the vectorized path reads directly; others (e.g. Q12024) use the scalar path
+STRICT_QUARTER_RE = re.compile(r'^[Qq]([1-4])[\s-](\d{4}|\d{2})$')
+# Day 0 of the Windows (1900-based) Excel date system
+EXCEL_EPOCH = '1899-12-30'
+# Largest magnitude of fixed-point minor units (the int64 range, kept symmetric)
+MAX_INT64 = 2 ** 63 - 1
+# Smallest share of a date column's sample that its inferred format must cover
+# for parse_date_series to convert the column with it in one pass
+MIN_FORMAT_SHARE = 0.5
+
+
+class NumberLocale:
+    """How a locale writes amounts: its decimal separator and thousands separator.
+
+    Instances cannot be changed after construction, so one can be shared by any
+    number of parsers and threads. Unlike locale.setlocale nothing process-wide is
+    touched: each FormatParser carries its own.
+    """
+    __slots__ = ('name', 'decimal_separator', 'thousands_separator', '_table')
+
+    def __init__(self, name, decimal_separator='.', thousands_separator=','):
+        if len(decimal_separator) != 1 or len(thousands_separator) != 1:
+            raise ValueError("Separators must be single characters")
+        if decimal_separator == thousands_separator:
+            raise ValueError("The decimal and thousands separators must differ")
+        object.__setattr__(self, 'name', name)
+        object.__setattr__(self, 'decimal_separator', decimal_separator)
+        object.__setattr__(self, 'thousands_separator', thousands_separator)
+        object.__setattr__(self, '_table', str.maketrans({thousands_separator: None, decimal_separator: '.'}))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("NumberLocale is immutable")
+
+    def __reduce__(self):
+        return NumberLocale, (self.name, self.decimal_separator, self.thousands_separator)
+
+    def __eq__(self, other):
+        return isinstance(other, NumberLocale) and self.__reduce__() == other.__reduce__()
+
+    def __hash__(self):
+        return hash(self.__reduce__()[1])
+
+    def __repr__(self):
+        return f"NumberLocale({self.name!r}, {self.decimal_separator!r}, {self.thousands_separator!r})"
+
+    def normalize(self, s_value):
+        """The string with thousands separators dropped and a '.' decimal point."""
+        return s_value.translate(self._table)
+
+
+US = NumberLocale('en_US', '.', ',')
+EUROPEAN = NumberLocale('de_DE', ',', '.')
+FRENCH = NumberLocale('fr_FR', ',', '\u202f')
+SWISS = NumberLocale('de_CH', '.', "'")
+# Indian grouping (1,23,456.78) uses the same separators as US amounts
+INDIAN = NumberLocale('en_IN', '.', ',')
+LOCALES = {number_locale.name: number_locale for number_locale in (US, EUROPEAN, FRENCH, SWISS, INDIAN)}
+
+
+def get_number_locale(number_locale):
+    """A NumberLocale from an instance, a LOCALES name (e.g. 'de_DE') or None."""
+    if number_locale is None or isinstance(number_locale, NumberLocale):
+        return number_locale
+    try:
+        return LOCALES[number_locale]
+    except KeyError:
+        raise ValueError(f"Unknown number locale {number_locale!r}; expected one of {sorted(LOCALES)}") from None
+
 
 class FormatParser:
-    def __init__(self):
-        # Set locale for currency parsing (e.g., for European format)
-        try:
-            locale.setlocale(locale.LC_ALL, 'en_US.UTF-8')
-        except locale.Error:
-            print("Warning: Could not set locale to en_US.UTF-8. Some currency parsing might be affected.")
+    def __init__(self, cache_size=None, number_locale=None, currency_symbols=None):
+        # Without a number locale the separators are inferred per value (US, European
+        # and Indian styles); with one, every amount is read with its separators
+        self.number_locale = get_number_locale(number_locale)
+        self.currency_symbols = dict(CURRENCY_SYMBOLS, **(currency_symbols or {}))
+        self.currency_codes = ISO_CURRENCY_CODES | set(self.currency_symbols.values())
+        # Opt-in memo of scalar results: financial columns repeat the same amounts and
+        # period labels, so at most cache_size recent values per kind are remembered
+        self.cache_size = cache_size
+        self._build_caches()
+
+    def _build_caches(self):
+        if self.cache_size:
+            self._amount_cache = lru_cache(maxsize=self.cache_size, typed=True)(self._parse_amount)
+            self._date_cache = lru_cache(maxsize=self.cache_size)(self._match_date_uncached)
+        else:
+            self._amount_cache = self._date_cache = None
+
+    def cache_stats(self):
+        """Hit/miss counts and sizes of the scalar caches (None when caching is off)."""
+        if self._amount_cache is None:
+            return None
+        stats = {}
+        for kind, cache in (('amount', self._amount_cache), ('date', self._date_cache)):
+            info = cache.cache_info()
+            stats[kind] = {'hits': info.hits, 'misses': info.misses,
+                           'size': info.currsize, 'maxsize': info.maxsize}
+        return stats
+
+    def clear_cache(self):
+        if self._amount_cache is not None:
+            self._amount_cache.cache_clear()
+            self._date_cache.cache_clear()
+
+    def __getstate__(self):
+        # The caches wrap bound methods and cannot be pickled; workers start empty
+        state = self.__dict__.copy()
+        state['_amount_cache'] = state['_date_cache'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._build_caches()
 
     def parse_amount(self, value, detected_format=None):
-        if pd.isna(value):
+        if self._amount_cache is not None and _is_hashable(value):
+            return self._amount_cache(value, detected_format)
+        return self._parse_amount(value, detected_format)
+
+    def _parse_amount(self, value, detected_format=None):
+        if _is_missing(value):
             return None
-        
+        if isinstance(value, (numbers.Real, Decimal)) and not isinstance(value, bool):
+            # Numbers are taken as they are; their text may be in exponent notation
+            return _number_to_decimal(value)
+
         s_value = str(value).strip()
+        if self.number_locale is not None and isinstance(value, str):
+            s_value = self.number_locale.normalize(s_value)
+        return self._parse_text(s_value)
 
+    def _parse_text(self, s_value):
+        """parse_amount for a stripped string whose separators are already normalized."""
         # Handle abbreviated amounts (K, M, B)
-        if re.match(r'^[\d.]+[KMB]$', s_value, re.IGNORECASE):
+        if ABBREVIATED_RE.match(s_value):
             multiplier = 1
             if s_value.endswith('K') or s_value.endswith('k'):
                 multiplier = 1000
@@ -34,7 +218,7 @@ class FormatParser:
 
         # Handle negative in parentheses (e.g., (1,234.56))
         is_negative = False
-        if re.match(r'^\([\d,.]+\)$', s_value):
+        if PARENTHESES_RE.match(s_value):
             s_value = s_value[1:-1]
             is_negative = True
 
@@ -44,12 +228,10 @@ class FormatParser:
             is_negative = True
 
         # Remove currency symbols and spaces
-        s_value = re.sub(r'[^\d.,-]', '', s_value)
+        s_value = NON_NUMERIC_RE.sub('', s_value)
 
         # Indian format: remove all commas, decimal is always a dot
-        # This regex checks for the Indian numbering system pattern (e.g., 1,23,456.78)
-        # It looks for a digit, then optionally groups of two digits preceded by a comma, then a comma and three digits, then optional decimal part
-        if re.match(r'^\d{1,3}(?:,\d{2})*(?:,\d{3})?(?:\.\d+)?$', s_value):
+        if INDIAN_RE.match(s_value):
             s_value = s_value.replace(',', '')
         # European format (e.g., 1.234,56) - comma as decimal separator
         elif ',' in s_value and '.' in s_value:
@@ -68,72 +250,434 @@ class FormatParser:
         except InvalidOperation:
             return None
 
+    def parse_amount_series(self, series, detected_format=None, fixed_point=False, scale=2):
+        """Parse a whole column of amounts at once.
+
+        Gives the same results as calling parse_amount on every value, including the
+        K/M/B, parentheses, trailing-minus, Indian and European branches. Returns a
+        (values, valid) pair of numpy arrays: values is float64, or int64 minor units
+        (cents for scale=2, rounded half-even) when fixed_point is True, and valid marks
+        the rows that parsed. detected_format is accepted for parity with parse_amount.
+
+        Numeric columns are converted arithmetically, never through their text:
+        integers exactly, floats as the decimal they print as (1e-05 is 0.00001).
+        Only non-finite values, and units outside the int64 range, are invalid.
+        """
+        series = pd.Series(series)
+        with instrumentation.timed('parse.amounts', column=series.name):
+            values, valid = self._parse_amount_series(series, fixed_point, scale)
+        if instrumentation.enabled():
+            _count_parsed('amounts', series, valid)
+        return values, valid
+
+    def _parse_amount_series(self, series, fixed_point, scale):
+        n = len(series)
+        values = np.zeros(n, dtype=np.int64) if fixed_point else np.full(n, np.nan)
+        valid = np.zeros(n, dtype=bool)
+
+        pending = ~series.isna().to_numpy()
+        if series.dtype.kind in 'iuf':
+            if fixed_point:
+                return _number_units(series, pending, scale)
+            values = series.to_numpy(dtype=np.float64, na_value=np.nan, copy=True)
+            valid = pending & np.isfinite(values)
+            values[~valid] = np.nan
+            return values, valid
+
+        positions = np.flatnonzero(pending)
+        if len(positions) == 0:
+            return values, valid
+        strings = series.iloc[positions].astype(str).to_numpy(dtype=object)
+        if self.number_locale is not None and series.dtype.kind in 'OSUT':
+            # Only text is written with the locale's separators; str(1234.5) is not
+            normalize = self.number_locale.normalize
+            originals = series.iloc[positions].to_numpy(dtype=object)
+            strings = np.array([normalize(s_value) if isinstance(value, str) else s_value
+                                for value, s_value in zip(originals, strings)], dtype=object)
+        # Repetitive columns are parsed once per distinct string and broadcast back
+        codes, strings = _factorize_repeats(strings)
+        instrumentation.increment('parse.distinct_values', len(strings), kind='amounts')
+        parsed_values = np.zeros(len(strings), dtype=values.dtype)
+        parsed_valid = np.zeros(len(strings), dtype=bool)
+
+        for start in range(0, len(strings), amount_kernel.BATCH_ROWS):
+            batch = slice(start, start + amount_kernel.BATCH_ROWS)
+            batch_values, batch_valid, fallback = amount_kernel.parse_amount_batch(strings[batch], fixed_point, scale)
+            # Rows outside the kernel's exact range go through the scalar parser
+            for i in np.flatnonzero(fallback):
+                amount = self._parse_text(strings[batch][i].strip())
+                if amount is None:
+                    continue
+                if fixed_point:
+                    units = _decimal_units(amount, scale)
+                    if units is not None:
+                        batch_values[i], batch_valid[i] = units, True
+                else:
+                    batch_values[i], batch_valid[i] = float(amount), True
+            parsed_values[batch] = batch_values
+            parsed_valid[batch] = batch_valid
+        if codes is not None:
+            parsed_values, parsed_valid = parsed_values[codes], parsed_valid[codes]
+        values[positions] = parsed_values
+        valid[positions] = parsed_valid
+        return values, valid
+
+    def parse_amount_units(self, series, scale=2):
+        """Parse a column of amounts into exact int64 minor units (nullable Int64).
+
+        10**scale units make one major unit (cents for scale=2); values that do not
+        parse are <NA>. Use units_to_decimal to get Decimal values back.
+        """
+        series = pd.Series(series)
+        values, valid = self.parse_amount_series(series, fixed_point=True, scale=scale)
+        return pd.Series(pd.arrays.IntegerArray(values, ~valid), index=series.index, name=series.name)
+
     def parse_date(self, value, detected_format=None):
-        if pd.isna(value):
+        if _is_missing(value):
             return None
+        return self._match_date(str(value).strip())[0]
 
-        s_value = str(value).strip()
+    def _match_date(self, s_value):
+        """Parse a stripped date string, returning (datetime, format) or (None, None).
 
+        format is the DATE_FORMATS key of the branch that matched, which lets the
+        column-level parser learn the winning format from a sample.
+        """
+        # detected_format never changes the result, so the string alone is the cache key
+        if self._date_cache is not None:
+            return self._date_cache(s_value)
+        return self._match_date_uncached(s_value)
+
+    def _match_date_uncached(self, s_value):
         # Excel serial date
         if s_value.isdigit() and len(s_value) == 5:
             try:
                 # Excel serial date for Windows (1900-based date system)
-                return datetime.fromordinal(datetime(1900, 1, 1).toordinal() + int(s_value) - 2)
+                return datetime.fromordinal(datetime(1900, 1, 1).toordinal() + int(s_value) - 2), EXCEL_SERIAL
             except ValueError:
                 pass
 
         # Quarter format (e.g., Q1 2024, Q1-24)
-        if re.match(r'Q[1-4][\s-]?\d{2,4}', s_value, re.IGNORECASE):
-            year_match = re.search(r'\d{2,4}', s_value)
+        if QUARTER_RE.match(s_value):
+            year_match = YEAR_RE.search(s_value)
             if year_match:
                 year = int(year_match.group())
                 if len(str(year)) == 2: # Handle 2-digit years
                     year += 2000 if year < 50 else 1900 # Simple heuristic
                 quarter = int(s_value[1])
                 month = (quarter - 1) * 3 + 1
-                return datetime(year, month, 1)
+                try:
+                    return datetime(year, month, 1), QUARTER
+                except ValueError:
+                    pass
 
         # Month Year format (e.g., Mar 2024, March 2024)
-        if re.match(r'[A-Za-z]{3,9}\s\d{4}', s_value, re.IGNORECASE):
-            try:
-                return datetime.strptime(s_value, '%b %Y')
-            except ValueError:
+        if MONTH_YEAR_RE.match(s_value):
+            for fmt in ('%b %Y', '%B %Y'):
                 try:
-                    return datetime.strptime(s_value, '%B %Y')
+                    return datetime.strptime(s_value, fmt), fmt
                 except ValueError:
                     pass
-        
+
         # Mon-YY format (e.g., Dec-23)
-        if re.match(r'[A-Za-z]{3}-\d{2}', s_value, re.IGNORECASE):
+        if MON_YY_RE.match(s_value):
             try:
-                return datetime.strptime(s_value, '%b-%y')
+                return datetime.strptime(s_value, '%b-%y'), '%b-%y'
             except ValueError:
                 pass
 
         # Standard date formats
-        date_formats = [
-            '%m/%d/%Y', '%d/%m/%Y',  # MM/DD/YYYY, DD/MM/YYYY
-            '%Y-%m-%d', '%d-%b-%Y',  # YYYY-MM-DD, DD-MON-YYYY
-            '%Y/%m/%d', '%d/%m/%y', '%m/%d/%y', # Additional common formats
-            '%b %d, %Y', '%B %d, %Y' # e.g., Jan 01, 2023
-        ]
-        for fmt in date_formats:
+        for fmt in STANDARD_DATE_FORMATS:
             try:
-                return datetime.strptime(s_value, fmt)
+                return datetime.strptime(s_value, fmt), fmt
             except ValueError:
                 pass
 
-        return None
+        return None, None
+
+    def infer_date_format(self, series, sample_size=200):
+        """Return the format that parse_date picks most often over a sample of the column.
+
+        The result is EXCEL_SERIAL, QUARTER or a strptime format string, or None when
+        no sampled value parses.
+        """
+        return self._infer_date_format(series, sample_size)[0]
+
+    def _infer_date_format(self, series, sample_size):
+        """(infer_date_format result, share of the sampled values in that format)."""
+        series = pd.Series(series).dropna()
+        if len(series) > sample_size:
+            series = series.sample(sample_size, random_state=0)
+        counts = {}
+        for value in series:
+            fmt = self._match_date(str(value).strip())[1]
+            if fmt is not None:
+                counts[fmt] = counts.get(fmt, 0) + 1
+        if not counts:
+            return None, 0.0
+        fmt = max(counts, key=counts.get)
+        return fmt, counts[fmt] / len(series)
+
+    def parse_date_series(self, series, detected_format=None, sample_size=200):
+        """Parse a whole column of dates into a datetime64[ns] Series.
+
+        The winning format is inferred once from a sample (or taken from
+        detected_format) and the whole column is converted in one vectorized pass.
+        Only the rows it does not cover go through parse_date, so each row is read
+        with the column's format first, and ambiguous day/month values come out the
+        same way across the column. When no format covers at least
+        MIN_FORMAT_SHARE of the sample, the pass would leave most rows over, so
+        each distinct value goes through parse_date instead. Columns that are
+        already datetime64 are returned as they are, and values outside the
+        datetime64[ns] range become NaT.
+        """
+        series = pd.Series(series)
+        with instrumentation.timed('parse.dates', column=series.name):
+            result = self._parse_date_series(series, detected_format, sample_size)
+        if instrumentation.enabled():
+            _count_parsed('dates', series, result.notna().to_numpy())
+        return result
+
+    def _parse_date_series(self, series, detected_format, sample_size):
+        if pd.api.types.is_datetime64_any_dtype(series):
+            if getattr(series.dt, 'tz', None) is not None:
+                series = series.dt.tz_localize(None)
+            return pd.Series(_to_datetime64_ns(series.to_numpy()), index=series.index, name=series.name)
+
+        result = np.full(len(series), np.datetime64('NaT'), dtype='datetime64[ns]')
+        positions = np.flatnonzero(~series.isna().to_numpy())
+        raw = series.iloc[positions].astype(str).to_numpy(dtype=object)
+        if detected_format is not None:
+            fmt = detected_format
+        else:
+            fmt, share = self._infer_date_format(raw, sample_size)
+            if share < MIN_FORMAT_SHARE:
+                fmt = None
+        if fmt is None and len(raw):
+            # Every row takes the scalar path, so never parse a repeated string twice
+            codes, raw = pd.factorize(raw)
+            raw = np.asarray(raw, dtype=object)
+        else:
+            # Repetitive columns are parsed once per distinct string and broadcast back
+            codes, raw = _factorize_repeats(raw)
+        instrumentation.increment('parse.distinct_values', len(raw), kind='dates')
+        strings = np.array([value.strip() for value in raw], dtype=object)
+        parsed_dates = np.full(len(strings), np.datetime64('NaT'), dtype='datetime64[ns]')
+
+        parsed = np.zeros(len(strings), dtype=bool)
+        if fmt is not None and len(strings):
+            converted = _convert_dates(strings, fmt)
+            parsed = ~np.isnat(converted)
+            parsed_dates[parsed] = converted[parsed]
+
+        # Leftover rows take the scalar path
+        leftover = np.flatnonzero(~parsed)
+        if len(leftover):
+            # Parsed once per distinct string here too, when the column was not factorized
+            left_codes, left_strings = pd.factorize(strings[leftover]) if codes is None else (None, strings[leftover])
+            matched = [self._match_date(s_value)[0] for s_value in left_strings]
+            matched = _to_datetime64_ns(np.array(matched, dtype='datetime64[us]'))
+            parsed_dates[leftover] = matched if left_codes is None else matched[left_codes]
+        result[positions] = parsed_dates if codes is None else parsed_dates[codes]
+        return pd.Series(result, index=series.index, name=series.name)
 
-    def normalize_currency(self, value):
-        # This method would be more complex in a real scenario, involving currency conversion rates.
-        # For this project, we'll assume normalization means converting to a standard Decimal format.
-        return self.parse_amount(value)
+    def parse_currency(self, value, default=None):
+        """ISO code of the currency an amount is written in ('$1.00' -> 'USD'), else default.
+
+        Symbols map through currency_symbols; known three-letter codes (ISO 4217, or
+        in currency_symbols) written before or after the amount are taken as they
+        are, other letters are not a currency. Non-text values have no currency.
+        """
+        if not isinstance(value, str):
+            return default
+        code = self._match_currency(value.strip())
+        return default if code is None else code
+
+    def _match_currency(self, s_value):
+        match = CURRENCY_RE.search(s_value)
+        if match is None:
+            return None
+        token = match.group(1) or match.group(2)
+        if len(token) == 3:
+            return token if token in self.currency_codes else None
+        return self.currency_symbols.get(token)
+
+    def parse_currency_series(self, series, default=None):
+        """parse_currency for a whole column: an object Series of ISO codes.
+
+        Values without a currency get default, missing values None.
+        """
+        series = pd.Series(series)
+        codes = np.full(len(series), None, dtype=object)
+        codes[series.notna().to_numpy(dtype=bool, na_value=False)] = default
+        if series.dtype.kind in 'OSUT':
+            values = series.to_numpy(dtype=object)
+            positions = np.flatnonzero([isinstance(value, str) for value in values])
+            if len(positions):
+                repeats, strings = _factorize_repeats(values[positions])
+                matched = np.array([self._match_currency(s_value.strip()) for s_value in strings], dtype=object)
+                if repeats is not None:
+                    matched = matched[repeats]
+                found = np.not_equal(matched, None)
+                codes[positions[found]] = matched[found]
+        return pd.Series(codes, index=series.index, name=series.name, dtype=object)
+
+    def normalize_currency(self, value, default=None):
+        """(Decimal amount, ISO currency code) for one value; either is None when absent.
+
+        Use fx_rates.FxRates to convert parsed columns into a reporting currency.
+        """
+        amount = self.parse_amount(value)
+        return amount, (self.parse_currency(value, default) if amount is not None else None)
 
     def handle_special_formats(self, value):
         # This method can be extended for other special formats not covered by parse_amount or parse_date
         return value
 
-import pandas as pd
 
+def units_to_decimal(units, scale):
+    """Exact Decimal for an amount held as minor units; None for a missing value."""
+    if _is_missing(units):
+        return None
+    return Decimal(int(units)).scaleb(-scale)
+
+
+def decimal_to_units(value, scale):
+    """Minor units for an amount given in major units (int when exact, else float).
+
+    Lets callers compare against fixed-point columns using ordinary amounts, e.g. a
+    filter value of 12.5 becomes 1250 units at scale 2.
+    """
+    units = Decimal(str(value)).scaleb(scale)
+    if units == units.to_integral_value():
+        return int(units)
+    return float(units)
+
+
+def _number_to_decimal(value):
+    """Exact Decimal of a number, floats as the decimal they print as; None if not finite."""
+    if isinstance(value, Decimal):
+        return value if value.is_finite() else None
+    if isinstance(value, numbers.Integral):
+        return Decimal(int(value))
+    value = float(value)
+    return Decimal(repr(value)) if value - value == 0 else None
+
+
+def _decimal_units(amount, scale):
+    """int minor units of a Decimal amount, rounded half-even, or None beyond int64."""
+    units = amount.scaleb(scale)
+    if units.adjusted() > 18:
+        return None
+    units = int(units.quantize(Decimal(1), rounding=ROUND_HALF_EVEN))
+    return units if -MAX_INT64 <= units <= MAX_INT64 else None
+
+
+def _number_units(series, present, scale):
+    """parse_amount_series(fixed_point=True) for a numeric column, computed arithmetically."""
+    n = len(series)
+    units = np.zeros(n, dtype=np.int64)
+    valid = np.zeros(n, dtype=bool)
+    factor = 10 ** scale
+    if series.dtype.kind in 'iu':
+        limit = MAX_INT64 // factor
+        numbers = series.to_numpy(dtype=np.uint64 if series.dtype.kind == 'u' else np.int64, na_value=0)
+        valid = present & (numbers <= limit)
+        if series.dtype.kind == 'i':
+            valid &= numbers >= -limit
+        units[valid] = numbers[valid].astype(np.int64) * factor
+        return units, valid
+    values = series.to_numpy(dtype=np.float64, na_value=np.nan)
+    with np.errstate(invalid='ignore', over='ignore'):
+        scaled = values * factor
+        magnitude = np.abs(scaled)
+        finite = present & np.isfinite(scaled)
+        # Rounding the product is exact unless it lands next to a half (1.015 * 100 is
+        # 101.49999999999999) or past 2**53, where floats skip integers; those rows are
+        # rounded from the decimal the float prints as
+        halfway = np.abs(np.abs(scaled - np.trunc(scaled)) - 0.5) <= np.maximum(magnitude * 2.0 ** -48, 1e-9)
+        fast = finite & ~halfway & (magnitude < 2.0 ** 53)
+    units[fast] = np.round(scaled[fast]).astype(np.int64)
+    valid[fast] = True
+    for i in np.flatnonzero(finite & ~fast):
+        amount = _decimal_units(Decimal(repr(float(values[i]))), scale)
+        if amount is not None:
+            units[i], valid[i] = amount, True
+    return units, valid
+
+
+def _count_parsed(kind, series, valid):
+    present = series.notna().to_numpy(dtype=bool, na_value=False)
+    instrumentation.increment('parse.rows', len(series), kind=kind)
+    instrumentation.increment('parse.values', int(present.sum()), kind=kind)
+    instrumentation.increment('parse.failures', int((present & ~valid).sum()), kind=kind, column=series.name)
+
+
+def _is_missing(value):
+    """pd.isna for one value; plain Python values are checked without loading pandas."""
+    if value is None:
+        return True
+    if isinstance(value, (str, int)):
+        return False
+    if isinstance(value, float):
+        return value != value
+    if isinstance(value, Decimal):
+        return value.is_nan()
+    return pd.isna(value)
+
+
+def _is_hashable(value):
+    try:
+        hash(value)
+        return True
+    except TypeError:
+        return False
+
+
+def _factorize_repeats(strings, sample_size=2048):
+    """(codes, uniques) for a string array that repeats a lot, else (None, strings).
+
+    Repetition is estimated from an evenly spaced sample, so high-cardinality columns
+    skip the factorize pass entirely.
+    """
+    if len(strings) < 2:
+        return None, strings
+    sample = strings[::max(1, len(strings) // sample_size)]
+    if len(set(sample)) * 2 > len(sample):
+        return None, strings
+    codes, uniques = pd.factorize(strings)
+    return codes, np.asarray(uniques, dtype=object)
+
+
+def _to_datetime64_ns(values):
+    """Convert a datetime64 array of any unit to datetime64[ns], with NaT outside its range."""
+    values = np.asarray(values)
+    in_range = (values >= np.datetime64('1677-09-22', 'D')) & (values <= np.datetime64('2262-04-10', 'D'))
+    return np.where(in_range, values, np.datetime64('NaT')).astype('datetime64[ns]')
+
+
+def _convert_dates(strings, fmt):
+    """Vectorized conversion of stripped date strings in a single known format.
+
+    Returns datetime64[ns] with NaT where a string does not fit the format.
+    """
+    if fmt == EXCEL_SERIAL:
+        serial = np.fromiter((len(s) == 5 and s.isascii() and s.isdigit() for s in strings), dtype=bool, count=len(strings))
+        days = np.zeros(len(strings), dtype=np.int64)
+        days[serial] = np.array(strings[serial], dtype=np.int64)
+        return np.where(serial, np.datetime64(EXCEL_EPOCH, 'D') + days.astype('timedelta64[D]'), np.datetime64('NaT')).astype('datetime64[ns]')
+
+    if fmt == QUARTER:
+        parts = pd.Series(strings, dtype=object).str.extract(STRICT_QUARTER_RE)
+        matched = parts[0].notna().to_numpy(copy=True)
+        quarter = parts[0].fillna('1').astype(int).to_numpy()
+        year = parts[1].fillna('2000').astype(int).to_numpy()
+        # Same 2-digit year heuristic as parse_date
+        year = np.where((year >= 10) & (year <= 99), year + np.where(year < 50, 2000, 1900), year)
+        matched &= year >= 1
+        months = (np.clip(year, 1, 9999) - 1970) * 12 + (quarter - 1) * 3
+        dates = months.astype('datetime64[M]').astype('datetime64[D]')
+        return _to_datetime64_ns(np.where(matched, dates, np.datetime64('NaT')))
 
+    converted = pd.to_datetime(pd.Series(strings, dtype=object), format=fmt, errors='coerce')
+    return _to_datetime64_ns(converted.to_numpy())
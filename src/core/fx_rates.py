@@ -0,0 +1,176 @@
+
+import logging
+
+import numpy as np
+import pandas as pd
+
+try:
+    from . import instrumentation
+except ImportError:
+    import instrumentation
+
+logger = logging.getLogger(__name__)
+
+# Currency keys of the rate table besides its own (0, 1, ...)
+BASE_KEY = -1
+UNKNOWN_KEY = -2
+
+
+class FxRates:
+    """Dated exchange rates against one base currency, for converting whole columns.
+
+    Each rate is the number of units of a currency that one unit of the base buys,
+    from its date until the currency's next rate (as in ECB reference rates: base EUR,
+    USD 1.0823). Amounts convert between any two currencies through the base. Every
+    row uses the latest rate dated on or before its own date, found for all rows at
+    once with pd.merge_asof; tolerance (e.g. '7D') limits how old that rate may be.
+    Rows without a usable rate convert to NaN.
+    """
+
+    def __init__(self, rates, base, tolerance=None):
+        """rates is a DataFrame with 'date', 'currency' and 'rate' columns."""
+        self.base = base
+        self.tolerance = pd.Timedelta(tolerance) if tolerance is not None else None
+        table = pd.DataFrame({
+            'date': pd.to_datetime(rates['date'], format='ISO8601').astype('datetime64[ns]'),
+            'currency': rates['currency'].astype(object),
+            'rate': pd.to_numeric(rates['rate'], errors='coerce'),
+        })
+        usable = table.notna().all(axis=1) & (table['rate'] > 0) & (table['currency'] != base)
+        if not usable.all():
+            logger.warning("Ignoring %d FX rates that are missing, not positive or for the base currency %s",
+                           int((~usable).sum()), base)
+        # A later row for the same currency and date replaces an earlier one
+        table = table[usable].drop_duplicates(['currency', 'date'], keep='last')
+        self.rates = table.sort_values('date', kind='stable').reset_index(drop=True)
+        # Joined on integer currency ids, which merge_asof matches much faster than strings
+        self._ids = {currency: i for i, currency in enumerate(self.rates['currency'].unique())}
+        self._keyed = pd.DataFrame({'date': self.rates['date'],
+                                    'key': self.rates['currency'].map(self._ids).astype(np.int64),
+                                    'rate': self.rates['rate']})
+
+    @classmethod
+    def from_csv(cls, file_path, base=None, tolerance=None, **kwargs):
+        """Rates from a CSV file with date, currency and rate columns (any letter case).
+
+        The base currency is given as base or read from a 'base' column, which must
+        then hold a single currency. kwargs are passed to pd.read_csv.
+        """
+        rates = pd.read_csv(file_path, **kwargs)
+        rates.columns = [str(column).strip().lower() for column in rates.columns]
+        missing = {'date', 'currency', 'rate'} - set(rates.columns)
+        if missing:
+            raise ValueError(f"{file_path} has no {', '.join(sorted(missing))} column")
+        if 'base' in rates.columns:
+            bases = set(rates['base'].dropna())
+            if base is not None:
+                bases.add(base)
+            if len(bases) != 1:
+                raise ValueError(f"{file_path} must quote every rate against one base currency, not {sorted(bases)}")
+            base = bases.pop()
+        if base is None:
+            raise ValueError(f"{file_path} has no 'base' column; pass the base currency")
+        logger.info("Loaded %d FX rates against %s from %s", len(rates), base, file_path)
+        return cls(rates, base, tolerance)
+
+    def currencies(self):
+        return sorted(set(self.rates['currency']) | {self.base})
+
+    def rate(self, from_currency, to_currency, date):
+        """Units of to_currency one unit of from_currency buys on date, or None."""
+        value = self.convert([1.0], from_currency, date, to_currency).iloc[0]
+        return None if np.isnan(value) else float(value)
+
+    def convert(self, amounts, currencies, dates, to_currency):
+        """Convert a column of amounts into to_currency, each at the rates of its date.
+
+        currencies and dates are columns aligned with amounts, or single values for
+        all rows. Returns a float64 Series with the index of amounts; rows already in
+        to_currency keep their amount exactly. Nullable Int64 minor units convert
+        as plain numbers, so the result is in minor units of the same scale.
+        """
+        amounts = pd.Series(amounts)
+        n = len(amounts)
+        values = amounts.to_numpy(dtype=np.float64, na_value=np.nan)
+        if _is_column(currencies):
+            codes, uniques = pd.factorize(pd.Series(currencies, dtype=object))
+        else:
+            codes, uniques = np.zeros(n, dtype=np.intp), [currencies]
+        dates = np.asarray(pd.to_datetime(dates if _is_column(dates) else [dates] * n), dtype='datetime64[ns]')
+        with instrumentation.timed('fx.convert', currency=to_currency):
+            result = np.full(n, np.nan)
+            same = np.isin(codes, [i for i, code in enumerate(uniques) if code == to_currency])
+            result[same] = values[same]
+            # Rows in date order, so both as-of joins below share one sort
+            pending = np.flatnonzero(~same & (codes >= 0) & ~np.isnan(values) & ~np.isnat(dates))
+            pending = pending[np.argsort(dates[pending], kind='stable')]
+            if len(pending):
+                keys = np.array([self._key(code) for code in uniques], dtype=np.int64)[codes[pending]]
+                source = self._rates_at(keys, dates[pending])
+                target = self._rates_at(np.full(len(pending), self._key(to_currency), dtype=np.int64), dates[pending])
+                result[pending] = values[pending] / source * target
+                _report_missing(to_currency, uniques, codes[pending], source, target)
+            # Amounts without a currency or a date cannot be matched to a rate at all
+            unmatched = int((~same & ~np.isnan(values)).sum()) - len(pending)
+            if unmatched:
+                instrumentation.increment('fx.unmatched_rows', unmatched, currency=to_currency)
+                logger.warning("Cannot convert %d rows to %s: no currency or date", unmatched, to_currency)
+        return pd.Series(result, index=amounts.index, name=amounts.name)
+
+    def convert_frame(self, df, to_currency, amount_columns, date_column, currency_column=None, currency=None):
+        """Copy of df with each amount column also converted, as '<column> (<to_currency>)'.
+
+        Each amount's currency comes from currency_column if given, else from a
+        '<column> Currency' column (apply_schema(..., currencies=True) adds these),
+        else from currency, one code for the whole frame.
+        """
+        converted = {}
+        for column in amount_columns:
+            if currency_column is not None:
+                codes = df[currency_column]
+            elif f"{column} Currency" in df.columns:
+                codes = df[f"{column} Currency"]
+            elif currency is not None:
+                codes = currency
+            else:
+                raise ValueError(f"No currency for '{column}': pass currency_column or currency")
+            converted[f"{column} ({to_currency})"] = self.convert(df[column], codes, df[date_column], to_currency)
+        return df.assign(**converted)
+
+    def _key(self, currency):
+        # BASE_KEY for the base currency, UNKNOWN_KEY for one without rates
+        return BASE_KEY if currency == self.base else self._ids.get(currency, UNKNOWN_KEY)
+
+    def _rates_at(self, keys, dates):
+        """Units per unit of the base for currency keys as of dates, which must be sorted (NaN where unknown)."""
+        rates = np.full(len(keys), np.nan)
+        rates[keys == BASE_KEY] = 1.0
+        known = keys >= 0
+        if known.any():
+            merged = pd.merge_asof(
+                pd.DataFrame({'date': dates[known], 'key': keys[known]}), self._keyed, on='date', by='key',
+                direction='backward', tolerance=self.tolerance,
+            )
+            rates[known] = merged['rate'].to_numpy()
+        return rates
+
+    def __repr__(self):
+        return f"FxRates(base={self.base!r}, currencies={len(self.currencies())}, rates={len(self.rates)})"
+
+
+def _report_missing(to_currency, uniques, codes, source, target):
+    """Warn about rows whose source currency, or else to_currency, had no rate on their dates."""
+    no_source = np.isnan(source)
+    missing = {str(uniques[code]): int(count)
+               for code, count in zip(*np.unique(codes[no_source], return_counts=True))}
+    no_target = int((np.isnan(target) & ~no_source).sum())
+    if no_target:
+        missing[to_currency] = missing.get(to_currency, 0) + no_target
+    for currency, count in sorted(missing.items()):
+        instrumentation.increment('fx.missing_rates', count, currency=currency)
+        logger.warning("No %s rate on or before the dates of %d rows being converted to %s",
+                       currency, count, to_currency)
+
+
+def _is_column(values):
+    return isinstance(values, (pd.Series, pd.Index, np.ndarray, list, tuple))
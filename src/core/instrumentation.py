@@ -0,0 +1,211 @@
+
+import json
+import os
+import re
+import threading
+import time
+from contextlib import nullcontext
+
+# Instrumentation is off until enable() installs a sink. Every recording function
+# checks this first, so when it is off a call costs one global lookup.
+_sink = None
+
+# Shared do-nothing context manager handed out by timed() while disabled
+_NULL_TIMER = nullcontext()
+
+
+def enable(sink=None):
+    """Start recording into sink (a new MemorySink by default) and return it."""
+    global _sink
+    _sink = sink if sink is not None else MemorySink()
+    return _sink
+
+
+def disable():
+    """Stop recording; the previous sink is flushed and returned."""
+    global _sink
+    sink, _sink = _sink, None
+    if sink is not None:
+        sink.flush()
+    return sink
+
+
+def enabled():
+    return _sink is not None
+
+
+def get_sink():
+    return _sink
+
+
+def timed(stage, **labels):
+    """Context manager recording the wall time of a stage, e.g. timed('parse.amounts', column='Amount')."""
+    if _sink is None:
+        return _NULL_TIMER
+    return _Timer(_sink, stage, labels)
+
+
+def observe(stage, seconds, **labels):
+    """Record a duration measured elsewhere, e.g. by a worker process."""
+    if _sink is not None:
+        _sink.record('timer', stage, seconds, labels)
+
+
+def increment(name, value=1, **labels):
+    """Add value to a counter, e.g. increment('parse.failures', 3, column='Amount')."""
+    if _sink is not None:
+        _sink.record('counter', name, value, labels)
+
+
+class _Timer:
+    __slots__ = ('sink', 'stage', 'labels', 'start')
+
+    def __init__(self, sink, stage, labels):
+        self.sink = sink
+        self.stage = stage
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.sink.record('timer', self.stage, time.perf_counter() - self.start, self.labels)
+        return False
+
+
+class MemorySink:
+    """Aggregates metrics in memory: count/sum/min/max per timer, totals per counter.
+
+    Series are keyed by name and labels. snapshot() returns a plain dict, e.g. to
+    compare cache hits with misses or to find the slowest column to detect.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.timers = {}
+        self.counters = {}
+
+    def record(self, kind, name, value, labels):
+        key = (name, tuple(sorted((k, str(v)) for k, v in labels.items())))
+        with self.lock:
+            if kind == 'counter':
+                self.counters[key] = self.counters.get(key, 0) + value
+                return
+            stats = self.timers.get(key)
+            if stats is None:
+                self.timers[key] = {'count': 1, 'sum': value, 'min': value, 'max': value}
+            else:
+                stats['count'] += 1
+                stats['sum'] += value
+                stats['min'] = min(stats['min'], value)
+                stats['max'] = max(stats['max'], value)
+
+    def snapshot(self):
+        """{'timers': {name: [{labels, count, sum, min, max}]}, 'counters': {name: [{labels, value}]}}"""
+        with self.lock:
+            timers, counters = {}, {}
+            for (name, labels), stats in self.timers.items():
+                timers.setdefault(name, []).append(dict(stats, labels=dict(labels)))
+            for (name, labels), value in self.counters.items():
+                counters.setdefault(name, []).append({'labels': dict(labels), 'value': value})
+        return {'timers': timers, 'counters': counters}
+
+    def total(self, name, **labels):
+        """Sum of a counter (or of a timer's seconds) over the series matching labels."""
+        wanted = {(k, str(v)) for k, v in labels.items()}
+        with self.lock:
+            values = [value for (series, key), value in self.counters.items()
+                      if series == name and wanted <= set(key)]
+            values += [stats['sum'] for (series, key), stats in self.timers.items()
+                       if series == name and wanted <= set(key)]
+        return sum(values)
+
+    def reset(self):
+        with self.lock:
+            self.timers = {}
+            self.counters = {}
+
+    def flush(self):
+        pass
+
+
+class JsonLinesSink:
+    """Appends every measurement to a file as one JSON object per line."""
+
+    def __init__(self, path, buffer_size=1000):
+        self.path = path
+        self.buffer_size = buffer_size
+        self.lock = threading.Lock()
+        self.buffer = []
+
+    def record(self, kind, name, value, labels):
+        line = json.dumps({'time': time.time(), 'kind': kind, 'name': name, 'value': value,
+                           'labels': labels}, default=str)
+        with self.lock:
+            self.buffer.append(line)
+            if len(self.buffer) >= self.buffer_size:
+                self._write()
+
+    def flush(self):
+        with self.lock:
+            self._write()
+
+    def _write(self):
+        if self.buffer:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write('\n'.join(self.buffer) + '\n')
+            self.buffer = []
+
+
+class PrometheusSink(MemorySink):
+    """A MemorySink whose flush() writes the totals in Prometheus text format.
+
+    Timers become <prefix>_<name>_seconds summaries (_count and _sum) plus a
+    _seconds_max gauge; counters become <prefix>_<name>_total. Point a node
+    exporter textfile collector at the file, or read it directly.
+    """
+
+    def __init__(self, path, prefix='financial_parser'):
+        super().__init__()
+        self.path = path
+        self.prefix = prefix
+
+    def flush(self):
+        snapshot = self.snapshot()
+        lines = []
+        for name, series in sorted(snapshot['timers'].items()):
+            metric = self._metric_name(name) + '_seconds'
+            lines.append(f"# TYPE {metric} summary")
+            for item in series:
+                lines.append(f"{metric}_count{_labels(item['labels'])} {item['count']}")
+                lines.append(f"{metric}_sum{_labels(item['labels'])} {item['sum']!r}")
+            lines.append(f"# TYPE {metric}_max gauge")
+            for item in series:
+                lines.append(f"{metric}_max{_labels(item['labels'])} {item['max']!r}")
+        for name, series in sorted(snapshot['counters'].items()):
+            metric = self._metric_name(name) + '_total'
+            lines.append(f"# TYPE {metric} counter")
+            for item in series:
+                lines.append(f"{metric}{_labels(item['labels'])} {item['value']!r}")
+        # Write then rename so a scraper never reads a half-written file
+        with open(self.path + '.tmp', 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n')
+        os.replace(self.path + '.tmp', self.path)
+
+    def _metric_name(self, name):
+        return _INVALID_METRIC_CHARS.sub('_', f"{self.prefix}_{name}")
+
+
+_INVALID_METRIC_CHARS = re.compile(r'[^a-zA-Z0-9_:]')
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    escaped = (
+        f'{_INVALID_METRIC_CHARS.sub("_", key)}="'
+        + str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') + '"'
+        for key, value in sorted(labels.items())
+    )
+    return '{' + ','.join(escaped) + '}'
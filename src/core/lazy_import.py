@@ -0,0 +1,23 @@
+
+import importlib
+
+
+class LazyModule:
+    """Stands in for a module that is only imported on first attribute access.
+
+    np = LazyModule('numpy') costs nothing at import time; the first np.<name>
+    imports numpy and copies its namespace onto the stand-in, so later lookups are
+    plain attribute reads. Concurrent first accesses are serialized by the import
+    lock. package makes name relative to it, as in importlib.import_module.
+    """
+
+    def __init__(self, name, package=None):
+        self.__dict__['_lazy_target'] = ('.' + name, package) if package else (name, None)
+
+    def __getattr__(self, attr):
+        module = importlib.import_module(*self._lazy_target)
+        self.__dict__.update(module.__dict__)
+        return getattr(module, attr)
+
+    def __repr__(self):
+        return f"<lazy module {self._lazy_target[0].lstrip('.')!r}>"
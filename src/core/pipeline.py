@@ -0,0 +1,217 @@
+
+import logging
+import os
+import queue
+import threading
+import time
+
+import pandas as pd
+
+try:
+    from . import instrumentation
+    from .data_storage import DataStorage
+    from .excel_processor import ExcelProcessor, apply_schema, list_sheets
+    from .format_parser import FormatParser
+    from .type_detector import DataTypeDetector
+except ImportError:
+    import instrumentation
+    from data_storage import DataStorage
+    from excel_processor import ExcelProcessor, apply_schema, list_sheets
+    from format_parser import FormatParser
+    from type_detector import DataTypeDetector
+
+logger = logging.getLogger(__name__)
+
+# Marks the end of a stage's output
+_DONE = object()
+
+
+class IngestPipeline:
+    """Stream workbooks into a DataStorage: read -> detect/parse -> store.
+
+    Each stage runs on its own thread(s) and hands chunks to the next through a
+    bounded queue, so reading, parsing and storing overlap, and a slow stage makes
+    the ones before it wait instead of piling chunks up in memory. Every sheet
+    becomes one dataset; its schema is detected on its first chunk and reused for
+    the rest. Parsed chunks are buffered up to flush_rows rows before being
+    appended to storage. With amount_scale, amount columns are stored as exact
+    fixed-point amounts at that scale (see DataStorage.store_data): the number
+    columns named in amount_columns, or by default those each sheet's schema
+    detects as money; other number columns stay float64.
+    """
+
+    def __init__(self, storage=None, processor=None, detector=None, parser=None,
+                 chunksize=10000, queue_size=4, parse_workers=1, flush_rows=100000, amount_scale=None,
+                 amount_columns=None):
+        self.storage = storage if storage is not None else DataStorage()
+        self.processor = processor or ExcelProcessor()
+        self.detector = detector or DataTypeDetector()
+        self.parser = parser or FormatParser()
+        self.chunksize = chunksize
+        self.queue_size = queue_size
+        self.parse_workers = parse_workers
+        self.flush_rows = flush_rows
+        self.amount_scale = amount_scale
+        self.amount_columns = amount_columns
+        self.schemas = {}
+
+    def ingest_directory(self, directory, extensions=('.xlsx', '.xls')):
+        # Extensions are compared case-insensitively (e.g. KH_Bank.XLSX)
+        file_paths = sorted(
+            os.path.join(directory, entry) for entry in os.listdir(directory)
+            if os.path.splitext(entry)[1].lower() in extensions
+        )
+        return self.ingest(file_paths)
+
+    def ingest(self, file_paths, dataset_name=None):
+        """Ingest every sheet of every file and return a report.
+
+        dataset_name(file_path, sheet_name) names each sheet's dataset; by default
+        it is '<file name without extension>/<sheet name>'. The report lists rows and
+        chunks per dataset, any per-file or per-chunk errors, and the elapsed seconds.
+        A file that fails is reported and skipped; the others are still ingested.
+        """
+        dataset_name = dataset_name or _default_dataset_name
+        report = {'datasets': {}, 'errors': [], 'seconds': 0.0}
+        start = time.perf_counter()
+        stop = threading.Event()
+        lock = threading.Lock()
+        read_queue = queue.Queue(maxsize=self.queue_size)
+        parsed_queue = queue.Queue(maxsize=self.queue_size)
+
+        def error(source, e):
+            with lock:
+                report['errors'].append({'source': source, 'error': str(e)})
+            logger.error("Error ingesting %s: %s", source, e)
+            instrumentation.increment('pipeline.errors')
+
+        def read():
+            sequence = 0
+            try:
+                for file_path in file_paths:
+                    try:
+                        sheets = list_sheets(file_path)
+                        for sheet_name in sheets:
+                            name = dataset_name(file_path, sheet_name)
+                            for chunk in self.processor.iter_chunks(file_path, sheet_name, self.chunksize):
+                                if not _put(read_queue, (sequence, name, file_path, sheet_name, chunk), stop):
+                                    return
+                                sequence += 1
+                    except Exception as e:
+                        error(file_path, e)
+            finally:
+                for _ in range(self.parse_workers):
+                    _put(read_queue, _DONE, stop)
+
+        def parse():
+            try:
+                while True:
+                    item = _get(read_queue, stop)
+                    if item is _DONE:
+                        break
+                    sequence, name, file_path, sheet_name, chunk = item
+                    try:
+                        schema = self._schema_for(name, chunk, lock)
+                        with instrumentation.timed('pipeline.parse', dataset=name):
+                            typed = apply_schema(chunk, schema, self.parser, self.amount_scale,
+                                                 amount_columns=self.amount_columns)
+                    except Exception as e:
+                        error(f"{file_path} [{sheet_name}]", e)
+                        typed = None
+                    if not _put(parsed_queue, (sequence, name, file_path, sheet_name, typed), stop):
+                        break
+            finally:
+                _put(parsed_queue, _DONE, stop)
+
+        threads = [threading.Thread(target=read, daemon=True)]
+        threads += [threading.Thread(target=parse, daemon=True) for _ in range(self.parse_workers)]
+        for thread in threads:
+            thread.start()
+
+        try:
+            self._store(parsed_queue, report)
+        finally:
+            stop.set()
+            for thread in threads:
+                thread.join()
+        report['seconds'] = time.perf_counter() - start
+        instrumentation.observe('pipeline.ingest', report['seconds'])
+        return report
+
+    def _schema_for(self, name, chunk, lock):
+        # Detected once per dataset, on whichever chunk of it is parsed first
+        with lock:
+            if name not in self.schemas:
+                with instrumentation.timed('pipeline.detect', dataset=name):
+                    self.schemas[name] = self.detector.detect_schema(chunk)
+            return self.schemas[name]
+
+    def _store(self, parsed_queue, report):
+        # Chunks can finish parsing out of order; store them in read order
+        pending, next_sequence = {}, 0
+        buffers = {}
+        remaining = self.parse_workers
+        while remaining:
+            item = parsed_queue.get()
+            if item is _DONE:
+                remaining -= 1
+                continue
+            pending[item[0]] = item
+            while next_sequence in pending:
+                _, name, file_path, sheet_name, typed = pending.pop(next_sequence)
+                next_sequence += 1
+                if typed is None:
+                    continue
+                stats = report['datasets'].setdefault(
+                    name, {'source': file_path, 'sheet': sheet_name, 'rows': 0, 'chunks': 0}
+                )
+                stats['rows'] += len(typed)
+                stats['chunks'] += 1
+                # Starting another dataset flushes the previous ones
+                for other in [other for other in buffers if other != name]:
+                    self._flush(other, buffers.pop(other), report)
+                buffers.setdefault(name, []).append(typed)
+                if sum(len(chunk) for chunk in buffers[name]) >= self.flush_rows:
+                    self._flush(name, buffers.pop(name), report)
+        for name, chunks in buffers.items():
+            self._flush(name, chunks, report)
+
+    def _flush(self, name, chunks, report):
+        stats = report['datasets'][name]
+        schema = self.schemas[name]
+        amounts = None
+        if self.amount_scale is not None:
+            names = schema.amount_columns() if self.amount_columns is None else self.amount_columns
+            amounts = {column: {'scale': self.amount_scale}
+                       for column in schema.columns_of_type('number') if column in names}
+        with instrumentation.timed('pipeline.store', dataset=name):
+            self.storage.append_data(name, pd.concat(chunks, ignore_index=True), {
+                'source': stats['source'],
+                'sheet': stats['sheet'],
+                'schema': schema.to_dict(),
+            }, amounts)
+
+
+def _default_dataset_name(file_path, sheet_name):
+    return f"{os.path.splitext(os.path.basename(file_path))[0]}/{sheet_name}"
+
+
+def _put(target, item, stop):
+    """Put into a bounded queue, waiting while it is full; False if the pipeline stopped."""
+    while not stop.is_set():
+        try:
+            target.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _get(source, stop):
+    """Take from a queue, waiting while it is empty; _DONE if the pipeline stopped."""
+    while not stop.is_set():
+        try:
+            return source.get(timeout=0.1)
+        except queue.Empty:
+            continue
+    return _DONE
@@ -0,0 +1,338 @@
+
+import datetime
+import hashlib
+import importlib.util
+import json
+import logging
+import math
+import os
+import time
+from decimal import Decimal
+
+import numpy as np
+import pandas as pd
+
+try:
+    from . import instrumentation
+except ImportError:
+    import instrumentation
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever reading a sheet changes what a cached raw frame would contain, so
+# older entries are ignored instead of being served. Typed entries need no bump:
+# their variant includes a hash of the parsing modules' source
+PARSER_VERSION = 1
+
+DEFAULT_CACHE_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), '..', '..', 'data', 'processed', 'cache'
+)
+
+# Only needed for Parquet support. Looked up without importing it, which takes
+# longer than everything else this module loads; to_parquet imports it when used.
+HAS_PYARROW = importlib.util.find_spec('pyarrow') is not None
+
+
+class SheetCache:
+    """On-disk cache of parsed sheets, keyed by file content, sheet name and parser version.
+
+    Sheets are written as Parquet when pyarrow is available and the frame converts
+    cleanly, otherwise as column arrays in an .npz file (see write_columns). Neither
+    format is pickled, so reading a cache directory shared with other users never
+    runs code from it; a sheet holding values neither can store is not cached.
+    A file is only hashed
+    when its mtime or size differ from what the index recorded for that path. Once
+    the cache grows past max_bytes the least recently used entries are deleted.
+
+    The index is written when entries are added or removed; hits only update it in
+    memory, and close() (or the next put) saves their recency.
+    """
+
+    def __init__(self, cache_dir=None, max_bytes=2 * 1024 ** 3):
+        self.cache_dir = os.path.abspath(cache_dir or DEFAULT_CACHE_DIR)
+        self.max_bytes = max_bytes
+        self.index_path = os.path.join(self.cache_dir, 'index.json')
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.index = self._read_index()
+        self._dirty = False
+
+    def get(self, file_path, sheet_name, variant='raw', with_metadata=False):
+        """Cached DataFrame for a sheet, or None on a miss.
+
+        variant separates different stages of the same sheet, e.g. 'raw' for the
+        frame read from Excel and a 'typed-...' one for a frame whose columns were
+        parsed (see ExcelProcessor.extract_typed). With with_metadata, returns
+        (df, metadata given to put), or (None, None) on a miss.
+        """
+        miss = (None, None) if with_metadata else None
+        key = self._entry_key(file_path, sheet_name, variant)
+        entry = self.index['entries'].get(key)
+        if entry is None:
+            instrumentation.increment('cache.misses', cache='sheet_cache')
+            return miss
+        path = os.path.join(self.cache_dir, entry['file'])
+        try:
+            if entry['format'] == 'parquet':
+                df = pd.read_parquet(path)
+            elif entry['format'] == 'npz':
+                df = read_columns(path)
+            else:
+                # Entries pickled by older versions are never unpickled
+                raise ValueError(f"unsupported format {entry['format']!r}")
+        except Exception as e:
+            logger.warning("Discarding unreadable cache entry for %s from %s: %s", sheet_name, file_path, e)
+            self._remove(key)
+            self._write_index()
+            instrumentation.increment('cache.misses', cache='sheet_cache')
+            return miss
+        instrumentation.increment('cache.hits', cache='sheet_cache')
+        instrumentation.increment('cache.bytes_read', entry['bytes'], cache='sheet_cache')
+        entry['last_used'] = time.time()
+        self._dirty = True
+        return (df, entry.get('metadata')) if with_metadata else df
+
+    def put(self, file_path, sheet_name, df, variant='raw', metadata=None):
+        """Cache a sheet's DataFrame, with optional JSON-serializable metadata kept in the index."""
+        key = self._entry_key(file_path, sheet_name, variant)
+        tmp_path = os.path.join(self.cache_dir, key + '.tmp')
+        fmt = None
+        if HAS_PYARROW:
+            try:
+                df.to_parquet(tmp_path)
+                fmt = 'parquet'
+            except Exception:
+                # Mixed-type object columns or non-string column names; keep the exact frame
+                pass
+        if fmt is None:
+            try:
+                with open(tmp_path, 'wb') as f:
+                    write_columns(df, f)
+            except (TypeError, ValueError) as e:
+                os.remove(tmp_path)
+                logger.info("Not caching %s from %s: %s", sheet_name, file_path, e)
+                return
+            fmt = 'npz'
+        name = key + '.' + fmt
+        path = os.path.join(self.cache_dir, name)
+        os.replace(tmp_path, path)
+
+        if key in self.index['entries'] and self.index['entries'][key]['file'] != name:
+            self._remove(key)
+        self.index['entries'][key] = {
+            'file': name, 'format': fmt, 'bytes': os.path.getsize(path), 'last_used': time.time()
+        }
+        if metadata is not None:
+            self.index['entries'][key]['metadata'] = metadata
+        self._evict(keep=key)
+        self._write_index()
+
+    def file_hash(self, file_path):
+        """SHA-256 of the file, reusing the recorded hash while mtime and size are unchanged."""
+        file_path = os.path.abspath(file_path)
+        stat = os.stat(file_path)
+        known = self.index['files'].get(file_path)
+        if known and known['mtime_ns'] == stat.st_mtime_ns and known['size'] == stat.st_size:
+            return known['sha256']
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(block)
+        self.index['files'][file_path] = {
+            'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size, 'sha256': digest.hexdigest()
+        }
+        self._dirty = True
+        return digest.hexdigest()
+
+    def size(self):
+        return sum(entry['bytes'] for entry in self.index['entries'].values())
+
+    def clear(self):
+        for key in list(self.index['entries']):
+            self._remove(key)
+        self.index['files'] = {}
+        self._write_index()
+
+    def close(self):
+        """Save index changes that are only in memory: hit recency and new file hashes."""
+        if self._dirty:
+            self._write_index()
+
+    def _entry_key(self, file_path, sheet_name, variant):
+        parts = [self.file_hash(file_path), str(sheet_name), variant, str(PARSER_VERSION)]
+        return hashlib.sha256('\0'.join(parts).encode('utf-8')).hexdigest()[:32]
+
+    def _evict(self, keep=None):
+        total = self.size()
+        for key in sorted(self.index['entries'], key=lambda k: self.index['entries'][k]['last_used']):
+            if total <= self.max_bytes:
+                break
+            if key != keep:
+                total -= self.index['entries'][key]['bytes']
+                self._remove(key)
+
+    def _remove(self, key):
+        entry = self.index['entries'].pop(key)
+        try:
+            os.remove(os.path.join(self.cache_dir, entry['file']))
+        except FileNotFoundError:
+            pass
+
+    def _read_index(self):
+        try:
+            with open(self.index_path) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {'files': {}, 'entries': {}}
+
+    def _write_index(self):
+        # Write then rename so a crash never leaves a half-written index behind
+        with open(self.index_path + '.tmp', 'w') as f:
+            json.dump(self.index, f)
+        os.replace(self.index_path + '.tmp', self.index_path)
+        self._dirty = False
+
+
+def write_columns(df, file):
+    """Write a DataFrame as plain arrays in an .npz file, without pickling anything.
+
+    NumPy columns are saved as they are and nullable (Int64, Float64, boolean) ones
+    as values plus a mask. Text and mixed columns are factorized: integer codes,
+    plus their distinct values in the JSON header, each tagged with its type
+    (str, int, float, bool, Decimal, datetime, date, time or timedelta). Raises
+    TypeError for columns or values of any other kind.
+    """
+    arrays = {}
+    columns = []
+    for i in range(df.shape[1]):
+        columns.append(_write_column(df.iloc[:, i], f"c{i}", arrays))
+    index = None
+    if not (isinstance(df.index, pd.RangeIndex) and df.index.start == 0 and df.index.step == 1):
+        index = _write_column(df.index.to_series(), 'index', arrays)
+        index['name'] = _encode_value(df.index.name) if df.index.name is not None else None
+    header = {'names': [_encode_value(name) for name in df.columns], 'columns': columns,
+              'index': index, 'rows': len(df)}
+    arrays['header'] = np.frombuffer(json.dumps(header).encode('utf-8'), dtype=np.uint8)
+    np.savez(file, **arrays)
+
+
+def read_columns(path):
+    """The DataFrame write_columns saved to path; object arrays are refused."""
+    with np.load(path, allow_pickle=False) as arrays:
+        header = json.loads(arrays['header'].tobytes().decode('utf-8'))
+        data = {i: _read_column(column, arrays) for i, column in enumerate(header['columns'])}
+        index = pd.RangeIndex(header['rows'])
+        if header['index'] is not None:
+            name = header['index']['name']
+            index = pd.Index(_read_column(header['index'], arrays), name=_decode_value(name) if name else None)
+    df = pd.DataFrame(data, index=index)
+    df.columns = [_decode_value(name) for name in header['names']]
+    return df
+
+
+def _write_column(series, key, arrays):
+    dtype = series.dtype
+    if isinstance(dtype, np.dtype) and dtype.kind in 'biufcmM':
+        arrays[key] = series.to_numpy()
+        return {'kind': 'values', 'key': key}
+    if isinstance(dtype, pd.api.extensions.ExtensionDtype) and dtype.name in MASKED_DTYPES:
+        arrays[key] = series.to_numpy(dtype=dtype.numpy_dtype, na_value=0)
+        arrays[key + '_mask'] = series.isna().to_numpy()
+        return {'kind': 'masked', 'key': key, 'dtype': dtype.name}
+    if dtype == object or pd.api.types.is_string_dtype(dtype):
+        codes, uniques = pd.factorize(series)
+        arrays[key] = codes.astype(np.int32)
+        return {'kind': 'codes', 'key': key, 'dtype': str(dtype),
+                'uniques': [_encode_value(value) for value in uniques]}
+    raise TypeError(f"cannot cache a column of dtype {dtype}")
+
+
+def _read_column(column, arrays):
+    values = arrays[column['key']]
+    if column['kind'] == 'values':
+        return values
+    dtype = pd.api.types.pandas_dtype(column['dtype'])
+    if column['kind'] == 'masked':
+        return dtype.construct_array_type()(values, arrays[column['key'] + '_mask'])
+    uniques = np.empty(len(column['uniques']) + 1, dtype=object)
+    uniques[:-1] = [_decode_value(value) for value in column['uniques']]
+    # Code -1 marks a missing value, which picks the trailing NaN
+    uniques[-1] = np.nan
+    return pd.array(uniques[values], dtype=dtype)
+
+
+# Nullable dtypes stored as values plus a mask
+MASKED_DTYPES = {'Int8', 'Int16', 'Int32', 'Int64', 'UInt8', 'UInt16', 'UInt32', 'UInt64',
+                 'Float32', 'Float64', 'boolean'}
+
+
+def _encode_value(value):
+    """[type tag, JSON value] for a cell or column name; TypeError for other types."""
+    if isinstance(value, str):
+        return ['str', value]
+    if isinstance(value, (bool, np.bool_)):
+        return ['bool', bool(value)]
+    if isinstance(value, (int, np.integer)):
+        return ['int', int(value)]
+    if isinstance(value, (float, np.floating)):
+        return ['float', float(value) if math.isfinite(value) else repr(float(value))]
+    if isinstance(value, Decimal):
+        return ['decimal', str(value)]
+    if isinstance(value, datetime.datetime) and value.tzinfo is None:
+        return ['datetime', pd.Timestamp(value).isoformat()]
+    if isinstance(value, datetime.date) and not isinstance(value, datetime.datetime):
+        return ['date', value.isoformat()]
+    if isinstance(value, datetime.time) and value.tzinfo is None:
+        return ['time', value.isoformat()]
+    if isinstance(value, (datetime.timedelta, np.timedelta64)):
+        return ['timedelta', pd.Timedelta(value).value]
+    raise TypeError(f"cannot cache a value of type {type(value).__name__}")
+
+
+def _decode_value(encoded):
+    tag, value = encoded
+    if tag == 'float':
+        return float(value)
+    if tag == 'decimal':
+        return Decimal(value)
+    if tag == 'datetime':
+        return pd.Timestamp(value)
+    if tag == 'date':
+        return datetime.date.fromisoformat(value)
+    if tag == 'time':
+        return datetime.time.fromisoformat(value)
+    if tag == 'timedelta':
+        return pd.Timedelta(value)
+    return value
+
+
+def pack_frame(df):
+    """Turn a DataFrame into plain arrays that pickle cheaply.
+
+    Numeric and datetime columns are kept as their NumPy buffers. Text and mixed
+    columns are factorized, so each distinct value is stored once next to compact
+    integer codes instead of one Python object per row.
+    """
+    columns = []
+    for i in range(df.shape[1]):
+        series = df.iloc[:, i]
+        if series.dtype == object or pd.api.types.is_string_dtype(series.dtype):
+            codes, uniques = pd.factorize(series)
+            codes = codes.astype('int32' if len(uniques) >= 32767 else 'int16')
+            columns.append(('codes', codes, np.asarray(uniques, dtype=object), series.dtype))
+        else:
+            columns.append(('values', series.array, None, series.dtype))
+    return {'columns': df.columns.tolist(), 'index': df.index, 'data': columns}
+
+
+def unpack_frame(packed):
+    data = {}
+    for i, (kind, values, uniques, dtype) in enumerate(packed['data']):
+        if kind == 'codes':
+            # Code -1 marks a missing value, which picks the trailing NaN
+            values = np.append(uniques, np.nan)[values]
+            data[i] = pd.array(values, dtype=dtype)
+        else:
+            data[i] = values
+    df = pd.DataFrame(data, index=packed['index'])
+    df.columns = packed['columns']
+    return df
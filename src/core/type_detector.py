@@ -1,9 +1,39 @@
 import pandas as pd
 import numpy as np
 import re
-from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import date, datetime, time
 from decimal import Decimal, InvalidOperation
 
+try:
+    from . import instrumentation
+except ImportError:
+    import instrumentation
+
+REFERENCE_RE = re.compile(r'^[A-Z0-9-]+$')
+DIGIT_RE = re.compile(r'\d')
+# Stripped before the plain float() check of a number candidate
+CURRENCY_FORMATTING_RE = re.compile(r'[$€₹,()-]')
+# Plain numbers (1234, -12.50, 1,234.00). A sample of only these, none matching a date
+# pattern, is a number column, so its date parse is skipped. Eight-digit integers are
+# left out: they may be yyyymmdd dates, which only the parse recognizes
+PLAIN_NUMBER_RE = re.compile(r'^[-+]?(?!\d{8}$)(?:\d+|\d{1,3}(?:,\d{3})+)(?:\.\d+)?$')
+# Strings that pd.to_datetime turns into NaT instead of rejecting
+NAT_STRINGS = {'', 'nan', 'NaN', 'NAN', 'NaT', 'nat', 'NAT'}
+# Fixed seed so repeated detection on the same column gives the same answer
+SAMPLE_SEED = 0
+# Formats that mark a number column as money; detection reports the one matched
+CURRENCY_PATTERNS = [
+    r'^\$[\d,]+\.?\d*$',  # $1,234.56
+    r'^€[\d.,]+$',  # €1.234,56
+    r'^₹[\d,]+\.?\d*$',  # ₹1,23,456.78
+    r'^\([\d,]+\.?\d*\)$',  # (1,234.56) negative
+    r'^[\d,]+\.?\d*-$',  # 1234.56- trailing negative
+    r'^[\d.]+[KMB]$'  # 1.23K, 2.5M, 1.2B
+]
+# Currency markers in Excel number format codes ([$€-x-euro] style codes start with '[$')
+EXCEL_CURRENCY_MARKS = ('$', '€', '£', '₹', '¥', '[$')
+
 class DataTypeDetector:
     def __init__(self):
         self.date_patterns = [
@@ -15,35 +45,44 @@ class DataTypeDetector:
             r'^\d{5}$'  # Excel serial dates (5 digits)
         ]
         
-        self.currency_patterns = [
-            r'^\$[\d,]+\.?\d*$',  # $1,234.56
-            r'^€[\d.,]+$',  # €1.234,56
-            r'^₹[\d,]+\.?\d*$',  # ₹1,23,456.78
-            r'^\([\d,]+\.?\d*\)$',  # (1,234.56) negative
-            r'^[\d,]+\.?\d*-$',  # 1234.56- trailing negative
-            r'^[\d.]+[KMB]$'  # 1.23K, 2.5M, 1.2B
-        ]
+        self.currency_patterns = list(CURRENCY_PATTERNS)
+
+        # Each pattern list as one alternation, tried in list order like the loops were
+        self.date_regex = _combine_patterns(self.date_patterns)
+        self.currency_regex = _combine_patterns(self.currency_patterns)
+        self.sample_size = 100
 
     def detect_column_type(self, column_data):
-        # Remove null values for analysis
-        clean_data = column_data.dropna()
-        
-        if len(clean_data) == 0:
+        """Classify a column as date, number or string from a bounded sample of its values.
+
+        Up to sample_size non-null values are inspected: the first and last rows plus
+        a seeded random draw from the middle, so the cost does not grow with the column.
+        """
+        # Remove null values for analysis, sampling non-null row positions only
+        valid = np.flatnonzero(column_data.notna().to_numpy(dtype=bool, na_value=False))
+        if len(valid) == 0:
             return {'type': 'string', 'confidence': 0.0, 'format': None}
-        
-        # Convert to string for pattern matching
-        str_data = clean_data.astype(str)
-        
-        # Try parsing as dates first
-        date_score = self._detect_date_format(str_data)
-        
-        # Try parsing as numbers (handle currency symbols)
-        number_score = self._detect_number_format(str_data)
-        
-        # Default to string if neither works
+
+        # Convert only the sampled values to string for pattern matching
+        with instrumentation.timed('detect.column', column=column_data.name):
+            sample = valid[sample_positions(len(valid), self.sample_size)]
+            str_data = pd.Series(column_data.iloc[sample].astype(str).to_numpy(dtype=object), dtype=object)
+            return self._classify(str_data)
+
+    def _classify_column(self, name, str_data):
+        with instrumentation.timed('detect.column', column=name):
+            return self._classify(str_data)
+
+    def _classify(self, str_data):
+        # String classification has a fixed confidence and numbers are cheap to score,
+        # so score those first and skip date parsing once dates can no longer win
         string_score = self._classify_string_type(str_data)
-        
-        # Return the type with highest confidence
+        number_score = self._detect_number_format(str_data)
+        best_other = max(number_score['confidence'], string_score['confidence'])
+        plain_numbers = all(PLAIN_NUMBER_RE.match(value) for value in str_data[:self.sample_size])
+        date_score = self._detect_date_format(str_data, must_reach=best_other, plain_numbers=plain_numbers)
+
+        # Return the type with highest confidence (dates win ties, then numbers)
         scores = {
             'date': date_score,
             'number': number_score,
@@ -53,25 +92,22 @@ class DataTypeDetector:
         best_type = max(scores, key=lambda k: scores[k]['confidence'])
         return scores[best_type]
 
-    def _detect_date_format(self, sample_values):
-        date_matches = 0
-        detected_format = None
-        
-        for value in sample_values[:100]:  # Sample first 100 values
-            for pattern in self.date_patterns:
-                if re.match(pattern, str(value)):
-                    date_matches += 1
-                    detected_format = pattern
-                    break
-            
-            # Try pandas date parsing
-            try:
-                pd.to_datetime(value)
-                date_matches += 1
-            except:
-                pass
+    def _detect_date_format(self, sample_values, must_reach=None, plain_numbers=False):
+        """Date score: one point per value matching a date pattern, one per value pandas parses.
+
+        With must_reach, parsing is skipped when even a full parse could not reach it,
+        and with plain_numbers (every value matches PLAIN_NUMBER_RE) when no value
+        matches a date pattern; the confidence returned then only counts pattern matches.
+        """
+        sample_values = sample_values[:self.sample_size]
+        count = len(sample_values)
+        pattern_hits, detected_format = _match_patterns(sample_values, self.date_regex, self.date_patterns)
+        date_matches = pattern_hits
+        skip = plain_numbers and pattern_hits == 0
+        if not skip and (must_reach is None or (pattern_hits + count) / count >= must_reach):
+            date_matches += _count_parsed_dates(sample_values)
         
-        confidence = date_matches / min(len(sample_values), 100)
+        confidence = date_matches / count
         return {
             'type': 'date',
             'confidence': confidence,
@@ -79,28 +115,16 @@ class DataTypeDetector:
         }
 
     def _detect_number_format(self, sample_values):
-        number_matches = 0
-        detected_format = None
+        sample_values = sample_values[:self.sample_size]
+        number_matches, detected_format = _match_patterns(
+            sample_values, self.currency_regex, self.currency_patterns
+        )
         
-        for value in sample_values[:100]:  # Sample first 100 values
-            # Check currency patterns
-            for pattern in self.currency_patterns:
-                if re.match(pattern, str(value)):
-                    number_matches += 1
-                    detected_format = pattern
-                    break
-            
-            # Try direct numeric conversion
-            try:
-                # Remove common currency symbols and formatting
-                clean_value = re.sub(r'[$€₹,()]', '', str(value))
-                clean_value = clean_value.replace('-', '')
-                float(clean_value)
-                number_matches += 1
-            except ValueError:
-                pass
+        # Try direct numeric conversion after removing common currency symbols and formatting
+        cleaned = sample_values.str.replace(CURRENCY_FORMATTING_RE, '', regex=True)
+        number_matches += sum(_is_float(value) for value in cleaned)
         
-        confidence = number_matches / min(len(sample_values), 100)
+        confidence = number_matches / len(sample_values)
         return {
             'type': 'number',
             'confidence': confidence,
@@ -127,10 +151,10 @@ class DataTypeDetector:
             elif len(value_str) > 20 and any(keyword in value_str for keyword in ['payment', 'invoice', 'transaction']):
                 string_types['description'] += 1
             # Reference patterns
-            elif re.match(r'^[A-Z0-9-]+$', str(value)) and len(str(value)) < 20:
+            elif REFERENCE_RE.match(str(value)) and len(str(value)) < 20:
                 string_types['reference'] += 1
             # Category patterns
-            elif len(value_str) < 30 and not re.search(r'\d', value_str):
+            elif len(value_str) < 30 and not DIGIT_RE.search(value_str):
                 string_types['category'] += 1
             else:
                 string_types['general'] += 1
@@ -144,7 +168,229 @@ class DataTypeDetector:
             'format': best_string_type
         }
 
+    def detect_schema(self, df, workers=None, executor='thread', hints=None):
+        """Classify every column of a DataFrame and return a Schema.
+
+        One stratified sample of row positions is drawn for the whole frame and
+        converted to strings once; each column is classified from its non-null values
+        in that sample. Columns with no values in the sample but some elsewhere (very
+        sparse ones) fall back to detect_column_type. With workers > 1 columns are
+        classified on a 'thread' or 'process' pool; only the small samples are sent.
+
+        hints maps column names to ColumnHints (see ExcelProcessor.extract_with_hints).
+        Columns whose hint settles the type are taken from it with confidence 1.0 and
+        are neither sampled nor matched against the patterns.
+        """
+        if executor not in ('process', 'thread'):
+            raise ValueError(f"executor must be 'process' or 'thread', not {executor!r}")
+        hinted = [None] * df.shape[1]
+        if hints:
+            for i, column in enumerate(df.columns):
+                hint = hints.get(column)
+                hinted[i] = hint.result() if hint is not None else None
+            instrumentation.increment('detect.hinted_columns', sum(result is not None for result in hinted))
+        unhinted = [i for i, result in enumerate(hinted) if result is None]
+
+        samples = [None] * df.shape[1]
+        if unhinted:
+            rows = sample_positions(len(df), self.sample_size)
+            block = df.iloc[rows, unhinted]
+            present = block.notna().to_numpy(dtype=bool, na_value=False)
+            strings = block.astype(str).to_numpy(dtype=object)
+            for j, i in enumerate(unhinted):
+                values = strings[present[:, j], j]
+                samples[i] = pd.Series(values, dtype=object) if len(values) else None
+
+        results = list(hinted)
+        pending = [i for i, sample in enumerate(samples) if sample is not None]
+        if workers is not None and workers > 1 and len(pending) > 1:
+            pool_class = ProcessPoolExecutor if executor == 'process' else ThreadPoolExecutor
+            with pool_class(max_workers=workers) as pool:
+                # Per-column cost is only recorded in this process, i.e. for the thread pool
+                names = [df.columns[i] for i in pending]
+                classified = pool.map(self._classify_column, names, [samples[i] for i in pending])
+                for i, result in zip(pending, classified):
+                    results[i] = result
+        else:
+            for i in pending:
+                results[i] = self._classify_column(df.columns[i], samples[i])
+        for i, sample in enumerate(samples):
+            if sample is None and results[i] is None:
+                results[i] = self.detect_column_type(df.iloc[:, i])
+
+        return Schema([
+            ColumnSchema(column, result['type'], result['confidence'], result['format'])
+            for column, result in zip(df.columns, results)
+        ])
+
     def analyze_column(self, data):
         """Main method to analyze a column and return its detected type"""
         return self.detect_column_type(data)
 
+
+class ColumnSchema:
+    def __init__(self, name, type, confidence, format=None):
+        self.name = name
+        self.type = type
+        self.confidence = confidence
+        self.format = format
+
+    def to_dict(self):
+        """The detect_column_type result for this column."""
+        return {'type': self.type, 'confidence': self.confidence, 'format': self.format}
+
+    @property
+    def is_amount(self):
+        """True for number columns written as money: a currency pattern or Excel currency format."""
+        return self.type == 'number' and is_currency_format(self.format)
+
+    def __repr__(self):
+        return f"ColumnSchema({self.name!r}, {self.type!r}, {self.confidence:.2f}, {self.format!r})"
+
+
+class ColumnHint:
+    """Native cell types and Excel number formats seen in one worksheet column.
+
+    Filled while a sheet is read (ExcelProcessor.extract_with_hints). Cells that
+    hold real dates, or real numbers with an explicit number format, settle the
+    column's type without looking at the values. Text cells, even ones that look
+    like numbers, and numbers formatted 'General' (which may be Excel serial dates
+    or yyyymmdd codes) leave it to detection.
+    """
+    # Python types of openpyxl cell values
+    KINDS = {int: 'number', float: 'number', datetime: 'date', date: 'date', time: 'time',
+             str: 'string', bool: 'bool'}
+
+    def __init__(self, name=None):
+        self.name = name
+        self.types = {}
+        self.number_formats = {}
+
+    def add(self, value, number_format):
+        kind = self.KINDS.get(type(value), 'other')
+        self.types[kind] = self.types.get(kind, 0) + 1
+        self.number_formats[number_format] = self.number_formats.get(number_format, 0) + 1
+
+    @property
+    def number_format(self):
+        """The most common Excel number format code of the column's cells."""
+        return max(self.number_formats, key=self.number_formats.get) if self.number_formats else None
+
+    @property
+    def number_kind(self):
+        """'percentage', 'currency' or 'plain' for number columns, from the format code."""
+        if self.types.keys() != {'number'}:
+            return None
+        code = self.number_format or ''
+        if '%' in code:
+            return 'percentage'
+        if _is_excel_currency(code):
+            return 'currency'
+        return 'plain'
+
+    def result(self):
+        """A detect_column_type result when every cell is a date or a formatted number, else None."""
+        if len(self.types) != 1:
+            return None
+        kind = next(iter(self.types))
+        if kind not in ('date', 'number') or (kind == 'number' and 'General' in self.number_formats):
+            return None
+        return {'type': kind, 'confidence': 1.0, 'format': self.number_format}
+
+    def __repr__(self):
+        return f"ColumnHint({self.name!r}, types={self.types!r}, number_format={self.number_format!r})"
+
+
+class Schema:
+    """Detected column types of a DataFrame, in column order."""
+
+    def __init__(self, columns):
+        self.columns = {column.name: column for column in columns}
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def __contains__(self, name):
+        return name in self.columns
+
+    def __iter__(self):
+        return iter(self.columns.values())
+
+    def __len__(self):
+        return len(self.columns)
+
+    def columns_of_type(self, type):
+        return [column.name for column in self if column.type == type]
+
+    def amount_columns(self):
+        """Number columns whose format marks them as money (see ColumnSchema.is_amount)."""
+        return [column.name for column in self if column.is_amount]
+
+    def to_dict(self):
+        return {name: column.to_dict() for name, column in self.columns.items()}
+
+    def __repr__(self):
+        return f"Schema({list(self.columns.values())!r})"
+
+
+def sample_positions(length, sample_size=100):
+    """Sorted positions of a stratified sample: head, tail and a seeded random middle."""
+    if length <= sample_size:
+        return np.arange(length)
+    edge = sample_size // 3
+    middle = edge + np.random.default_rng(SAMPLE_SEED).choice(
+        length - 2 * edge, size=sample_size - 2 * edge, replace=False
+    )
+    return np.concatenate([np.arange(edge), np.sort(middle), np.arange(length - edge, length)])
+
+
+def is_currency_format(format):
+    """True for a detected currency pattern or an Excel number format code with a currency."""
+    if format is None:
+        return False
+    return format in CURRENCY_PATTERNS or ('%' not in format and _is_excel_currency(format))
+
+
+def _is_excel_currency(code):
+    return any(mark in code for mark in EXCEL_CURRENCY_MARKS) or 'Currency' in code
+
+
+def _combine_patterns(patterns):
+    return re.compile('|'.join(f'(?P<p{i}>{pattern})' for i, pattern in enumerate(patterns)))
+
+
+def _match_patterns(values, regex, patterns):
+    """Values matching any pattern, and the first pattern matched by the last such value."""
+    # On a bounded sample one compiled match per value beats building str.extract frames
+    groups = [match.lastgroup for match in map(regex.match, values) if match is not None]
+    if not groups:
+        return 0, None
+    return len(groups), patterns[int(groups[-1][1:])]
+
+
+def _count_parsed_dates(values):
+    """How many values pd.to_datetime accepts, parsing each distinct value once in one batch."""
+    codes, uniques = pd.factorize(values)
+    uniques = pd.Series(uniques, dtype=object)
+    try:
+        parsed = pd.to_datetime(uniques, format='mixed', errors='coerce', utc=True, cache=False)
+        accepted = (parsed.notna() | uniques.isin(NAT_STRINGS)).to_numpy()
+    except (ValueError, TypeError, OverflowError):
+        accepted = np.array([_is_datetime(value) for value in uniques], dtype=bool)
+    return int(np.bincount(codes, minlength=len(uniques))[accepted].sum())
+
+
+def _is_datetime(value):
+    try:
+        pd.to_datetime(value)
+        return True
+    except Exception:
+        return False
+
+
+def _is_float(value):
+    try:
+        float(value)
+        return True
+    except ValueError:
+        return False
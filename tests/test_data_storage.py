@@ -0,0 +1,120 @@
+from decimal import Decimal
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from column_store import ColumnStore
+from data_storage import DataStorage
+from sheet_cache import HAS_PYARROW
+
+
+def _ledger():
+    return pd.DataFrame({
+        'Account': ['A', 'B', 'A', 'C'],
+        'Amount': ['1,250.50', '(406)', '12.5', None],
+    })
+
+
+def test_reads_return_amounts_unless_units_requested():
+    storage = DataStorage(background_compaction=False)
+    storage.store_data('ledger', _ledger(), amounts=['Amount'])
+    amounts = [Decimal('1250.50'), Decimal('-406.00'), Decimal('12.50'), None]
+    assert storage.get_data('ledger')['Amount'].tolist() == amounts
+    assert storage.get_data('ledger', units=True)['Amount'].tolist() == [125050, -40600, 1250, pd.NA]
+    rows = storage.query_by_criteria('ledger', {'Amount': ('<', 100)})
+    assert rows['Amount'].tolist() == [Decimal('-406.00'), Decimal('12.50')]
+    assert storage.query_by_criteria('ledger', {'Account': 'A'}, units=True)['Amount'].tolist() == [125050, 1250]
+    totals = storage.aggregate_data('ledger', ['Account'], ['Amount'])
+    assert totals.loc['A', 'Amount'] == Decimal('1263.00')
+    assert storage.aggregate_data('ledger', ['Account'], ['Amount'], units=True).loc['A', 'Amount'] == 126300
+
+
+def _dated():
+    return pd.DataFrame({
+        'Date': pd.to_datetime(['2024-01-05', '2024-02-03', '2024-02-20']),
+        'Ref': ['a', 'b', 'c'],
+        'Amount': ['1.00', '2.50', '-3'],
+    })
+
+
+def test_backend_keeps_the_stored_dtypes(tmp_path):
+    plain = DataStorage(background_compaction=False)
+    backed = DataStorage(background_compaction=False, backend=ColumnStore(str(tmp_path)))
+    for storage in (plain, backed):
+        storage.store_data('ledger', _dated(), amounts=['Amount'])
+    assert backed.get_data('ledger').dtypes.equals(plain.get_data('ledger').dtypes)
+    assert (backed.get_data('ledger')['Ref'] < 'b').tolist() == [True, False, False]
+    reopened = DataStorage(backend=ColumnStore(str(tmp_path)))
+    pd.testing.assert_frame_equal(reopened.get_data('ledger'), plain.get_data('ledger'))
+
+
+def test_backend_rewrites_only_changed_partitions(tmp_path):
+    storage = DataStorage(background_compaction=False, backend=ColumnStore(str(tmp_path)))
+    storage.store_data('ledger', _dated(), amounts=['Amount'], partition_by='Date')
+    manifest = storage.backend.read('ledger')[1]
+    january = manifest['partitions']['2024-01']['dir']
+    storage.append_data('ledger', _dated().iloc[1:2].assign(Ref='d'))
+    storage.upsert_data('ledger', _dated().iloc[2:].assign(Amount='9'), ['Ref'])
+    manifest = storage.backend.read('ledger')[1]
+    assert manifest['partitions']['2024-01']['dir'] == january
+    reopened = DataStorage(backend=ColumnStore(str(tmp_path)))
+    rows = reopened.query_by_criteria('ledger', {'Date': ('>=', pd.Timestamp('2024-02-01'))})
+    assert sorted(zip(rows['Ref'], rows['Amount'])) == [
+        ('b', Decimal('2.50')), ('c', Decimal('9.00')), ('d', Decimal('2.50'))]
+
+
+def _ledger_rows(rows=500):
+    rng = np.random.default_rng(1)
+    return pd.DataFrame({
+        'Date': np.datetime64('2023-01-01') + rng.integers(0, 365, size=rows).astype('timedelta64[D]'),
+        'Account': np.asarray(['Cash', 'Rent', 'Sales'], dtype=object)[rng.integers(3, size=rows)],
+        'Reference': [f"INV-{n:05d}" for n in rng.permutation(rows)],
+        'Amount': [f"{value:.2f}" for value in np.round(rng.normal(0, 500, rows), 2)],
+    })
+
+
+def _expected(df, mask):
+    rows = df[mask].reset_index(drop=True)
+    return rows.assign(Amount=[Decimal(value).quantize(Decimal('0.01')) for value in rows['Amount']])
+
+
+@pytest.mark.parametrize('partition_by', [None, 'Date'])
+def test_store_then_query_round_trip(partition_by):
+    df = _ledger_rows()
+    storage = DataStorage(background_compaction=False)
+    storage.store_data('ledger', df, amounts=['Amount'], partition_by=partition_by)
+    storage.create_indexes('ledger', ['Reference', 'Date'])
+    amounts = df['Amount'].astype(float)
+    cases = [
+        ({'Reference': 'INV-00042'}, df['Reference'] == 'INV-00042'),
+        ({'Account': 'Rent', 'Amount': ('>', 100)}, (df['Account'] == 'Rent') & (amounts > 100)),
+        ([('Date', 'between', (pd.Timestamp('2023-03-01'), pd.Timestamp('2023-03-31'))),
+          ('Amount', '<=', -250.5)],
+         df['Date'].between('2023-03-01', '2023-03-31') & (amounts <= -250.5)),
+    ]
+    for filters, mask in cases:
+        rows = storage.query_by_criteria('ledger', filters)
+        key = ['Date', 'Reference']
+        pd.testing.assert_frame_equal(rows.sort_values(key).reset_index(drop=True),
+                                      _expected(df, mask).sort_values(key).reset_index(drop=True))
+
+
+@pytest.mark.parametrize('format', ['csv', 'parquet'])
+def test_export_then_load_round_trip(tmp_path, format):
+    if format != 'csv' and not HAS_PYARROW:
+        pytest.skip("needs pyarrow")
+    df = _ledger_rows()
+    storage = DataStorage(background_compaction=False)
+    storage.store_data('ledger', df, amounts=['Amount'])
+    path = storage.export('ledger', format=format, partition_by=['Account'], path=str(tmp_path / 'ledger'))
+    loaded = storage.load('ledger', path=path)
+    key = ['Date', 'Reference']
+    pd.testing.assert_frame_equal(loaded.sort_values(key).reset_index(drop=True)[df.columns.tolist()],
+                                  storage.get_data('ledger').sort_values(key).reset_index(drop=True),
+                                  check_dtype=False)
+    rows = storage.load('ledger', columns=['Reference', 'Amount'], path=path,
+                        filters={'Account': 'Sales', 'Amount': ('>=', 0)})
+    mask = (df['Account'] == 'Sales') & (df['Amount'].astype(float) >= 0)
+    assert sorted(zip(rows['Reference'], rows['Amount'])) == sorted(
+        zip(_expected(df, mask)['Reference'], _expected(df, mask)['Amount']))
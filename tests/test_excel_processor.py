@@ -1 +1,40 @@
- 
\ No newline at end of file
+import pandas as pd
+
+from excel_processor import ExcelProcessor
+from format_parser import FormatParser
+from sheet_cache import HAS_PYARROW, SheetCache
+from type_detector import ColumnSchema, Schema
+
+
+def _workbook(tmp_path):
+    path = str(tmp_path / 'amounts.xlsx')
+    pd.DataFrame({'Amount': ['1.234,50', '2.000,25', '17,00']}).to_excel(path, index=False)
+    return path
+
+
+def test_typed_cache_is_keyed_on_the_parser(tmp_path):
+    path = _workbook(tmp_path)
+    processor = ExcelProcessor(cache=SheetCache(str(tmp_path / 'cache')))
+    processor.load_files([path])
+    schema = Schema([ColumnSchema('Amount', 'number', 1.0, None)])
+    european, _ = processor.extract_typed(path, 'Sheet1', schema, parser=FormatParser(number_locale='de_DE'))
+    default, _ = processor.extract_typed(path, 'Sheet1', schema)
+    again, _ = processor.extract_typed(path, 'Sheet1', schema, parser=FormatParser(number_locale='de_DE'))
+    assert european['Amount'].tolist() == [1234.5, 2000.25, 17.0]
+    assert default['Amount'].tolist() != european['Amount'].tolist()
+    pd.testing.assert_frame_equal(again, european)
+
+
+def test_sheet_cache_round_trips_without_pickle(tmp_path):
+    path = _workbook(tmp_path)
+    cache = SheetCache(str(tmp_path / 'cache'))
+    df = pd.DataFrame({
+        'Amount': pd.array([125, None, -40600], dtype='Int64'),
+        'Date': pd.to_datetime(['2024-01-31', None, '2024-03-01']),
+        'Note': pd.Series(['rent', 12.5, pd.Timestamp('2024-02-01')], dtype=object),
+        3: [1.5, float('nan'), 2.0],
+    })
+    cache.put(path, 'Sheet1', df, variant='test')
+    pd.testing.assert_frame_equal(cache.get(path, 'Sheet1', variant='test'), df)
+    if not HAS_PYARROW:
+        assert [entry['format'] for entry in cache.index['entries'].values()] == ['npz']
@@ -0,0 +1,96 @@
+from decimal import Decimal
+
+import numpy as np
+import pandas as pd
+
+from format_parser import FormatParser
+
+
+def test_float_units_are_not_parsed_from_text():
+    values = pd.Series([10.25, 0.1 + 0.2 - 0.3, 1e-05, 2.5e16])
+    units = FormatParser().parse_amount_units(values, 2)
+    assert units.tolist() == [1025, 0, 0, 2500000000000000000]
+
+
+def test_float_units_round_half_even_like_decimal():
+    values = [1.015, 0.285, -2.675, 0.125, 123456789012.345, 2.5, 3.5]
+    units = FormatParser().parse_amount_units(pd.Series(values), 2)
+    expected = [int((Decimal(repr(v)) * 100).quantize(Decimal(1), rounding='ROUND_HALF_EVEN')) for v in values]
+    assert units.tolist() == expected
+
+
+def test_numeric_units_outside_int64_are_missing():
+    units = FormatParser().parse_amount_units(pd.Series([1e20, float('inf'), float('nan'), -5.0]), 2)
+    assert units.isna().tolist() == [True, True, True, False]
+    assert units.iloc[3] == -500
+    ints = FormatParser().parse_amount_units(pd.Series([2 ** 62, -7], dtype=np.int64), 2)
+    assert ints.isna().tolist() == [True, False]
+    assert ints.iloc[1] == -700
+
+
+def test_scalar_amounts_keep_numbers_exact():
+    parser = FormatParser()
+    assert parser.parse_amount(1e-05) == Decimal('0.00001')
+    assert parser.parse_amount(2.5e16) == Decimal('2.5E+16')
+    assert parser.parse_amount(float('inf')) is None
+
+
+AMOUNTS = [
+    '$1,234.56', '-$1,234.56', '(1,234.56)', '1234.56-', '1.2K', '2.5M', '1.2B', '€1.234,56', '-€0,50',
+    '₹1,23,456.78', '12', '0.005', '-0', '1,000,000', 'USD 12.50', '12.50 EUR', '', '   ', 'abc', None,
+    float('nan'), '1e5', '$', '(12)', '--5', '12.345.678,90', '12,345,678.90',
+]
+DATES = [
+    '2024-01-31', '01/31/2024', '31-Jan-2024', 'Q1 2024', 'Q4-2023', 'March 2024', 'Mar 2024', '45322',
+    '2024-02-30', 'not a date', '', None, '12/01/2024', '2024-1-5',
+]
+
+
+def _expected_units(amount, scale):
+    if amount is None:
+        return None
+    return int((amount * 10 ** scale).quantize(Decimal(1), rounding='ROUND_HALF_EVEN'))
+
+
+def test_amount_series_matches_parse_amount():
+    parser = FormatParser()
+    expected = [parser.parse_amount(value) for value in AMOUNTS]
+    values, valid = parser.parse_amount_series(pd.Series(AMOUNTS, dtype=object))
+    assert valid.tolist() == [amount is not None for amount in expected]
+    assert [float(value) if ok else None for value, ok in zip(values, valid)] == [
+        float(amount) if amount is not None else None for amount in expected]
+    units = parser.parse_amount_units(pd.Series(AMOUNTS, dtype=object), 2)
+    assert [None if pd.isna(value) else int(value) for value in units] == [
+        _expected_units(amount, 2) for amount in expected]
+
+
+def test_amount_series_matches_parse_amount_in_a_locale():
+    parser = FormatParser(number_locale='de_DE')
+    values = ['1.234,56', '-0,5', '1.000.000', '12', 'x']
+    expected = [parser.parse_amount(value) for value in values]
+    units = parser.parse_amount_units(pd.Series(values, dtype=object), 2)
+    assert [None if pd.isna(value) else int(value) for value in units] == [
+        _expected_units(amount, 2) for amount in expected]
+
+
+def test_date_series_matches_parse_date():
+    parser = FormatParser()
+    for values in (DATES, ['2024-01-31', '2023-12-01', None, 'x'] * 50, ['Q1 2024', 'Mar 2024', '45322'] * 5):
+        parsed = parser.parse_date_series(pd.Series(values, dtype=object))
+        expected = [parser.parse_date(value) for value in values]
+        assert [None if pd.isna(value) else value for value in parsed] == [
+            None if value is None else pd.Timestamp(value) for value in expected]
+
+
+def test_amount_series_matches_parse_amount_on_generated_columns():
+    rng = np.random.default_rng(0)
+    magnitudes = np.round(rng.lognormal(6, 3, 3000), 2)
+    styles = [
+        lambda v: f"${v:,.2f}", lambda v: f"-{v:.2f}", lambda v: f"({v:,.2f})", lambda v: f"{v:.2f}-",
+        lambda v: f"{v / 1000:.2f}K", lambda v: f"{v:.3f}", lambda v: f"{v:,.4f}",
+    ]
+    values = [styles[i](v) for i, v in zip(rng.integers(len(styles), size=len(magnitudes)), magnitudes)]
+    parser = FormatParser()
+    expected = [parser.parse_amount(value) for value in values]
+    units = parser.parse_amount_units(pd.Series(values, dtype=object), 2)
+    assert units.tolist() == [_expected_units(amount, 2) for amount in expected]
@@ -0,0 +1,30 @@
+import pandas as pd
+
+import type_detector
+from type_detector import DataTypeDetector
+
+
+def _parses(monkeypatch):
+    calls = []
+    count = type_detector._count_parsed_dates
+
+    def counting(values):
+        calls.append(len(values))
+        return count(values)
+
+    monkeypatch.setattr(type_detector, '_count_parsed_dates', counting)
+    return calls
+
+
+def test_plain_numbers_skip_the_date_parse(monkeypatch):
+    calls = _parses(monkeypatch)
+    amounts = pd.Series(['1234', '-12.50', '1,234.00', '2021', '0.5'] * 40)
+    assert DataTypeDetector().detect_column_type(amounts)['type'] == 'number'
+    assert calls == []
+
+
+def test_date_like_numbers_are_still_parsed(monkeypatch):
+    calls = _parses(monkeypatch)
+    assert DataTypeDetector().detect_column_type(pd.Series(['20240105', '20240212']))['type'] == 'date'
+    assert DataTypeDetector().detect_column_type(pd.Series(['45123', '45124']))['type'] == 'date'
+    assert len(calls) == 2